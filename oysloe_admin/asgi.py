@@ -2,6 +2,10 @@
 ASGI config for oysloe_admin project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with uvicorn workers under gunicorn:
+
+    GUNICORN_APP=oysloe_admin.asgi:application \
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn --config gunicorn.conf.py
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +13,13 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+from oysloe_admin.handlers import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'oysloe_admin.settings')
+# Route the public endpoints to their async views. Sync code runs in a fresh
+# thread per request under ASGI, so persistent connections would never be
+# reused, only piled up.
+os.environ.setdefault('ASYNC_PUBLIC_VIEWS', 'True')
+os.environ.setdefault('SQLITE_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,375 @@
+"""
+Build-time asset pipeline for the landing pages, run by collectstatic.
+
+Critical CSS: for each page in CRITICAL_CSS, the rules of its stylesheet
+that can apply to the markup above the fold are inlined into the page.
+The fold is the ``{# fold #}`` comment in the template, or the end of the
+template if there is none. ``{% stylesheet %}`` from static_assets then
+loads the full stylesheet without blocking rendering. A rule can apply when
+every class, id and element in one of its selectors occurs above the fold.
+Interaction states like :hover cannot apply before the first paint and are
+left to the full stylesheet.
+
+Bundles: the scripts of each STATIC_BUNDLES entry are concatenated in
+order and minified with rjsmin, when it is installed. The bundle is then
+hashed and compressed like any other static file, and ``{% bundle %}``
+loads it deferred.
+
+After every build ``assets-report.json`` in STATIC_ROOT records, for each
+landing page, the bytes it sends and the resources that block its first
+render, with an estimate of the time to first render on the network of
+ASSET_REPORT_RTT_MS and ASSET_REPORT_BANDWIDTH_KBPS.
+``manage.py report_assets`` prints the report.
+"""
+import json
+import logging
+import os
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote, urljoin
+
+from django.conf import settings
+from django.template.loader import get_template, render_to_string
+
+from . import pages
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+logger = logging.getLogger(__name__)
+
+ASSETS_MANIFEST = 'assets.json'
+REPORT = 'assets-report.json'
+FOLD_MARKER = '{# fold #}'
+
+# States that depend on the user and do not apply at the first paint
+INTERACTIVE = re.compile(r':(?:hover|focus|focus-within|focus-visible|active|visited)\b')
+PSEUDO = re.compile(r'::?[\w-]+(?:\([^)]*\))?|\[[^\]]*\]')
+GROUPING_RULES = ('@media', '@supports', '@layer')
+KEYFRAMES = re.compile(r'@(?:-webkit-)?keyframes\s+([\w-]+)')
+STRING_OR_URL = re.compile(
+    r'''url\(\s*('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")\s*\)'''
+    r'''|'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"'''
+    r'''|url\(\s*([^'")\s][^)]*?)\s*\)'''
+)
+
+
+def _scan(css):
+    """Yield (index, character, quote) for the characters of ``css``, where quote is set inside strings"""
+    quote = None
+    escaped = False
+    for i, ch in enumerate(css):
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == quote:
+                yield i, ch, quote
+                quote = None
+                continue
+        elif ch in '"\'':
+            quote = ch
+        yield i, ch, quote
+
+
+def strip_comments(css):
+    out = []
+    skip_to = 0
+    for i, ch, quote in _scan(css):
+        if i < skip_to:
+            continue
+        if not quote and css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            skip_to = len(css) if end < 0 else end + 2
+            continue
+        out.append(ch)
+    return ''.join(out)
+
+
+def blocks(css):
+    """(prelude, body) of each top-level rule; the body is None for statements like @import"""
+    result = []
+    depth = start = opened = 0
+    for i, ch, quote in _scan(css):
+        if quote:
+            continue
+        if ch == '{':
+            if depth == 0:
+                opened = i
+            depth += 1
+        elif ch == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                result.append((css[start:opened].strip(), css[opened + 1:i]))
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            result.append((css[start:i].strip(), None))
+            start = i + 1
+    return result
+
+
+def squeeze(text, punctuation=';:,{}'):
+    """Collapse whitespace outside strings, and drop it around ``punctuation``"""
+    out = []
+    pending_space = False
+    for _i, ch, quote in _scan(text):
+        if not quote and ch.isspace():
+            pending_space = True
+            continue
+        if pending_space and out and out[-1] not in punctuation and (quote or ch not in punctuation):
+            out.append(' ')
+        pending_space = False
+        if ch == '}' and not quote and out and out[-1] == ';' and '}' in punctuation:
+            out.pop()
+        out.append(ch)
+    return ''.join(out)
+
+
+def split_selectors(prelude):
+    selectors, depth, start = [], 0, 0
+    for i, ch, quote in _scan(prelude):
+        if quote:
+            continue
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return [selector for selector in selectors if selector]
+
+
+def used_names(markup):
+    """The elements, classes and ids that occur in ``markup``, which may be template source"""
+    markup = re.sub(r'\{[{%#].*?[}%#]\}', ' ', markup, flags=re.S)
+    classes = set()
+    for value in re.findall(r'\sclass\s*=\s*["\']([^"\']*)["\']', markup):
+        classes.update(value.split())
+    return {
+        'tags': {tag.lower() for tag in re.findall(r'<([a-zA-Z][\w-]*)', markup)} | {'html', 'body'},
+        'classes': classes,
+        'ids': set(re.findall(r'\sid\s*=\s*["\']([^"\']+)["\']', markup)),
+    }
+
+
+def matches(selector, used):
+    """Whether ``selector`` can apply to the markup described by ``used``"""
+    if INTERACTIVE.search(selector):
+        return False
+    plain = PSEUDO.sub(' ', selector)
+    return (
+        set(re.findall(r'\.(-?[_a-zA-Z][\w-]*)', plain)) <= used['classes']
+        and set(re.findall(r'#(-?[_a-zA-Z][\w-]*)', plain)) <= used['ids']
+        and {tag.lower() for tag in re.findall(r'(?:^|[\s>+~(])([a-zA-Z][\w-]*)', plain)} <= used['tags']
+    )
+
+
+def _select(css, used, keyframes):
+    out = []
+    for prelude, body in blocks(css):
+        if body is None:
+            if prelude.startswith(('@import', '@charset')):
+                out.append(squeeze(prelude) + ';')
+        elif prelude.startswith(GROUPING_RULES):
+            inner = _select(body, used, keyframes)
+            if inner:
+                out.append(squeeze(prelude, '') + '{' + inner + '}')
+        elif KEYFRAMES.match(prelude):
+            keyframes[KEYFRAMES.match(prelude).group(1)] = squeeze(prelude, '') + '{' + squeeze(body) + '}'
+        elif prelude.startswith('@font-face'):
+            out.append('@font-face{' + squeeze(body).strip(';') + '}')
+        elif not prelude.startswith('@'):
+            selectors = [selector for selector in split_selectors(prelude) if matches(selector, used)]
+            declarations = squeeze(body).strip(';')
+            if selectors and declarations:
+                out.append(','.join(squeeze(selector, ',>') for selector in selectors) + '{' + declarations + '}')
+    return ''.join(out)
+
+
+def rebase_urls(css, base_url):
+    """Make the relative url()s of a stylesheet at ``base_url`` absolute, for inlining into a page"""
+    def rebase(match):
+        if match.group(0)[:4] != 'url(':
+            return match.group(0)
+        quoted, bare = match.group(1), match.group(2)
+        url = quoted[1:-1] if quoted else bare
+        if url.startswith(('data:', '#', '/')) or '://' in url:
+            return match.group(0)
+        return 'url("%s")' % urljoin(base_url, url)
+    return STRING_OR_URL.sub(rebase, css)
+
+
+def critical_css(css, markup, base_url=None):
+    """The rules of ``css`` that can apply to ``markup``, minified, with animations they use"""
+    used = used_names(markup)
+    keyframes = {}
+    selected = _select(strip_comments(css), used, keyframes)
+    animations = ''.join(
+        rule for name, rule in keyframes.items()
+        if re.search(r'animation(?:-name)?:[^;}]*\b%s\b' % re.escape(name), selected)
+    )
+    selected += animations
+    return rebase_urls(selected, base_url) if base_url else selected
+
+
+def above_the_fold(template_name):
+    """The template source of a page up to its ``{# fold #}`` comment"""
+    source = get_template(template_name).template.source
+    return source.split(FOLD_MARKER, 1)[0]
+
+
+def bundle(scripts):
+    """Concatenate scripts in order, minified when rjsmin is installed"""
+    # The separator ends a last statement left without a semicolon
+    script = ''.join(source.rstrip() + '\n;\n' for source in scripts)
+    return rjsmin.jsmin(script) if rjsmin is not None else script
+
+
+def load_manifest(root=None):
+    path = Path(root or settings.STATIC_ROOT) / ASSETS_MANIFEST
+    try:
+        return json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(root, name, content):
+    path = Path(root) / name
+    temporary = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    temporary.write_text(json.dumps(content, indent=2, sort_keys=True))
+    os.replace(temporary, path)
+
+
+_manifest = None
+
+
+def manifest():
+    """The assets built by the last collectstatic, as loaded once per process from assets.json"""
+    global _manifest
+    if _manifest is None:
+        _manifest = load_manifest()
+    return _manifest
+
+
+def critical(template_name, stylesheet):
+    """The inlined critical CSS of ``stylesheet`` on a page, if it was extracted"""
+    entry = manifest().get('critical', {}).get(template_name)
+    if entry and entry['stylesheet'] == stylesheet:
+        return entry['css']
+    return None
+
+
+class Resources(HTMLParser):
+    """The stylesheets and scripts of a page, and the bytes of its inline styles and scripts"""
+
+    def __init__(self):
+        super().__init__()
+        self.blocking, self.deferred = [], []
+        self.inline = {'style': 0, 'script': 0}
+        self._inline = None
+        self._noscript = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'noscript':
+            self._noscript += 1
+        elif self._noscript:
+            return
+        elif tag == 'link' and 'stylesheet' in (attrs.get('rel') or '').split() and attrs.get('href'):
+            # A stylesheet for print only (swapped in after load) does not block rendering
+            (self.deferred if attrs.get('media') == 'print' else self.blocking).append(attrs['href'])
+        elif tag == 'script' and attrs.get('src'):
+            asynchronous = 'defer' in attrs or 'async' in attrs or attrs.get('type') == 'module'
+            (self.deferred if asynchronous else self.blocking).append(attrs['src'])
+        elif tag in self.inline:
+            self._inline = tag
+
+    def handle_endtag(self, tag):
+        if tag == 'noscript':
+            self._noscript = max(self._noscript - 1, 0)
+        elif tag == self._inline:
+            self._inline = None
+
+    def handle_data(self, data):
+        if self._inline:
+            self.inline[self._inline] += len(data.encode())
+
+
+def static_file(url, root):
+    """The file in STATIC_ROOT a URL points to, or None for other URLs"""
+    static_url = settings.STATIC_URL
+    if url.startswith('//') or not url.startswith(static_url):
+        return None
+    path = Path(root) / unquote(url[len(static_url):].partition('?')[0].partition('#')[0])
+    return path if path.is_file() else None
+
+
+def resource_sizes(url, root):
+    path = static_file(url, root)
+    if path is None:
+        return None
+    size = path.stat().st_size
+    # WhiteNoise serves the smallest of the precompressed variants
+    transfer = min(
+        [size] + [path.with_name(path.name + suffix).stat().st_size
+                  for suffix in ('.br', '.gz') if path.with_name(path.name + suffix).exists()]
+    )
+    return {'url': url, 'bytes': size, 'transfer': transfer}
+
+
+def page_report(template_name, root):
+    """Bytes and render-blocking resources of a page, with its estimated time to first render"""
+    html = render_to_string(template_name)
+    body = html.encode()
+    resources = Resources()
+    resources.feed(html)
+
+    blocking, external = [], []
+    for url in resources.blocking:
+        sizes = resource_sizes(url, root)
+        if sizes is None:
+            external.append(url)
+        else:
+            blocking.append(sizes)
+    deferred = [sizes for sizes in (resource_sizes(url, root) for url in resources.deferred) if sizes]
+
+    document = min(len(content) for content in pages.compress(body).values())
+    critical_bytes = document + sum(resource['transfer'] for resource in blocking)
+    rtt = getattr(settings, 'ASSET_REPORT_RTT_MS', 150)
+    kbps = getattr(settings, 'ASSET_REPORT_BANDWIDTH_KBPS', 1600)
+    # The document, then its blocking static files in parallel on the same connection
+    round_trips = 1 + (1 if blocking else 0)
+    return {
+        'html': {'bytes': len(body), 'transfer': document},
+        'inline_css': resources.inline['style'],
+        'inline_js': resources.inline['script'],
+        'blocking': blocking,
+        'deferred': deferred,
+        # Third-party resources are not measured and not in the estimate
+        'external_blocking': external,
+        'critical_path_bytes': critical_bytes,
+        'first_render_ms': round(round_trips * rtt + critical_bytes * 8 / kbps),
+    }
+
+
+def report(root, template_names):
+    result = {}
+    for template_name in template_names:
+        try:
+            result[template_name] = page_report(template_name, root)
+        except ValueError as e:
+            # {% static %} of a file that was not collected
+            logger.warning('Not reporting on %s: %s', template_name, e)
+    return {
+        'network': {
+            'rtt_ms': getattr(settings, 'ASSET_REPORT_RTT_MS', 150),
+            'kbps': getattr(settings, 'ASSET_REPORT_BANDWIDTH_KBPS', 1600),
+        },
+        'pages': result,
+    }
@@ -0,0 +1,88 @@
+"""
+Serve the public endpoints of the landing pages through a shorter middleware list.
+
+Page-view beacons, pricing and seller applications (LEAN_MIDDLEWARE_PATHS)
+are anonymous and CSRF-exempt, so sessions, authentication, messages, CSRF,
+WhiteNoise and clickjacking protection only add latency to them. The
+dispatchers send those paths to a handler built from LEAN_MIDDLEWARE and
+everything else to the regular one; both resolve the same URLconf.
+"""
+import threading
+
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+
+_loading = threading.Lock()
+
+
+class MiddlewareListMixin:
+    """Build the middleware chain from the given list instead of settings.MIDDLEWARE"""
+
+    def __init__(self, middleware, *args, **kwargs):
+        self.middleware = list(middleware)
+        super().__init__(*args, **kwargs)
+
+    def load_middleware(self, is_async=False):
+        # BaseHandler.load_middleware reads settings.MIDDLEWARE, so swap the
+        # list while the chain is built. Handlers are built once, at startup.
+        with _loading:
+            middleware = settings.MIDDLEWARE
+            settings.MIDDLEWARE = self.middleware
+            try:
+                super().load_middleware(is_async)
+            finally:
+                settings.MIDDLEWARE = middleware
+
+
+class MiddlewareListWSGIHandler(MiddlewareListMixin, WSGIHandler):
+    pass
+
+
+class MiddlewareListASGIHandler(MiddlewareListMixin, ASGIHandler):
+    pass
+
+
+class LeanPathWSGIDispatcher:
+    def __init__(self, application, lean_application, paths):
+        self.application = application
+        self.lean_application = lean_application
+        self.paths = tuple(paths)
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(self.paths):
+            return self.lean_application(environ, start_response)
+        return self.application(environ, start_response)
+
+
+class LeanPathASGIDispatcher:
+    def __init__(self, application, lean_application, paths):
+        self.application = application
+        self.lean_application = lean_application
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith(self.paths):
+            return await self.lean_application(scope, receive, send)
+        return await self.application(scope, receive, send)
+
+
+def get_wsgi_application():
+    """Like django.core.wsgi.get_wsgi_application, with the lean path dispatch"""
+    django.setup(set_prefix=False)
+    application = WSGIHandler()
+    if not settings.LEAN_MIDDLEWARE_PATHS:
+        return application
+    lean_application = MiddlewareListWSGIHandler(settings.LEAN_MIDDLEWARE)
+    return LeanPathWSGIDispatcher(application, lean_application, settings.LEAN_MIDDLEWARE_PATHS)
+
+
+def get_asgi_application():
+    """Like django.core.asgi.get_asgi_application, with the lean path dispatch"""
+    django.setup(set_prefix=False)
+    application = ASGIHandler()
+    if not settings.LEAN_MIDDLEWARE_PATHS:
+        return application
+    lean_application = MiddlewareListASGIHandler(settings.LEAN_MIDDLEWARE)
+    return LeanPathASGIDispatcher(application, lean_application, settings.LEAN_MIDDLEWARE_PATHS)
@@ -0,0 +1,122 @@
+"""
+Responsive variants of the raster images in the static files.
+
+While collectstatic runs, ``OptimizedStaticFilesStorage`` resizes every large
+PNG/JPEG to the STATIC_IMAGE_WIDTHS narrower than the original. It encodes
+each width as AVIF and WebP, plus the original format for browsers that
+support neither, and the variants then get content-hashed names like any
+other static file. Images no wider than the widest configured width also get
+full-size AVIF/WebP copies. Variants whose source has not changed since the
+last collectstatic are reused. ``images.json`` in STATIC_ROOT records the variants of each
+image for the ``{% srcset %}`` tag.
+
+Pillow is optional. Without it, or without its AVIF/WebP codecs, collectstatic
+still runs and the missing variants are simply not generated.
+"""
+import io
+import json
+import logging
+import os
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGES_MANIFEST = 'images.json'
+SOURCE_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png'}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+EXTENSIONS = {'avif': '.avif', 'webp': '.webp', 'jpeg': '.jpg', 'png': '.png'}
+ENCODER_OPTIONS = {
+    'avif': {'quality': 60, 'speed': 8},
+    'webp': {'quality': 80, 'method': 6},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'optimize': True},
+}
+
+
+def available_formats():
+    """The modern formats of STATIC_IMAGE_FORMATS this Pillow can encode"""
+    if Image is None:
+        return []
+    return [fmt for fmt in getattr(settings, 'STATIC_IMAGE_FORMATS', ['avif', 'webp']) if features.check(fmt)]
+
+
+def is_candidate(name, size):
+    """Whether a collected file gets responsive variants"""
+    excluded = getattr(settings, 'STATIC_IMAGE_EXCLUDE', [])
+    return (
+        PurePosixPath(name).suffix.lower() in SOURCE_FORMATS
+        and size >= getattr(settings, 'STATIC_IMAGE_MIN_SIZE', 20 * 1024)
+        and not any(name.startswith(prefix) for prefix in excluded)
+    )
+
+
+def variant_name(name, width, fmt):
+    path = PurePosixPath(name)
+    return str(path.with_name(f'{path.stem}-{width}w{EXTENSIONS[fmt]}'))
+
+
+def plan(name, width):
+    """Variant names to generate for an image ``width`` pixels wide, by format and width"""
+    configured = getattr(settings, 'STATIC_IMAGE_WIDTHS', [480, 960, 1600])
+    widths = [w for w in configured if w < width]
+    source_format = SOURCE_FORMATS[PurePosixPath(name).suffix.lower()]
+    # Beyond the widest configured width only the original is kept
+    modern_widths = widths if width > max(configured) else widths + [width]
+    variants = {fmt: {w: variant_name(name, w, fmt) for w in modern_widths} for fmt in available_formats()}
+    # Smaller copies in the original format; at full width the original itself
+    variants[source_format] = {w: variant_name(name, w, source_format) for w in widths}
+    variants[source_format][width] = name
+    return variants
+
+
+def encode(image, width, fmt):
+    """``image`` scaled to ``width`` pixels and encoded as ``fmt``"""
+    if width < image.width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **ENCODER_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def open_image(file):
+    image = Image.open(file)
+    # Photos straight from a phone keep their rotation in EXIF
+    return ImageOps.exif_transpose(image)
+
+
+def load_manifest(root=None):
+    path = Path(root or settings.STATIC_ROOT) / IMAGES_MANIFEST
+    try:
+        return json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+_manifest = None
+
+
+def variants(name):
+    """The recorded variants of a static image, as loaded once per process from images.json"""
+    global _manifest
+    if _manifest is None:
+        _manifest = load_manifest()
+    return _manifest.get(name)
+
+
+def write_manifest(root, manifest):
+    path = Path(root) / IMAGES_MANIFEST
+    temporary = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    temporary.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(temporary, path)
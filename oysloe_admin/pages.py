@@ -0,0 +1,209 @@
+"""
+Full-page cache for the static landing pages.
+
+index.html, register.html, privacy.html, terms.html and help.html do not
+depend on the request, so each one is rendered once and kept in memory as
+bytes. Alongside the bytes the cache keeps gzip and brotli variants (brotli
+only when the package is installed) and a strong ETag. ``CachedTemplateView``
+serves whichever variant the client accepts and answers conditional requests
+with 304. Neither path touches the template engine.
+
+``manage.py warm_pages`` renders the pages into PAGE_CACHE_DIR at deploy
+time, and workers load them from there instead of rendering them
+themselves, unless the template or the static files manifest changed since.
+Pages are re-rendered PAGE_CACHE_TIMEOUT seconds after they were rendered.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.generic import TemplateView
+
+from sellers import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings in order of preference
+ENCODINGS = ('br', 'gzip')
+SUFFIXES = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+
+_pages = {}
+
+
+def compress(body):
+    variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, mode=brotli.MODE_TEXT)
+    return variants
+
+
+def render(template_name):
+    """Render a page and its compressed variants"""
+    body = render_to_string(template_name).encode()
+    return {
+        'variants': compress(body),
+        'hash': hashlib.sha256(body).hexdigest()[:32],
+        'source': fingerprint(template_name),
+        'rendered_at': time.time(),
+    }
+
+
+def fingerprint(template_name):
+    """Hash of what a page is rendered from: its template and the static files manifest"""
+    digest = hashlib.sha256(get_template(template_name).template.source.encode())
+    manifest = Path(settings.STATIC_ROOT) / 'staticfiles.json'
+    if manifest.exists():
+        digest.update(manifest.read_bytes())
+    return digest.hexdigest()[:32]
+
+
+def cache_dir():
+    path = getattr(settings, 'PAGE_CACHE_DIR', None)
+    return Path(path) if path else None
+
+
+def save(template_name, page):
+    """Write a page to PAGE_CACHE_DIR for other processes to load"""
+    directory = cache_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    for encoding, content in page['variants'].items():
+        _write(directory / (template_name + SUFFIXES[encoding]), content)
+    meta = {
+        'hash': page['hash'],
+        'source': page['source'],
+        'rendered_at': page['rendered_at'],
+        'encodings': list(page['variants']),
+    }
+    _write(directory / (template_name + '.json'), json.dumps(meta).encode())
+
+
+def _write(path, content):
+    # Readers never see a half-written file
+    temporary = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+
+
+def load(template_name):
+    """A page prerendered into PAGE_CACHE_DIR from the current template, if there is one"""
+    directory = cache_dir()
+    if directory is None:
+        return None
+    try:
+        meta = json.loads((directory / (template_name + '.json')).read_bytes())
+        variants = {
+            encoding: (directory / (template_name + SUFFIXES[encoding])).read_bytes()
+            for encoding in meta['encodings']
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+    # Left over from a deploy with other templates or static files
+    if meta.get('source') != fingerprint(template_name):
+        return None
+    return {
+        'variants': variants, 'hash': meta['hash'], 'source': meta['source'], 'rendered_at': meta['rendered_at'],
+    }
+
+
+def expired(page):
+    return time.time() - page['rendered_at'] > getattr(settings, 'PAGE_CACHE_TIMEOUT', 86400)
+
+
+def get_page(template_name):
+    """The cached page, loaded from PAGE_CACHE_DIR or rendered on a miss"""
+    page = _pages.get(template_name)
+    hit = page is not None and not expired(page)
+    metrics.cache_lookup('pages', hit)
+    if not hit:
+        page = load(template_name)
+        if page is None or expired(page):
+            page = render(template_name)
+        _pages[template_name] = page
+    return page
+
+
+def invalidate():
+    _pages.clear()
+
+
+def page_templates():
+    """Template names of the pages served by CachedTemplateView"""
+    from .public_urls import pages
+    return sorted({
+        pattern.callback.view_initkwargs['template_name'] for pattern in pages
+        if getattr(pattern.callback, 'view_class', None) is CachedTemplateView
+    })
+
+
+def accepted_encoding(request, variants):
+    """The preferred content coding of the request that the page is stored in"""
+    accepted = set()
+    for coding in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = coding.partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            refused = params and float(quality) == 0
+        except ValueError:
+            refused = False
+        if not refused:
+            accepted.add(name.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding in variants and (encoding in accepted or '*' in accepted):
+            return encoding
+    return 'identity'
+
+
+class CachedTemplateView(TemplateView):
+    """TemplateView that serves the prerendered page when PAGE_CACHE_ENABLED"""
+
+    # Pages whose scripts post forms read the CSRF token from the cookie. The
+    # cookie makes the response private, but it is still served prerendered.
+    csrf_cookie = False
+
+    def get(self, request, *args, **kwargs):
+        if not getattr(settings, 'PAGE_CACHE_ENABLED', False):
+            return super().get(request, *args, **kwargs)
+
+        page = get_page(self.template_name)
+        encoding = accepted_encoding(request, page['variants'])
+        etag = '"%s"' % page['hash'] if encoding == 'identity' else '"%s-%s"' % (page['hash'], encoding)
+        last_modified = int(page['rendered_at'])
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(page['variants'][encoding], content_type='text/html; charset=utf-8')
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        max_age = getattr(settings, 'PAGE_CACHE_MAX_AGE', 300)
+        if self.csrf_cookie:
+            patch_cache_control(response, private=True, max_age=max_age)
+        else:
+            patch_cache_control(response, public=True, max_age=max_age)
+        return response
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        return ensure_csrf_cookie(view) if initkwargs.get('csrf_cookie', cls.csrf_cookie) else view
+
+
+def warm():
+    """Load or render every page into this process, e.g. in the gunicorn master before forking"""
+    if getattr(settings, 'PAGE_CACHE_ENABLED', False):
+        for template_name in page_templates():
+            get_page(template_name)
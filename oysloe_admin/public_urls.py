@@ -0,0 +1,39 @@
+"""
+URL configuration of the ``public`` server profile (SERVER_PROFILE=public).
+
+Serves the landing pages and the public API endpoints only, so the process
+never imports the admin site, jazzmin or the DRF viewsets.
+"""
+from django.conf import settings
+from django.urls import path, include
+from django.conf.urls.static import static
+
+from sellers import metrics
+
+from .pages import CachedTemplateView
+
+# Static HTML pages, also served by the full URLconf. They are prerendered;
+# see oysloe_admin/pages.py.
+pages = [
+    path('', CachedTemplateView.as_view(template_name='index.html'), name='home'),
+    path('index.html', CachedTemplateView.as_view(template_name='index.html'), name='home'),
+    path('register.html', CachedTemplateView.as_view(template_name='register.html'), name='register'),
+    path('privacy.html', CachedTemplateView.as_view(template_name='privacy.html'), name='privacy'),
+    path('terms.html', CachedTemplateView.as_view(template_name='terms.html'), name='terms'),
+    path('help.html', CachedTemplateView.as_view(template_name='help.html', csrf_cookie=True), name='help'),
+]
+
+# Prometheus scrape target, also served by the full URLconf; see sellers/metrics.py
+internal = [
+    path('internal/metrics', metrics.metrics_view, name='metrics'),
+]
+
+urlpatterns = [
+    path('api/', include(('sellers.public_urls', 'sellers'), namespace='sellers')),
+    *internal,
+    *pages,
+]
+
+# Serve static files in development
+if settings.DEBUG:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its wall time covers the whole chain
+    'sellers.middleware.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  
@@ -85,7 +87,187 @@ WSGI_APPLICATION = 'oysloe_admin.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+    }
+}
+
+# SQLite storage profile
+# 'tuned' keeps connections open for SQLITE_CONN_MAX_AGE seconds and applies
+# WAL on every new connection, so readers never wait for the writer. It also
+# applies synchronous=NORMAL (safe under WAL), an mmap and page cache, and
+# in-memory temp tables. Transactions begin IMMEDIATE, taking the write lock
+# up front, so concurrent writers queue on busy_timeout (SQLITE_BUSY_TIMEOUT
+# seconds) instead of failing with "database is locked" when a read lock
+# cannot be upgraded. 'legacy' is the original plain connection per request.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'tuned')
+SQLITE_CONN_MAX_AGE = int(os.environ.get('SQLITE_CONN_MAX_AGE', '600'))
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '20'))
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -64000',
+    'PRAGMA temp_store = MEMORY',
+]
+
+if SQLITE_PROFILE == 'tuned':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': '; '.join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT,
+        },
+    })
+
+
+# Read replica
+# Set DATABASE_REPLICA_NAME to a replica of the default database to send the
+# reads of GET/HEAD/OPTIONS requests there. Clients with a session read from
+# the primary for REPLICA_STICKY_SECONDS after a request of theirs wrote, and
+# everyone does while the replica heartbeat trails the primary by more than
+# REPLICA_MAX_LAG seconds (checked every REPLICA_LAG_CHECK_INTERVAL seconds per
+# process). The replica alias only exists while DATABASE_REPLICA_NAME is set.
+DATABASE_REPLICA_NAME = os.environ.get('DATABASE_REPLICA_NAME')
+DATABASE_ROUTERS = []
+if DATABASE_REPLICA_NAME:
+    DATABASES['replica'] = {**DATABASES['default'], 'NAME': DATABASE_REPLICA_NAME}
+    DATABASE_ROUTERS = ['sellers.routers.ReplicaRouter']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+        'sellers.middleware.ReplicaRoutingMiddleware'
+    )
+REPLICA_STICKY_SECONDS = 10
+REPLICA_MAX_LAG = 10
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+
+# Server profile
+# 'full' serves everything. 'public' is for processes that only serve the
+# landing pages and the public API (submit-seller, track-pageview, pricing):
+# it leaves out the admin, jazzmin, DRF's viewsets, sessions and messages, so
+# workers boot faster and use less memory. Compare the two with
+# ``manage.py profile_startup``.
+SERVER_PROFILE = os.environ.get('SERVER_PROFILE', 'full')
+ADMIN_ONLY_APPS = [
+    'jazzmin',
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'rest_framework',
+]
+ADMIN_ONLY_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+ADMIN_ONLY_CONTEXT_PROCESSORS = [
+    'django.contrib.auth.context_processors.auth',
+    'django.contrib.messages.context_processors.messages',
+]
+if SERVER_PROFILE == 'public':
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_ONLY_APPS]
+    MIDDLEWARE = [name for name in MIDDLEWARE if name not in ADMIN_ONLY_MIDDLEWARE]
+    TEMPLATES[0]['OPTIONS']['context_processors'] = [
+        name for name in TEMPLATES[0]['OPTIONS']['context_processors']
+        if name not in ADMIN_ONLY_CONTEXT_PROCESSORS
+    ]
+    ROOT_URLCONF = 'oysloe_admin.public_urls'
+
+# Lean middleware
+# Requests under LEAN_MIDDLEWARE_PATHS (the anonymous, CSRF-exempt endpoints
+# of the landing pages) skip the WhiteNoise, session, CSRF, auth, messages and
+# clickjacking middleware and run through LEAN_MIDDLEWARE only; see
+# oysloe_admin/handlers.py. LEAN_PUBLIC_MIDDLEWARE=False sends them through
+# the full MIDDLEWARE list. ``manage.py benchmark_middleware`` reports what
+# each middleware costs per request.
+LEAN_PUBLIC_MIDDLEWARE = os.environ.get('LEAN_PUBLIC_MIDDLEWARE', 'True') == 'True'
+LEAN_MIDDLEWARE_PATHS = [
+    '/api/track-pageview/',
+    '/api/pricing/',
+    '/api/submit-seller/',
+] if LEAN_PUBLIC_MIDDLEWARE else []
+LEAN_MIDDLEWARE = [
+    name for name in MIDDLEWARE if name in (
+        'sellers.middleware.InstrumentationMiddleware',
+        'corsheaders.middleware.CorsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'sellers.middleware.ReplicaRoutingMiddleware',
+        # Sets Content-Length, so gunicorn need not chunk the responses
+        'django.middleware.common.CommonMiddleware',
+    )
+]
+
+
+# Request instrumentation
+# InstrumentationMiddleware records a random INSTRUMENTATION_SAMPLE_RATE share
+# (0 to 1) of the requests: wall, database and serializer time, query count,
+# repeated queries and response size; see sellers/instrumentation.py. Each one
+# is logged as a JSON line on the sellers.instrumentation logger and, with
+# INSTRUMENTATION_SERVER_TIMING, sent back in a Server-Timing header. At 0 the
+# middleware drops out of the chain.
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', '0'))
+INSTRUMENTATION_SERVER_TIMING = os.environ.get('INSTRUMENTATION_SERVER_TIMING', 'True') == 'True'
+
+# Metrics
+# Set METRICS_DIR to serve Prometheus metrics at /internal/metrics: request
+# latency and database queries per URL name, cache hit ratios and the
+# submission queue; see sellers/metrics.py. Every process records into its
+# own files in METRICS_DIR, which gunicorn.conf.py empties when the master
+# starts. Scrapers send METRICS_TOKEN as a bearer token or, without a token,
+# connect directly (not through a proxy) from METRICS_ALLOWED_IPS.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Slow-query log
+# Off by default. Queries that take SLOW_QUERY_THRESHOLD_MS or longer (0 turns
+# the log off) are written to SLOW_QUERY_LOG, under LOG_DIR outside the
+# project, with their call site and, with SLOW_QUERY_EXPLAIN, their EXPLAIN
+# plan; see sellers/slow_queries.py. Parameters hold sellers' personal data,
+# so they are only written with SLOW_QUERY_LOG_PARAMS. The file rotates at
+# SLOW_QUERY_LOG_MAX_BYTES, keeping SLOW_QUERY_LOG_BACKUPS old files.
+# /admin/slow-queries/ ranks the logged statements by total time.
+LOG_DIR = os.environ.get('LOG_DIR', '/var/log/oysloe-admin')
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '0'))
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'False') == 'True'
+SLOW_QUERY_LOG_PARAMS = os.environ.get('SLOW_QUERY_LOG_PARAMS', 'False') == 'True'
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', os.path.join(LOG_DIR, 'slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': SLOW_QUERY_LOG_MAX_BYTES,
+            'backupCount': SLOW_QUERY_LOG_BACKUPS,
+            'encoding': 'utf-8',
+            # Not created until the first slow query
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'sellers.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'sellers.slow_queries': {'handlers': ['slow_queries'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Point CACHE_BACKEND/CACHE_LOCATION at a shared backend (e.g. Redis or a
+# file-based cache) so invalidations are seen by every gunicorn worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'oysloe-admin'),
     }
 }
 
@@ -131,13 +313,53 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
-# Create static directory if it doesn't exist
-static_dir = BASE_DIR / 'static'
-if not static_dir.exists():
-    static_dir.mkdir(exist_ok=True)
-
-
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Content-hashed, precompressed static files, with AVIF/WebP variants of the
+# large images (see oysloe_admin/images.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'oysloe_admin.storage.OptimizedStaticFilesStorage',
+    },
+}
+# Files missing from the manifest are hashed on the fly rather than failing
+# the request, e.g. before the first collectstatic with this storage
+WHITENOISE_MANIFEST_STRICT = False
+# AVIF is already compressed, like the other image formats WhiteNoise skips
+WHITENOISE_SKIP_COMPRESS_EXTENSIONS = (
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'zip', 'gz', 'tgz', 'bz2', 'tbz', 'xz', 'br',
+    'swf', 'flv', 'woff', 'woff2', '3gp', '3gpp', 'asf', 'avi', 'm4v', 'mov', 'mp4', 'mpeg',
+    'mpg', 'webm', 'wmv',
+)
+
+# Incremental collectstatic: only files whose content changed are compressed
+# again, by STATICFILES_COMPRESS_WORKERS processes (default: one per CPU).
+# Files no source produces any more are deleted once they have been orphaned
+# for STATICFILES_PRUNE_GRACE seconds. Run collectstatic under the full
+# server profile; the public one does not prune.
+STATICFILES_COMPRESS_WORKERS = int(os.environ.get('STATICFILES_COMPRESS_WORKERS', '0')) or None
+STATICFILES_PRUNE_GRACE = int(os.environ.get('STATICFILES_PRUNE_GRACE', '86400'))
+
+# Responsive image variants, generated by collectstatic for PNG/JPEG files of
+# at least STATIC_IMAGE_MIN_SIZE bytes outside STATIC_IMAGE_EXCLUDE: each of
+# STATIC_IMAGE_WIDTHS narrower than the image, in STATIC_IMAGE_FORMATS and
+# the original format. Use them with {% srcset %} from responsive_images.
+STATIC_IMAGE_WIDTHS = [480, 960, 1600]
+STATIC_IMAGE_FORMATS = ['avif', 'webp']
+STATIC_IMAGE_MIN_SIZE = 20 * 1024
+STATIC_IMAGE_EXCLUDE = ['admin/', 'jazzmin/', 'rest_framework/', 'vendor/']
+
+# Landing page assets, built by collectstatic (see oysloe_admin/assets.py).
+# CRITICAL_CSS maps a page to the stylesheet whose above-the-fold rules are
+# inlined into it by {% stylesheet %}. STATIC_BUNDLES maps a bundle to the
+# scripts concatenated and minified into it, in order, for {% bundle %}. The
+# build report estimates the time to first render on a network with
+# ASSET_REPORT_RTT_MS round trips and ASSET_REPORT_BANDWIDTH_KBPS (slow 4G).
+CRITICAL_CSS = {'index.html': 'styles.css'}
+STATIC_BUNDLES = {'bundles/landing.js': ['landing.js', 'script.js']}
+ASSET_REPORT_RTT_MS = 150
+ASSET_REPORT_BANDWIDTH_KBPS = 1600
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -157,6 +379,77 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Upper bound for ?page_size= on the sellers and analytics APIs, and the most
+# rows counted for ?count=approx on databases without planner estimates
+API_MAX_PAGE_SIZE = 100
+API_APPROXIMATE_COUNT_LIMIT = 10000
+
+# Analytics counters
+# Page views and form submissions are buffered in-process and written back
+# at most once every ANALYTICS_FLUSH_INTERVAL seconds per worker. With
+# ANALYTICS_FLUSH_TIMER a background thread writes back the hits of a worker
+# that has gone idle one interval after they arrived; a killed worker loses at
+# most its last interval of hits.
+ANALYTICS_FLUSH_INTERVAL = float(os.environ.get('ANALYTICS_FLUSH_INTERVAL', '5'))
+ANALYTICS_FLUSH_TIMER = os.environ.get('ANALYTICS_FLUSH_TIMER', 'True') == 'True'
+
+# Number of AnalyticsShard rows each hour is spread over. The rollup_analytics
+# command compacts closed hours into HourlyAnalytics and daily Analytics rows.
+ANALYTICS_SHARDS = int(os.environ.get('ANALYTICS_SHARDS', '8'))
+
+# Seconds the admin dashboard context stays cached between seller changes
+ADMIN_DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('ADMIN_DASHBOARD_CACHE_TIMEOUT', '30'))
+
+# Pricing API: the serialized plans stay cached for PRICING_CACHE_TIMEOUT
+# seconds, checked against a version key that every plan save or delete
+# replaces. Plan changes show up immediately in every worker sharing the
+# cache; with the per-process local-memory cache, other processes pick them
+# up within PRICING_CACHE_TIMEOUT. Browsers may reuse a response for
+# PRICING_MAX_AGE seconds before revalidating with its ETag.
+PRICING_CACHE_TIMEOUT = 3600
+PRICING_MAX_AGE = 60
+
+# Landing pages
+# index/register/privacy/terms/help.html are served prerendered, with gzip
+# and brotli variants; see oysloe_admin/pages.py. ``manage.py warm_pages``
+# renders them into PAGE_CACHE_DIR at deploy time. Workers re-render a page
+# PAGE_CACHE_TIMEOUT seconds after it was rendered, and browsers may reuse it
+# for PAGE_CACHE_MAX_AGE seconds before revalidating with its ETag. Off by
+# default under DEBUG, so that template edits show up on reload.
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', str(not DEBUG)) == 'True'
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', str(BASE_DIR / 'pagecache'))
+PAGE_CACHE_TIMEOUT = 86400
+PAGE_CACHE_MAX_AGE = 300
+
+# Serve the public endpoints (submit-seller, track-pageview, pricing) with
+# their async views. oysloe_admin/asgi.py turns this on; under WSGI the sync
+# views avoid running an event loop per request.
+ASYNC_PUBLIC_VIEWS = os.environ.get('ASYNC_PUBLIC_VIEWS', 'False') == 'True'
+
+# Seller submissions
+# 'sync' saves applications in the request. 'queue' appends them to the SQLite
+# journal at SELLER_SUBMISSION_QUEUE_PATH and answers 202; the
+# process_submissions command inserts them in batches. Claims older than
+# SELLER_SUBMISSION_LEASE seconds are replayed, entries that failed
+# SELLER_SUBMISSION_MAX_ATTEMPTS times are kept aside, and the form goes back to
+# synchronous inserts while the journal holds SELLER_SUBMISSION_QUEUE_MAX_DEPTH.
+SELLER_SUBMISSION_MODE = os.environ.get('SELLER_SUBMISSION_MODE', 'sync')
+SELLER_SUBMISSION_QUEUE_PATH = os.environ.get(
+    'SELLER_SUBMISSION_QUEUE_PATH', str(BASE_DIR / 'submissions.sqlite3')
+)
+SELLER_SUBMISSION_LEASE = 300
+SELLER_SUBMISSION_MAX_ATTEMPTS = 5
+SELLER_SUBMISSION_QUEUE_MAX_DEPTH = 10000
+
+# Seller search
+# SELLER_SEARCH_BACKEND is 'auto', 'sqlite' (FTS5), 'postgres' (tsvector and
+# trigram), 'basic' (icontains) or a dotted path to a backend class. A ranked
+# search that takes longer than SELLER_SEARCH_BUDGET_MS falls back to the first
+# SELLER_SEARCH_MAX_RESULTS unranked matches.
+SELLER_SEARCH_BACKEND = os.environ.get('SELLER_SEARCH_BACKEND', 'auto')
+SELLER_SEARCH_MAX_RESULTS = 200
+SELLER_SEARCH_BUDGET_MS = 200
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
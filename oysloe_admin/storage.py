@@ -0,0 +1,245 @@
+"""
+Static files storage: WhiteNoise's compressed manifest storage, plus the
+responsive image variants described in oysloe_admin/images.py, the critical
+CSS, script bundles and page report of oysloe_admin/assets.py, and an
+incremental build.
+
+Nearly all of collectstatic's time goes to compressing every file with
+brotli and gzip on every run. ``staticfiles.build.json`` in STATIC_ROOT
+records the content hash of each compressed file and its compressed
+outputs. The next run only compresses files whose content changed, and
+spreads them over STATICFILES_COMPRESS_WORKERS processes. Files that no
+source produces any more (old hashed names, removed assets and their
+variants) are deleted once they have been orphaned for
+STATICFILES_PRUNE_GRACE seconds, so pages still cached by browsers keep
+working across a deploy.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from whitenoise.compress import Compressor
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from . import assets, images, pages
+
+logger = logging.getLogger(__name__)
+
+BUILD_MANIFEST = 'staticfiles.build.json'
+
+
+def file_digest(path):
+    with open(path, 'rb') as file:
+        return hashlib.file_digest(file, 'sha256').hexdigest()[:32]
+
+
+def _compress(path, extensions):
+    """Compress one file in a worker process and return the files written"""
+    return Compressor(extensions=extensions, quiet=True).compress(path)
+
+
+class OptimizedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Generate image variants before the files are hashed, and compress incrementally"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            return
+
+        paths = dict(paths)
+        self.build = self.load_build_manifest()
+        self.compressed = {}
+        self.generate_image_variants(paths)
+        bundles = self.generate_bundles(paths)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        assets.write_json(self.location, assets.ASSETS_MANIFEST, {
+            'bundles': bundles, 'critical': self.extract_critical_css(),
+        })
+        assets._manifest = None
+        assets.write_json(self.location, assets.REPORT, assets.report(self.location, pages.page_templates()))
+
+        orphans = self.prune(paths)
+        self.save_build_manifest({'compressed': self.compressed, 'orphans': orphans})
+
+    def load_build_manifest(self):
+        try:
+            with self.open(BUILD_MANIFEST) as file:
+                return json.loads(file.read())
+        except (OSError, ValueError):
+            return {}
+
+    def save_build_manifest(self, build):
+        if self.exists(BUILD_MANIFEST):
+            self.delete(BUILD_MANIFEST)
+        self._save(BUILD_MANIFEST, ContentFile(json.dumps(build, indent=1, sort_keys=True).encode()))
+
+    def compress_files(self, paths):
+        """Compress the files whose content changed since the last build, in parallel"""
+        extensions = getattr(settings, 'WHITENOISE_SKIP_COMPRESS_EXTENSIONS', None)
+        compressor = self.create_compressor(extensions=extensions, quiet=True)
+        previous = self.build.get('compressed', {})
+
+        pending = {}
+        for name in paths:
+            if not compressor.should_compress(name):
+                continue
+            digest = file_digest(self.path(name))
+            entry = previous.get(name)
+            if entry and entry['digest'] == digest and all(self.exists(output) for output in entry['outputs']):
+                self.compressed[name] = entry
+            else:
+                pending[name] = digest
+
+        workers = getattr(settings, 'STATICFILES_COMPRESS_WORKERS', None) or os.cpu_count() or 1
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {name: executor.submit(_compress, self.path(name), extensions) for name in pending}
+                for name, future in futures.items():
+                    yield from self.record_compressed(name, pending[name], future.result())
+        else:
+            for name, digest in pending.items():
+                yield from self.record_compressed(name, digest, _compress(self.path(name), extensions))
+
+    def record_compressed(self, name, digest, outputs):
+        prefix = len(self.path(name)) - len(name)
+        outputs = [output[prefix:] for output in outputs]
+        self.compressed[name] = {'digest': digest, 'outputs': outputs}
+        for output in outputs:
+            yield name, output
+
+    def prune(self, paths):
+        """Delete files no source produces any more, once they have been orphaned long enough"""
+        if getattr(settings, 'SERVER_PROFILE', 'full') != 'full':
+            # Without the admin apps their files would look orphaned
+            logger.warning('Not pruning static files outside the full server profile')
+            return self.build.get('orphans', {})
+
+        live = set(paths) | set(self.hashed_files.values()) | {
+            self.manifest_name, images.IMAGES_MANIFEST, assets.ASSETS_MANIFEST, assets.REPORT, BUILD_MANIFEST,
+        }
+        for entry in self.compressed.values():
+            live.update(entry['outputs'])
+
+        grace = getattr(settings, 'STATICFILES_PRUNE_GRACE', 86400)
+        now = time.time()
+        seen = self.build.get('orphans', {})
+        orphans = {}
+        root = Path(self.location)
+        for path in root.rglob('*'):
+            name = path.relative_to(root).as_posix()
+            if not path.is_file() or name in live:
+                continue
+            orphaned_at = seen.get(name, now)
+            if now - orphaned_at >= grace:
+                path.unlink()
+                logger.info('Pruned %s', name)
+            else:
+                orphans[name] = orphaned_at
+        return orphans
+
+    def generate_bundles(self, paths):
+        """Write the script bundles of STATIC_BUNDLES and add them to ``paths`` for hashing"""
+        built = {}
+        for name, sources in getattr(settings, 'STATIC_BUNDLES', {}).items():
+            missing = [source for source in sources if source not in paths]
+            if missing:
+                logger.warning('Not bundling %s: %s not found', name, ', '.join(missing))
+                continue
+            scripts = []
+            for source in sources:
+                storage, path = paths[source]
+                with storage.open(path) as file:
+                    scripts.append(file.read().decode())
+            content = assets.bundle(scripts).encode()
+            if self.exists(name):
+                with self.open(name) as file:
+                    unchanged = file.read() == content
+                if not unchanged:
+                    self.delete(name)
+            if not self.exists(name):
+                self._save(name, ContentFile(content))
+            paths[name] = (self, name)
+            built[name] = sources
+        return built
+
+    def extract_critical_css(self):
+        """The above-the-fold CSS of each CRITICAL_CSS page, from its hashed stylesheet"""
+        critical = {}
+        for template_name, stylesheet in getattr(settings, 'CRITICAL_CSS', {}).items():
+            hashed = self.hashed_files.get(self.hash_key(self.clean_name(stylesheet)))
+            if hashed is None:
+                logger.warning('Not inlining critical CSS into %s: %s not found', template_name, stylesheet)
+                continue
+            with self.open(hashed) as file:
+                css = file.read().decode()
+            critical[template_name] = {
+                'stylesheet': stylesheet,
+                'css': assets.critical_css(css, assets.above_the_fold(template_name), urljoin(self.base_url, hashed)),
+            }
+        return critical
+
+    def generate_image_variants(self, paths):
+        """Write the variants of every candidate image and add them to ``paths`` for hashing"""
+        if images.Image is None:
+            logger.warning('Pillow is not installed; static images get no responsive variants')
+            return
+
+        previous = images.load_manifest(self.location)
+        manifest = {}
+        for name in sorted(paths):
+            storage, path = paths[name]
+            if not images.is_candidate(name, storage.size(path)):
+                continue
+            try:
+                manifest[name] = entry = self.image_variants(name, storage, path, previous.get(name))
+            except (OSError, ValueError) as e:
+                # A corrupt or unsupported image is served as it is
+                logger.warning('Skipping variants of %s: %s', name, e)
+                continue
+            for by_width in entry['variants'].values():
+                for variant in by_width.values():
+                    if variant != name:
+                        paths[variant] = (self, variant)
+
+        images.write_manifest(self.location, manifest)
+
+    def image_variants(self, name, storage, path, previous):
+        source_modified = storage.get_modified_time(path)
+        with storage.open(path) as file:
+            image = images.open_image(file)
+            width, height = image.size
+            source_size = storage.size(path)
+            planned = images.plan(name, width)
+
+            variants = {}
+            for fmt, by_width in planned.items():
+                variants[fmt] = {}
+                for variant_width, variant in by_width.items():
+                    if variant == name:
+                        variants[fmt][str(variant_width)] = variant
+                        continue
+                    # Unchanged since the last collectstatic
+                    reused = (
+                        previous and variant in previous['variants'].get(fmt, {}).values()
+                        and self.exists(variant) and self.get_modified_time(variant) >= source_modified
+                    )
+                    if not reused:
+                        content = images.encode(image, variant_width, fmt)
+                        # No point in a "modern" full-size copy that is larger than the original
+                        if variant_width == width and len(content) >= source_size:
+                            continue
+                        if self.exists(variant):
+                            self.delete(variant)
+                        self._save(variant, ContentFile(content))
+                    variants[fmt][str(variant_width)] = variant
+                if not variants[fmt]:
+                    del variants[fmt]
+        return {'width': width, 'height': height, 'variants': variants}
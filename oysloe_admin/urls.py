@@ -17,24 +17,25 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.views.generic import TemplateView
 from django.conf.urls.static import static
 
+from sellers.views import slow_query_report
+
+from .public_urls import internal, pages
+
 # Configure admin site
 admin.site.site_header = "OYSLOE Marketplace Admin"
 admin.site.site_title = "OYSLOE Admin Portal"
 admin.site.index_title = "Welcome to OYSLOE Marketplace Administration"
 
 urlpatterns = [
+    # Ahead of the admin's catch-all patterns
+    path('admin/slow-queries/', admin.site.admin_view(slow_query_report), name='slow-queries'),
     path('admin/', admin.site.urls),
     path('api/', include(('sellers.urls', 'sellers'), namespace='sellers')),
+    *internal,
     # Serve static HTML files
-    path('', TemplateView.as_view(template_name='index.html'), name='home'),
-    path('index.html', TemplateView.as_view(template_name='index.html'), name='home'),
-    path('register.html', TemplateView.as_view(template_name='register.html'), name='register'),
-    path('privacy.html', TemplateView.as_view(template_name='privacy.html'), name='privacy'),
-    path('terms.html', TemplateView.as_view(template_name='terms.html'), name='terms'),
-    path('help.html', TemplateView.as_view(template_name='help.html'), name='help'),
+    *pages,
 ]
 
 # Serve static files in development
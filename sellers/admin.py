@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Seller, Analytics, PricingPlan
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from . import stats
+from .models import Seller, Analytics, HourlyAnalytics, PricingPlan
+from .search import get_search_backend
 
 @admin.register(PricingPlan)
 class PricingPlanAdmin(admin.ModelAdmin):
@@ -40,6 +44,17 @@ class SellerAdmin(admin.ModelAdmin):
     search_fields = ['business_name', 'owner_name', 'email_address']
     filter_horizontal = ['assigned_admins']
 
+    def get_queryset(self, request):
+        # One query for every assigned admin on the page instead of one per row
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('assigned_admins', queryset=User.objects.only('username', 'first_name', 'last_name'))
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return get_search_backend().filter(queryset, search_term), False
+
     def assigned_admins_display(self, obj):
         return ", ".join([admin.get_full_name() or admin.username for admin in obj.assigned_admins.all()])
     assigned_admins_display.short_description = 'Assigned Admins'
@@ -64,3 +79,22 @@ class AnalyticsAdmin(admin.ModelAdmin):
     list_display = ['date', 'page_views', 'form_submissions']
     list_filter = ['date']
     readonly_fields = ['date']
+
+    # Direct edits of the daily totals bypass the snapshot's adjustments
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        stats.analytics_edited()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        stats.analytics_edited()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        stats.analytics_edited()
+
+@admin.register(HourlyAnalytics)
+class HourlyAnalyticsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'hour', 'page_views', 'form_submissions']
+    list_filter = ['date']
+    readonly_fields = ['date', 'hour']
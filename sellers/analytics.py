@@ -0,0 +1,145 @@
+"""
+Time-series store for page views and form submissions.
+
+Writers add to one of ``ANALYTICS_SHARDS`` randomly chosen ``AnalyticsShard``
+rows for the current hour, so concurrent workers rarely touch the same row.
+``rollup()`` (run by the ``rollup_analytics`` command) moves the counts of
+closed hours into ``HourlyAnalytics`` and the daily ``Analytics`` rows. Reads
+combine the compacted rows with whatever has not been rolled up yet.
+"""
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Analytics, AnalyticsShard, HourlyAnalytics
+
+FIELDS = ('page_views', 'form_submissions')
+
+# Sent inside the write transaction of ``record`` with the applied ``batch``.
+analytics_recorded = Signal()
+
+
+def _upsert(model, lookup, counts):
+    """Add ``counts`` to the row matching ``lookup``, creating it if needed"""
+    increments = {field: F(field) + count for field, count in counts.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **counts)
+    except IntegrityError:
+        # Another writer created the row between our UPDATE and INSERT.
+        model.objects.filter(**lookup).update(**increments)
+
+
+def record(batch):
+    """Apply a ``{(date, hour, field): count}`` batch, one upsert per hour"""
+    per_hour = defaultdict(dict)
+    for (date, hour, field), count in batch.items():
+        if count:
+            per_hour[(date, hour)][field] = count
+
+    shards = getattr(settings, 'ANALYTICS_SHARDS', 8)
+    with transaction.atomic():
+        for (date, hour), counts in per_hour.items():
+            lookup = {'date': date, 'hour': hour, 'shard': random.randrange(shards)}
+            _upsert(AnalyticsShard, lookup, counts)
+        analytics_recorded.send(sender=AnalyticsShard, batch=batch)
+
+
+def rollup(now=None):
+    """Compact the shards of every closed hour into hourly and daily rows.
+
+    Counts are moved by subtracting them from the shard rather than deleting
+    it, so increments that land on a shard while the rollup runs are kept
+    for the next pass. Returns the number of (date, hour) buckets compacted.
+    """
+    now = now or timezone.now()
+    closed = Q(date__lt=now.date()) | Q(date=now.date(), hour__lt=now.hour)
+
+    with transaction.atomic():
+        shards = list(
+            AnalyticsShard.objects.filter(closed).values('id', 'date', 'hour', *FIELDS)
+        )
+        hourly = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+        daily = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+
+        for shard in shards:
+            counts = {field: shard[field] for field in FIELDS}
+            AnalyticsShard.objects.filter(id=shard['id']).update(
+                **{field: F(field) - count for field, count in counts.items()}
+            )
+            for field, count in counts.items():
+                hourly[(shard['date'], shard['hour'])][field] += count
+                daily[shard['date']][field] += count
+
+        for (date, hour), counts in hourly.items():
+            _upsert(HourlyAnalytics, {'date': date, 'hour': hour}, counts)
+        for date, counts in daily.items():
+            _upsert(Analytics, {'date': date}, counts)
+
+        AnalyticsShard.objects.filter(
+            id__in=[shard['id'] for shard in shards], page_views=0, form_submissions=0
+        ).delete()
+
+    return len(hourly)
+
+
+def daily_series(start_date):
+    """Per-day totals since ``start_date``, including counts not yet rolled up"""
+    days = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+
+    for row in Analytics.objects.filter(date__gte=start_date).values('date', *FIELDS):
+        for field in FIELDS:
+            days[row['date']][field] += row[field]
+
+    pending = AnalyticsShard.objects.filter(date__gte=start_date).values('date').annotate(
+        page_views=Sum('page_views'), form_submissions=Sum('form_submissions')
+    )
+    for row in pending:
+        for field in FIELDS:
+            days[row['date']][field] += row[field]
+
+    return [{'date': date, **counts} for date, counts in sorted(days.items())]
+
+
+def hourly_series(date):
+    """Per-hour totals for ``date``, including counts not yet rolled up"""
+    hours = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+
+    for row in HourlyAnalytics.objects.filter(date=date).values('hour', *FIELDS):
+        for field in FIELDS:
+            hours[row['hour']][field] += row[field]
+
+    pending = AnalyticsShard.objects.filter(date=date).values('hour').annotate(
+        page_views=Sum('page_views'), form_submissions=Sum('form_submissions')
+    )
+    for row in pending:
+        for field in FIELDS:
+            hours[row['hour']][field] += row[field]
+
+    return [{'hour': hour, **counts} for hour, counts in sorted(hours.items())]
+
+
+def period_totals(start_date):
+    """Totals and day count since ``start_date`` along with the daily breakdown"""
+    series = daily_series(start_date)
+    return {
+        'total_views': sum(day['page_views'] for day in series),
+        'total_submissions': sum(day['form_submissions'] for day in series),
+        'total_days': len(series),
+        'daily_data': series,
+    }
+
+
+def period_start(period, today=None):
+    """First day included in a ``today``/``7days``/``30days``/``90days`` period"""
+    today = today or timezone.now().date()
+    days = {'today': 0, '7days': 7, '30days': 30, '90days': 90}.get(period, 7)
+    return today - timedelta(days=days)
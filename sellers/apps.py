@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class SellersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sellers'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import slow_queries
+
+        if slow_queries.threshold():
+            slow_queries.install()
@@ -0,0 +1,555 @@
+"""
+Helpers for the load benchmarks run by the ``benchmark_*`` commands.
+
+``run_load`` sends requests straight into Django's ``WSGIHandler`` rather
+than the test client, so connection handling (``CONN_MAX_AGE``,
+``close_old_connections``) behaves as it does under gunicorn. Each worker is
+a separate process started with ``spawn``. It loads the settings under its
+own environment and runs its requests from a pool of threads.
+
+``measure_middleware`` times single requests in one process through
+growing prefixes of MIDDLEWARE, to tell what each middleware adds.
+
+``run_server`` and ``hold_connections`` load a real server over TCP instead,
+to measure how many concurrent connections it serves within a latency
+budget. ``run_mix`` does the same with a weighted mix of endpoints and
+reports each one separately, while ``sample_rss`` follows the memory of the
+server's processes and ``count_queries`` counts the queries per request
+in-process.
+"""
+import asyncio
+import gc
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+SERVERS = {
+    # Sync gunicorn workers in front of the WSGI app
+    'wsgi': ['oysloe_admin.wsgi:application'],
+    # Uvicorn workers under gunicorn running the async public views
+    'asgi': ['oysloe_admin.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker'],
+}
+
+# Terms for ?search= on the sellers API: words of the business names seed_scale
+# generates (see sellers.seeding), and a miss
+SEARCH_TERMS = ('Golden', 'Accra', 'Fashion', 'Royal Mart', 'Electronics', 'Grace', 'zzqx')
+
+
+def wsgi_environ(method, path, body=b'', content_type='application/json', headers=None):
+    """A minimal WSGI environ for one request to the local handler"""
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    return environ
+
+
+def call_wsgi(application, environ):
+    """Run one request to completion and return its status code and body"""
+    status = []
+
+    def start_response(status_line, response_headers, exc_info=None):
+        status.append(int(status_line.split(' ', 1)[0]))
+
+    result = application(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        # Sends request_finished, which is where persistent connections are kept or closed
+        if hasattr(result, 'close'):
+            result.close()
+    return status[0], body
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(latencies, statuses, elapsed):
+    """Throughput and latency percentiles (in milliseconds) of a run"""
+    ok = sum(count for code, count in statuses.items() if int(code) < 400)
+    return {
+        'requests': len(latencies),
+        'errors': len(latencies) - ok,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0) * 1000, 2),
+    }
+
+
+def request_factory(endpoint, headers=None):
+    """Build environs for one of the benchmarked endpoints, or a GET of any path
+
+    ``headers`` are sent with every request, e.g. the session cookie for the
+    endpoints that need a login.
+    """
+    if endpoint == 'track-pageview':
+        return lambda i: wsgi_environ('POST', '/api/track-pageview/', headers=headers)
+    if endpoint == 'sellers-search':
+        return lambda i: wsgi_environ(
+            'GET', '/api/sellers/?search=' + SEARCH_TERMS[i % len(SEARCH_TERMS)].replace(' ', '+'), headers=headers
+        )
+    if endpoint == 'submit-seller':
+        def build(i):
+            body = json.dumps({
+                'business_name': f'Benchmark Shop {os.getpid()}-{i}',
+                'business_type': 'retailer',
+                'business_description': 'Benchmark application',
+                'owner_name': 'Benchmark Owner',
+                'email_address': f'bench{os.getpid()}-{i}@example.com',
+                'phone_number': '0552891234',
+                'location': 'Accra',
+                'experience_level': 'beginner',
+                'inventory_size': 'small',
+            }).encode()
+            return wsgi_environ('POST', '/api/submit-seller/', body, headers=headers)
+        return build
+    return lambda i: wsgi_environ('GET', endpoint, headers=headers)
+
+
+def _worker(env, endpoint, requests, threads, results):
+    os.environ.update(env)
+    import django
+    django.setup()
+    from django.core.handlers.wsgi import WSGIHandler
+
+    application = WSGIHandler()
+    build = request_factory(endpoint)
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            status, _body = call_wsgi(application, build(i))
+        except Exception:
+            status = 599
+        return time.perf_counter() - started, status
+
+    # Wall-clock bounds so throughput leaves out process start and django.setup()
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = list(pool.map(one, range(requests)))
+    finished = time.time()
+
+    from django.db import connections
+    connections.close_all()
+    results.put((samples, started, finished))
+
+
+def run_load(env, endpoint, requests=400, processes=4, threads=4):
+    """Send ``requests`` to ``endpoint`` from ``processes`` x ``threads`` workers"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    per_process = math.ceil(requests / processes)
+    workers = [
+        context.Process(target=_worker, args=(env, endpoint, per_process, threads, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    reports = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    samples = [sample for report in reports for sample in report[0]]
+    elapsed = max(report[2] for report in reports) - min(report[1] for report in reports)
+
+    statuses = {}
+    for _latency, status in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    return summarize([latency for latency, _status in samples], statuses, elapsed)
+
+
+def _middleware_worker(env, endpoints, requests, rounds, results):
+    os.environ.update(env)
+    import django
+    django.setup()
+    from django.conf import settings
+    from oysloe_admin.handlers import MiddlewareListWSGIHandler
+
+    # Every prefix of MIDDLEWARE, so each middleware is measured with the ones
+    # it depends on (auth needs sessions) already in front of it
+    stacks = {'none': []}
+    for i, name in enumerate(settings.MIDDLEWARE):
+        stacks[name] = settings.MIDDLEWARE[:i + 1]
+    stacks['lean'] = settings.LEAN_MIDDLEWARE
+    handlers = {label: MiddlewareListWSGIHandler(middleware) for label, middleware in stacks.items()}
+
+    report = {}
+    for endpoint in endpoints:
+        build = request_factory(endpoint)
+        samples = {label: [] for label in handlers}
+        # Alternate the stacks round by round so drift affects them all alike,
+        # and keep the garbage collector out of the timings, as timeit does
+        for _ in range(rounds):
+            for label, handler in handlers.items():
+                environs = [build(i) for i in range(requests)]
+                gc.collect()
+                gc.disable()
+                try:
+                    for environ in environs:
+                        started = time.perf_counter()
+                        call_wsgi(handler, environ)
+                        samples[label].append(time.perf_counter() - started)
+                finally:
+                    gc.enable()
+        report[endpoint] = {label: round(percentile(times, 50) * 1e6, 1) for label, times in samples.items()}
+
+    from django.db import connections
+    connections.close_all()
+    results.put(report)
+
+
+def measure_middleware(env, endpoints, requests=500, rounds=10):
+    """Microseconds per request to each endpoint through growing prefixes of MIDDLEWARE
+
+    Runs in a fresh process under ``env``. For every endpoint the result maps
+    'none' (no middleware), each middleware path (the stack up to and
+    including it) and 'lean' (LEAN_MIDDLEWARE) to the median request.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_middleware_worker, args=(env, endpoints, requests, rounds, results))
+    worker.start()
+    report = results.get()
+    worker.join()
+    return report
+
+
+def _login_worker(env, results):
+    os.environ.update(env)
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from django.test import Client
+
+    user = User.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+    client = Client()
+    client.force_login(user)
+    cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+    connections.close_all()
+    results.put({'Cookie': f'{settings.SESSION_COOKIE_NAME}={cookie}'})
+
+
+def seed_database(env, sellers, analytics_days, seed=0):
+    """Fill the database of ``env`` with ``seed_scale`` data, and log in a superuser
+
+    Returns the headers that authenticate requests as that superuser.
+    """
+    manage(env, 'seed_scale', '--sellers', str(sellers), '--days', str(analytics_days), '--seed', str(seed))
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_login_worker, args=(env, results))
+    worker.start()
+    headers = results.get()
+    worker.join()
+    return headers
+
+
+def _queries_worker(env, endpoints, requests, headers, results):
+    os.environ.update(env)
+    import django
+    django.setup()
+    from django.db import connections
+    from oysloe_admin.handlers import get_wsgi_application
+
+    application = get_wsgi_application()
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    report = {}
+    for endpoint in endpoints:
+        build = request_factory(endpoint, headers)
+        # The first request fills the per-process caches, as in a worker that is already serving
+        call_wsgi(application, build(0))
+        per_request = []
+        for i in range(1, requests + 1):
+            queries.clear()
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(count))
+                call_wsgi(application, build(i))
+            per_request.append(len(queries))
+        report[endpoint] = round(sum(per_request) / len(per_request), 2)
+
+    connections.close_all()
+    results.put(report)
+
+
+def count_queries(env, endpoints, requests=20, headers=None):
+    """Mean database queries per request to each endpoint, through the deployed WSGI application"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_queries_worker, args=(env, endpoints, requests, headers, results))
+    worker.start()
+    report = results.get()
+    worker.join()
+    return report
+
+
+def manage(env, *args):
+    """Run a management command in a subprocess under ``env`` (e.g. a scratch DATABASE_NAME)"""
+    from django.conf import settings
+
+    subprocess.run(
+        [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), *args],
+        env={**os.environ, **env}, check=True, stdout=subprocess.DEVNULL
+    )
+
+
+def _rss(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of a process and its children, e.g. a gunicorn master and its workers
+
+    Reads /proc, so it is 0 on systems without it.
+    """
+    children = []
+    for entry in Path('/proc').glob('[0-9]*/stat') if Path('/proc').is_dir() else ():
+        try:
+            # The command name in parentheses may contain spaces
+            fields = entry.read_text().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry.parent.name))
+    return _rss(pid) + sum(_rss(child) for child in children)
+
+
+@contextmanager
+def sample_rss(pid, interval=0.5):
+    """Follow the memory of a process tree while the block runs; yields a dict filled in with peak_mb and end_mb"""
+    result = {}
+    samples = []
+    stop = threading.Event()
+
+    def sample():
+        while not stop.is_set():
+            samples.append(process_tree_rss(pid))
+            stop.wait(interval)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield result
+    finally:
+        stop.set()
+        sampler.join()
+        samples.append(process_tree_rss(pid))
+        result['peak_mb'] = round(max(samples) / 2 ** 20, 1)
+        result['end_mb'] = round(samples[-1] / 2 ** 20, 1)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(command, env, port, startup_timeout=30):
+    """Start a server process and wait until it accepts connections on ``port``"""
+    process = subprocess.Popen(
+        command, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{command[0]} exited with status {process.returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{command[0]} did not start listening on port {port}")
+                time.sleep(0.2)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+async def http_request(port, environ, timeout):
+    """Send the request described by a ``wsgi_environ`` over a new connection"""
+    async def exchange():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            body = environ['wsgi.input'].getvalue()
+            path = environ['PATH_INFO'] + (f"?{environ['QUERY_STRING']}" if environ['QUERY_STRING'] else '')
+            head = (
+                f"{environ['REQUEST_METHOD']} {path} HTTP/1.1\r\n"
+                f"Host: localhost\r\nConnection: close\r\n"
+                f"Content-Type: {environ['CONTENT_TYPE']}\r\nContent-Length: {len(body)}\r\n"
+            )
+            for key, value in environ.items():
+                if key.startswith('HTTP_') and key != 'HTTP_HOST':
+                    head += f"{key[5:].replace('_', '-').title()}: {value}\r\n"
+            writer.write(head.encode() + b'\r\n' + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+def hold_connections(port, builders, concurrency, duration, timeout=10):
+    """Keep ``concurrency`` clients busy for ``duration`` seconds, cycling ``builders``"""
+    async def client(index, latencies, statuses, deadline):
+        i = index
+        while time.monotonic() < deadline:
+            environ = builders[i % len(builders)](i)
+            i += concurrency
+            started = time.perf_counter()
+            try:
+                status = await http_request(port, environ, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = 599
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def main():
+        latencies, statuses = [], {}
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(client(i, latencies, statuses, deadline) for i in range(concurrency)))
+        return summarize(latencies, statuses, time.perf_counter() - started)
+
+    return asyncio.run(main())
+
+
+def run_mix(port, mix, concurrency, duration, timeout=10, seed=0):
+    """Keep ``concurrency`` clients busy for ``duration`` seconds on a weighted mix of endpoints
+
+    ``mix`` maps a label to ``(weight, builder)``. Every client draws its
+    endpoints from its own generator seeded from ``seed``, so a run sends the
+    same sequence of requests each time. Returns the summary of all requests
+    and of each label.
+    """
+    labels = list(mix)
+    weights = [mix[label][0] for label in labels]
+
+    async def client(index, samples, deadline):
+        rng = random.Random(seed * 100003 + index)
+        i = index
+        while time.monotonic() < deadline:
+            label = rng.choices(labels, weights)[0]
+            environ = mix[label][1](i)
+            i += concurrency
+            started = time.perf_counter()
+            try:
+                status = await http_request(port, environ, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = 599
+            samples[label].append((time.perf_counter() - started, status))
+
+    async def main():
+        samples = {label: [] for label in labels}
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(client(i, samples, deadline) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        everything = [sample for label in labels for sample in samples[label]]
+        return {
+            'overall': _summarize_samples(everything, elapsed),
+            'endpoints': {label: _summarize_samples(samples[label], elapsed) for label in labels},
+        }
+
+    return asyncio.run(main())
+
+
+def _summarize_samples(samples, elapsed):
+    statuses = {}
+    for _latency, status in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    return summarize([latency for latency, _status in samples], statuses, elapsed)
+
+
+def compare(old, new, tolerance=0.1):
+    """Regressions of a ``benchmark_api`` result against an earlier one, as messages
+
+    Latency, throughput and memory may drift by ``tolerance`` (a fraction)
+    before they count. Any increase in errors or queries per request does.
+    """
+    regressions = []
+    for server, result in new['results'].items():
+        before = old['results'].get(server)
+        if before is None:
+            continue
+        if result['rss']['peak_mb'] > before['rss']['peak_mb'] * (1 + tolerance):
+            regressions.append(
+                f"{server}: peak RSS {before['rss']['peak_mb']} -> {result['rss']['peak_mb']} MB"
+            )
+        for endpoint, summary in result['endpoints'].items():
+            previous = before['endpoints'].get(endpoint)
+            if previous is None:
+                continue
+            label = f'{server} {endpoint}'
+            for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+                if summary[key] > previous[key] * (1 + tolerance):
+                    regressions.append(f"{label}: {key} {previous[key]} -> {summary[key]}")
+            if summary['throughput'] < previous['throughput'] * (1 - tolerance):
+                regressions.append(f"{label}: throughput {previous['throughput']} -> {summary['throughput']} req/s")
+            if summary['errors'] > previous['errors']:
+                regressions.append(f"{label}: errors {previous['errors']} -> {summary['errors']}")
+            if summary['queries_per_request'] > previous['queries_per_request']:
+                regressions.append(
+                    f"{label}: queries per request {previous['queries_per_request']} -> {summary['queries_per_request']}"
+                )
+    return regressions
@@ -0,0 +1,152 @@
+"""
+Buffered analytics counters.
+
+Page views and form submissions are accumulated in memory and handed to the
+sharded time-series store in ``sellers.analytics`` as one atomic
+``UPDATE ... SET page_views = page_views + n`` per hour. Each process flushes
+at most once every ``ANALYTICS_FLUSH_INTERVAL`` seconds, so database writes
+stay bounded no matter how much traffic the public endpoints receive.
+
+A hit that finds the interval elapsed flushes in its own request. Otherwise a
+timer thread, started when the buffer stops being empty, flushes it one
+interval later, so a worker that goes idle does not sit on its counts. The
+buffer is also flushed at normal exit. A process that is killed outright
+(SIGKILL after gunicorn's graceful_timeout, the OOM killer) loses the hits
+of at most its last interval, plus any whose flush failed and is waiting to
+be retried.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .analytics import record
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsBuffer:
+    """In-process buffer of pending analytics increments."""
+
+    FIELDS = ('page_views', 'form_submissions')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self._timer_pid = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 5)
+
+    def incr(self, field, amount=1, when=None):
+        """Record ``amount`` hits for ``field`` and flush if the interval elapsed"""
+        if self._add(field, amount, when):
+            self._flush_due()
+
+    async def aincr(self, field, amount=1, when=None):
+        """``incr`` for async views; a due flush runs in a worker thread"""
+        if self._add(field, amount, when):
+            await sync_to_async(self._flush_due)()
+
+    def _add(self, field, amount, when):
+        if field not in self.FIELDS:
+            raise ValueError(f"Unknown analytics field: {field}")
+
+        when = when or timezone.now()
+        with self._lock:
+            self._pending[(when.date(), when.hour, field)] += amount
+            self._schedule()
+            return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def _schedule(self):
+        """Start the idle flush timer unless one is running; call with ``_lock`` held"""
+        interval = self.flush_interval
+        if interval <= 0 or not getattr(settings, 'ANALYTICS_FLUSH_TIMER', True):
+            return
+        # A forked worker inherits the attribute but not the thread
+        if self._timer is not None and self._timer_pid == os.getpid():
+            return
+        self._timer = threading.Timer(interval, self._flush_idle)
+        self._timer.daemon = True
+        self._timer_pid = os.getpid()
+        self._timer.start()
+
+    def _flush_idle(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to flush analytics counters")
+            # Retry the batch that went back into the buffer
+            with self._lock:
+                if self._pending:
+                    self._schedule()
+        finally:
+            connections.close_all()
+
+    def _flush_due(self):
+        try:
+            self.flush(blocking=False)
+        except Exception:
+            # The counts are back in the buffer; the next flush retries them.
+            logger.exception("Failed to flush analytics counters")
+
+    def pending(self, field, date=None):
+        """Number of buffered hits for ``date`` not yet written to the database"""
+        date = date or timezone.now().date()
+        with self._lock:
+            return sum(
+                count for (day, _hour, name), count in self._pending.items()
+                if day == date and name == field
+            )
+
+    def flush(self, blocking=True):
+        """Write all buffered increments to the database.
+
+        Returns the number of hits written. If the write fails the batch is
+        merged back into the buffer so no counts are lost.
+        """
+        if not self._flush_lock.acquire(blocking=blocking):
+            return 0
+
+        try:
+            with self._lock:
+                batch, self._pending = self._pending, Counter()
+                self._last_flush = time.monotonic()
+
+            if not batch:
+                return 0
+
+            try:
+                record(batch)
+            except Exception:
+                with self._lock:
+                    self._pending.update(batch)
+                raise
+
+            return sum(batch.values())
+        finally:
+            self._flush_lock.release()
+
+
+analytics_buffer = AnalyticsBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        analytics_buffer.flush()
+    except Exception:
+        logger.exception("Failed to flush analytics counters on exit")
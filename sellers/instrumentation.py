@@ -0,0 +1,207 @@
+"""
+Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` records a random INSTRUMENTATION_SAMPLE_RATE
+share of the requests. For each one it notes:
+
+* wall time, measured from the outermost middleware;
+* database time and query count, over every connection alias;
+* repeated queries: the same SQL with the same parameters (``duplicate``),
+  and the same SQL with other parameters (``similar``, the N+1 pattern);
+* serializer time, spent in the ``to_representation`` and ``run_validation``
+  of ``TimedSerializerMixin`` serializers, less the queries they ran;
+* response size.
+
+Each request is logged as one JSON line on the ``sellers.instrumentation``
+logger. With INSTRUMENTATION_SERVER_TIMING the numbers also go in a
+``Server-Timing`` header, which browser dev tools show next to the request.
+
+Queries reach the recorder through an execute wrapper that is added to each
+connection as it opens. The recording lives in a context variable, so the
+async ORM's worker threads record into the right request. Requests that are
+not sampled only pay for a context variable lookup per query and per
+serialized object. At a sample rate of 0 the middleware removes itself from
+the chain and installs nothing, unless it also records the metrics of
+sellers/metrics.py, which it does for every request while METRICS_DIR is set.
+"""
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Repeated statements listed in the log line, most repeated first
+MAX_REPEATED_LOGGED = 5
+
+_recording = ContextVar('sellers_instrumentation', default=None)
+
+
+class Recording:
+    """What one request spent its time on
+
+    Requests that are only recorded for the metrics (see sellers/metrics.py)
+    are not ``detailed``: they skip the repeated-query and serializer
+    bookkeeping.
+    """
+
+    def __init__(self, detailed=True):
+        self.detailed = detailed
+        self.started = time.perf_counter()
+        self.wall_time = None
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.queries = 0
+        self.query_times = []
+        # (sql, params) -> executions
+        self.statements = {}
+        self.serializing = False
+
+    def query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_time += elapsed
+            self.queries += 1
+            self.query_times.append(elapsed)
+            if self.detailed:
+                key = (sql, repr(params))
+                self.statements[key] = self.statements.get(key, 0) + 1
+
+    def serialize(self, method, *args):
+        self.serializing = True
+        db_time = self.db_time
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.serializer_time += time.perf_counter() - started - (self.db_time - db_time)
+            self.serializing = False
+
+    def stop(self):
+        self.wall_time = time.perf_counter() - self.started
+
+    @property
+    def duplicate_queries(self):
+        """Executions that repeated an earlier query with the same parameters"""
+        return self.queries - len(self.statements)
+
+    @property
+    def similar_queries(self):
+        """Executions that repeated an earlier query's SQL, whatever the parameters"""
+        return self.queries - len({sql for sql, _params in self.statements})
+
+    def repeated(self):
+        """The SQL that ran more than once, with its executions"""
+        counts = {}
+        for (sql, _params), count in self.statements.items():
+            counts[sql] = counts.get(sql, 0) + count
+        return sorted(
+            ({'sql': sql, 'count': count} for sql, count in counts.items() if count > 1),
+            key=lambda statement: -statement['count']
+        )
+
+
+def _record_query(execute, sql, params, many, context):
+    recording = _recording.get()
+    if recording is None:
+        return execute(sql, params, many, context)
+    return recording.query(execute, sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    # First in the list, so that execute_wrapper() blocks, which pop the last
+    # wrapper on exit, never take this one off
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def install():
+    """Pass the queries of every connection through the recorder; safe to call again"""
+    connection_created.connect(_install, dispatch_uid='sellers.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+def sampled(rate):
+    return rate >= 1 or random.random() < rate
+
+
+def start(detailed=True):
+    """Record the current request; returns a token for ``stop``"""
+    return _recording.set(Recording(detailed))
+
+
+def stop(token):
+    recording = _recording.get()
+    _recording.reset(token)
+    recording.stop()
+    return recording
+
+
+def current():
+    """The recording of the current request, or None if it is not sampled"""
+    return _recording.get()
+
+
+def time_serializer(method, *args):
+    """Call ``method``, counting its time towards the request's serializer time"""
+    recording = _recording.get()
+    # Nested serializers are already inside the outer one's time
+    if recording is None or not recording.detailed or recording.serializing:
+        return method(*args)
+    return recording.serialize(method, *args)
+
+
+def response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    length = response.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def summary(recording, request, response):
+    """The fields of the request's log line"""
+    match = getattr(request, 'resolver_match', None)
+    return {
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'wall_ms': round(recording.wall_time * 1000, 2),
+        'db_ms': round(recording.db_time * 1000, 2),
+        'serializer_ms': round(recording.serializer_time * 1000, 2),
+        'queries': recording.queries,
+        'duplicate_queries': recording.duplicate_queries,
+        'similar_queries': recording.similar_queries,
+        'response_bytes': response_size(response),
+    }
+
+
+def server_timing(fields):
+    queries = f"{fields['queries']} queries, {fields['duplicate_queries']} duplicate"
+    return (
+        f"total;dur={fields['wall_ms']}, "
+        f"db;dur={fields['db_ms']};desc=\"{queries}\", "
+        f"serializer;dur={fields['serializer_ms']}"
+    )
+
+
+def report(recording, request, response):
+    """Log the request and add its Server-Timing header"""
+    fields = summary(recording, request, response)
+    if getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True):
+        timing = server_timing(fields)
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+    repeated = recording.repeated()[:MAX_REPEATED_LOGGED]
+    logger.info(json.dumps({**fields, 'repeated': repeated}, separators=(',', ':')), extra={'request_metrics': fields})
+    return response
@@ -0,0 +1,180 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from sellers.benchmarks import (
+    SERVERS, compare, count_queries, free_port, manage, request_factory, run_mix, run_server, sample_rss,
+    seed_database,
+)
+
+ENDPOINTS = {
+    'track-pageview': 'track-pageview',
+    'submit-seller': 'submit-seller',
+    'pricing': '/api/pricing/',
+    'sellers-search': 'sellers-search',
+    'dashboard-stats': '/api/dashboard/stats/',
+    'analytics-stats': '/api/analytics/get_stats/',
+}
+
+# Relative weights of the endpoints in the default workload
+MIX = {
+    'track-pageview': 35,
+    'pricing': 20,
+    'sellers-search': 15,
+    'dashboard-stats': 10,
+    'analytics-stats': 10,
+    'submit-seller': 10,
+}
+
+
+def weighted(value):
+    label, _, weight = value.partition('=')
+    if label not in ENDPOINTS or not weight.isdigit():
+        raise ValueError(value)
+    return label, int(weight)
+
+
+class Command(BaseCommand):
+    help = (
+        'Load the WSGI and ASGI deployments with a mixed workload over seeded data and write '
+        'latency, throughput, queries per request and memory to a JSON file'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+        parser.add_argument(
+            '--mix', nargs='+', type=weighted, metavar='ENDPOINT=WEIGHT',
+            help=f"Workload, e.g. pricing=3 track-pageview=1 (default: {' '.join(f'{k}={v}' for k, v in MIX.items())})"
+        )
+        parser.add_argument('--sellers', type=int, default=10000, help='Sellers to seed')
+        parser.add_argument('--analytics-days', type=int, default=730, help='Days of analytics history to seed')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the data and of the request sequence')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for both servers')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent connections')
+        parser.add_argument('--warmup', type=float, default=3, help='Seconds of load before measuring')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds of measured load per server')
+        parser.add_argument('--timeout', type=float, default=10, help='Seconds before a request counts as failed')
+        parser.add_argument('--query-requests', type=int, default=20, help='Requests per endpoint to count queries on')
+        parser.add_argument('--output', default='benchmark.json', help='File to write the results to')
+        parser.add_argument('--compare', metavar='FILE', help='Earlier results to check for regressions')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.1,
+            help='Fraction latency, throughput and memory may drift before it counts as a regression'
+        )
+
+    def handle(self, *args, **options):
+        mix = dict(options['mix'] or MIX.items())
+        config = {
+            key: options[key] for key in (
+                'sellers', 'analytics_days', 'seed', 'workers', 'concurrency', 'warmup', 'duration', 'query_requests',
+            )
+        }
+        config['mix'] = mix
+        results = {}
+
+        with tempfile.TemporaryDirectory() as directory:
+            seeded = Path(directory) / 'seeded.sqlite3'
+            env = self.environment(seeded)
+            manage(env, 'migrate', '--verbosity', '0')
+            manage(env, 'setup_pricing')
+            self.stdout.write(f"Seeding {options['sellers']} sellers and {options['analytics_days']} days of analytics")
+            headers = seed_database(env, options['sellers'], options['analytics_days'], options['seed'])
+
+            for name in options['servers']:
+                # Every server starts from the same data
+                database = Path(directory) / f'{name}.sqlite3'
+                shutil.copyfile(seeded, database)
+                env = self.environment(database, asynchronous=name == 'asgi')
+                results[name] = self.run(name, env, mix, headers, options)
+                self.report(name, results[name])
+
+        document = {'meta': self.meta(), 'config': config, 'results': results}
+        Path(options['output']).write_text(json.dumps(document, indent=2, sort_keys=True) + '\n')
+        self.stdout.write(f"Wrote {options['output']}")
+
+        if options['compare']:
+            self.check_regressions(options['compare'], document, options['tolerance'])
+
+    def environment(self, database, asynchronous=False):
+        return {
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'oysloe_admin.settings'),
+            'DATABASE_NAME': str(database),
+            'SELLER_SUBMISSION_MODE': 'sync',
+            'ASYNC_PUBLIC_VIEWS': str(asynchronous),
+        }
+
+    def run(self, name, env, mix, headers, options):
+        queries = count_queries(env, [ENDPOINTS[label] for label in mix], options['query_requests'], headers)
+        builders = {label: (weight, request_factory(ENDPOINTS[label], headers)) for label, weight in mix.items()}
+
+        port = free_port()
+        command = [
+            # Bare servers: leave out the tuning in gunicorn.conf.py
+            sys.executable, '-m', 'gunicorn', '--config', os.devnull, *SERVERS[name],
+            '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+            '--chdir', str(settings.BASE_DIR),
+        ]
+        with run_server(command, env, port) as process:
+            if options['warmup']:
+                run_mix(port, builders, options['concurrency'], options['warmup'], options['timeout'], options['seed'])
+            with sample_rss(process.pid) as rss:
+                summary = run_mix(
+                    port, builders, options['concurrency'], options['duration'], options['timeout'], options['seed']
+                )
+
+        for label, endpoint in summary['endpoints'].items():
+            endpoint['queries_per_request'] = queries[ENDPOINTS[label]]
+        return {**summary, 'rss': rss}
+
+    def meta(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created': timezone.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        }
+
+    def check_regressions(self, path, document, tolerance):
+        try:
+            previous = json.loads(Path(path).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        if previous['config'] != document['config']:
+            self.stdout.write(self.style.WARNING(f"{path} was run with other options; the comparison is approximate"))
+        regressions = compare(previous, document, tolerance)
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against {path}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {path}"))
+
+    def report(self, name, result):
+        overall = result['overall']
+        self.stdout.write(self.style.SUCCESS(
+            f"{name}: {overall['throughput']} req/s, p95 {overall['p95_ms']} ms, errors {overall['errors']}, "
+            f"peak RSS {result['rss']['peak_mb']} MB"
+        ))
+        for label, summary in result['endpoints'].items():
+            self.stdout.write(
+                f"  {label:<16} {summary['requests']:>6} req  {summary['throughput']:>8} req/s  "
+                f"p50 {summary['p50_ms']:>8} ms  p95 {summary['p95_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms  "
+                f"{summary['queries_per_request']:>5} queries  errors {summary['errors']}"
+            )
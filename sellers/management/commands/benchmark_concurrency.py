@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sellers.benchmarks import SERVERS, free_port, hold_connections, manage, request_factory, run_server
+
+ENDPOINTS = ('track-pageview', 'submit-seller', '/api/pricing/')
+
+
+class Command(BaseCommand):
+    help = 'Measure concurrent-connection capacity of the WSGI and ASGI deployments on the public endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+        parser.add_argument('--workers', type=int, default=1, help='gunicorn workers for both servers')
+        parser.add_argument(
+            '--concurrency', nargs='+', type=int, default=[8, 32, 128, 256],
+            help='Concurrent connections to hold, one level at a time'
+        )
+        parser.add_argument('--duration', type=float, default=5, help='Seconds per concurrency level')
+        parser.add_argument('--timeout', type=float, default=10, help='Seconds before a request counts as failed')
+        parser.add_argument(
+            '--slo-ms', type=float, default=1000,
+            help='p95 latency a level must stay under to count towards capacity'
+        )
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        builders = [request_factory(endpoint) for endpoint in options['endpoints']]
+        results = {}
+        for name in options['servers']:
+            with tempfile.TemporaryDirectory() as directory:
+                env = {
+                    'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'oysloe_admin.settings'),
+                    'DATABASE_NAME': str(Path(directory) / 'benchmark.sqlite3'),
+                    'SELLER_SUBMISSION_MODE': 'sync',
+                }
+                manage(env, 'migrate', '--verbosity', '0')
+                manage(env, 'setup_pricing')
+
+                port = free_port()
+                command = [
+                    # Bare servers: leave out the tuning in gunicorn.conf.py
+                    sys.executable, '-m', 'gunicorn', '--config', os.devnull, *SERVERS[name],
+                    '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+                    '--chdir', str(settings.BASE_DIR),
+                ]
+                levels = []
+                with run_server(command, env, port):
+                    for concurrency in options['concurrency']:
+                        summary = hold_connections(
+                            port, builders, concurrency, options['duration'], options['timeout']
+                        )
+                        levels.append({'concurrency': concurrency, **summary})
+                        if not options['json']:
+                            self.report(name, concurrency, summary)
+
+                results[name] = {
+                    'capacity': self.capacity(levels, options['slo_ms']),
+                    'levels': levels,
+                }
+                if not options['json']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{name}: serves {results[name]['capacity']} concurrent connections "
+                        f"with p95 under {options['slo_ms']:g} ms and under 1% errors"
+                    ))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def capacity(self, levels, slo_ms):
+        """Highest level held within the latency budget with under 1% errors"""
+        capacity = 0
+        for level in levels:
+            if level['p95_ms'] <= slo_ms and level['errors'] <= level['requests'] * 0.01:
+                capacity = max(capacity, level['concurrency'])
+        return capacity
+
+    def report(self, name, concurrency, summary):
+        self.stdout.write(
+            f"{name:<5} {concurrency:>5} conns  {summary['throughput']:>8} req/s  "
+            f"p50 {summary['p50_ms']:>8} ms  p95 {summary['p95_ms']:>8} ms  "
+            f"p99 {summary['p99_ms']:>8} ms  errors {summary['errors']}"
+        )
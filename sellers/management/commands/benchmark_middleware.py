@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from sellers.benchmarks import manage, measure_middleware
+
+ENDPOINTS = {
+    'track-pageview': 'track-pageview',
+    'pricing': '/api/pricing/',
+    'submit-seller': 'submit-seller',
+    'home': '/',
+}
+
+
+class Command(BaseCommand):
+    help = 'Report the per-request overhead of each middleware on the public endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoints', nargs='+', choices=ENDPOINTS, default=['track-pageview', 'pricing'],
+            help='submit-seller inserts a seller per request and takes much longer'
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Requests per stack and round')
+        parser.add_argument('--rounds', type=int, default=10, help='Rounds per stack, alternating between the stacks')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'oysloe_admin.settings'),
+                'DATABASE_NAME': str(Path(directory) / 'middleware.sqlite3'),
+                'SELLER_SUBMISSION_MODE': 'sync',
+                # Keep the page view counter in memory for the whole run
+                'ANALYTICS_FLUSH_INTERVAL': '3600',
+            }
+            manage(env, 'migrate', '--verbosity', '0')
+            report = measure_middleware(
+                env, [ENDPOINTS[endpoint] for endpoint in options['endpoints']],
+                requests=options['requests'], rounds=options['rounds']
+            )
+
+        results = {name: self.costs(report[ENDPOINTS[name]]) for name in options['endpoints']}
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.report(name, result)
+
+    def costs(self, timings):
+        """Split the cumulative timings into what each middleware adds"""
+        stacks = [label for label in timings if label not in ('none', 'lean')]
+        previous = timings['none']
+        middleware = {}
+        for label in stacks:
+            middleware[label] = round(timings[label] - previous, 1)
+            previous = timings[label]
+        return {
+            'view_us': timings['none'],
+            'middleware_us': middleware,
+            'full_us': timings[stacks[-1]] if stacks else timings['none'],
+            'lean_us': timings['lean'],
+        }
+
+    def report(self, name, result):
+        self.stdout.write(self.style.SUCCESS(
+            f"{name}: {result['full_us']} us through MIDDLEWARE, {result['lean_us']} us through "
+            f"LEAN_MIDDLEWARE, {result['view_us']} us without middleware"
+        ))
+        for middleware, us in result['middleware_us'].items():
+            self.stdout.write(f"  {middleware:<60} {us:>8} us")
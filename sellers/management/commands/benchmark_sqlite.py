@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from sellers.benchmarks import manage, run_load
+
+PROFILES = ('legacy', 'tuned')
+ENDPOINTS = ('track-pageview', 'submit-seller')
+
+
+class Command(BaseCommand):
+    help = 'Compare the legacy and tuned SQLite profiles under concurrent public-form traffic'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint and profile')
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes, like gunicorn workers')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per worker process')
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        results = []
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as directory:
+                env = {
+                    'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'oysloe_admin.settings'),
+                    'DATABASE_NAME': str(Path(directory) / 'benchmark.sqlite3'),
+                    'SQLITE_PROFILE': profile,
+                    'SELLER_SUBMISSION_MODE': 'sync',
+                    # Write the page view counter on every request, as the original view did
+                    'ANALYTICS_FLUSH_INTERVAL': '0',
+                }
+                manage(env, 'migrate', '--verbosity', '0')
+                for endpoint in options['endpoints']:
+                    summary = run_load(
+                        env, endpoint, requests=options['requests'],
+                        processes=options['processes'], threads=options['threads']
+                    )
+                    results.append({'profile': profile, 'endpoint': endpoint, **summary})
+                    if not options['json']:
+                        self.report(profile, endpoint, summary)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def report(self, profile, endpoint, summary):
+        style = self.style.SUCCESS if not summary['errors'] else self.style.WARNING
+        self.stdout.write(style(
+            f"{profile:<7} {endpoint:<15} {summary['throughput']:>8} req/s  "
+            f"p50 {summary['p50_ms']:>7} ms  p95 {summary['p95_ms']:>7} ms  "
+            f"p99 {summary['p99_ms']:>7} ms  errors {summary['errors']}"
+        ))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sellers import submissions
+
+
+class Command(BaseCommand):
+    help = 'Insert queued seller applications in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Applications inserted per transaction (default: 500)'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and drain the queue every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='Seconds between passes when running with --loop (default: 1)'
+        )
+        parser.add_argument(
+            '--metrics', action='store_true',
+            help='Only print the queue depth, in-flight, failed and lag figures'
+        )
+
+    def handle(self, *args, **options):
+        queue = submissions.get_queue()
+        if options['metrics']:
+            for name, value in queue.metrics().items():
+                self.stdout.write(f'{name} {value}')
+            return
+
+        while True:
+            totals = submissions.drain(queue, batch_size=options['batch_size'])
+            if totals['processed'] or totals['failed'] or not options['loop']:
+                metrics = queue.metrics()
+                self.stdout.write(self.style.SUCCESS(
+                    f"Processed {totals['processed']} application(s) in {totals['batches']} batch(es), "
+                    f"created {totals['created']} seller(s), {totals['failed']} failed; "
+                    f"depth {metrics['depth']}, oldest {metrics['oldest_age']}s"
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,144 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sellers.benchmarks import manage
+
+PROFILES = ('full', 'public')
+
+# Runs in a fresh interpreter under -X importtime: boots the WSGI application,
+# serves one request and reports the timings as JSON on stdout. The request is
+# built inline so that no helper module shows up in the import profile.
+SCRIPT = '''
+import io, json, resource, sys, time
+started = time.perf_counter()
+from oysloe_admin.wsgi import application
+booted = time.perf_counter()
+sys.stderr.write('profile_startup: first request\\n')
+sys.stderr.flush()
+method, path = sys.argv[1], sys.argv[2]
+environ = {
+    'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+    'HTTP_HOST': 'localhost', 'REMOTE_ADDR': '127.0.0.1',
+    'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': '0',
+    'wsgi.input': io.BytesIO(b''), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+    'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+}
+status = []
+result = application(environ, lambda line, headers, exc_info=None: status.append(int(line[:3])))
+b''.join(result)
+result.close()
+finished = time.perf_counter()
+print(json.dumps({
+    'boot_ms': round((booted - started) * 1000, 1),
+    'first_request_ms': round((finished - booted) * 1000, 1),
+    'status': status[0],
+    'modules': len(sys.modules),
+    'maxrss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+}))
+'''
+
+MARKER = 'profile_startup: first request'
+
+
+def parse_importtime(stderr):
+    """Split ``-X importtime`` output into imports made while booting and during the first request
+
+    Each entry is ``(module, self_us, cumulative_us, depth)``.
+    """
+    phases = {'boot': [], 'first_request': []}
+    phase = 'boot'
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            phase = 'first_request'
+            continue
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        module = name.lstrip()
+        depth = (len(name) - len(module) - 1) // 2
+        phases[phase].append((module, int(self_us), int(cumulative_us), depth))
+    return phases
+
+
+def summarize_imports(entries, top):
+    """Total import time, self time per top-level package and the slowest imports"""
+    packages = Counter()
+    for module, self_us, _, _ in entries:
+        packages[module.split('.')[0]] += self_us
+    slowest = sorted(entries, key=lambda entry: entry[2], reverse=True)[:top]
+    ms = lambda us: round(us / 1000, 1)
+    return {
+        'total_ms': ms(sum(cumulative for _, _, cumulative, depth in entries if depth == 0)),
+        'modules': len(entries),
+        'packages_ms': {package: ms(us) for package, us in packages.most_common(top)},
+        'slowest_ms': {module: ms(cumulative) for module, _, cumulative, _ in slowest},
+    }
+
+
+class Command(BaseCommand):
+    help = 'Profile import time and time to first request of oysloe_admin.wsgi per server profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--method', default='POST')
+        parser.add_argument('--path', default='/api/track-pageview/', help='Path of the first request')
+        parser.add_argument('--runs', type=int, default=3, help='Boots per profile; the fastest is reported')
+        parser.add_argument('--top', type=int, default=15, help='Packages and imports listed per phase')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as directory:
+                env = {
+                    'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'oysloe_admin.settings'),
+                    'DATABASE_NAME': str(Path(directory) / 'startup.sqlite3'),
+                    'SERVER_PROFILE': profile,
+                }
+                manage(env, 'migrate', '--verbosity', '0')
+                runs = [self.boot(env, options['method'], options['path']) for _ in range(options['runs'])]
+            timings, stderr = min(runs, key=lambda run: run[0]['boot_ms'] + run[0]['first_request_ms'])
+            phases = parse_importtime(stderr)
+            results[profile] = {
+                **timings,
+                'imports': {phase: summarize_imports(entries, options['top']) for phase, entries in phases.items()},
+            }
+            if not options['json']:
+                self.report(profile, results[profile])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def boot(self, env, method, path):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT, method, path],
+            cwd=settings.BASE_DIR, env={**os.environ, **env}, capture_output=True, text=True
+        )
+        if process.returncode:
+            raise CommandError(f"Booting the {env['SERVER_PROFILE']} profile failed:\n{process.stderr[-2000:]}")
+        return json.loads(process.stdout.strip().splitlines()[-1]), process.stderr
+
+    def report(self, profile, result):
+        style = self.style.SUCCESS if result['status'] < 400 else self.style.WARNING
+        self.stdout.write(style(
+            f"{profile}: boot {result['boot_ms']} ms, first request {result['first_request_ms']} ms "
+            f"(HTTP {result['status']}), {result['modules']} modules, max RSS {result['maxrss_mb']} MiB"
+        ))
+        for phase, summary in result['imports'].items():
+            self.stdout.write(
+                f"  {phase}: {summary['modules']} imports in {summary['total_ms']} ms"
+            )
+            for package, ms in summary['packages_ms'].items():
+                self.stdout.write(f"    {package:<40} {ms:>8} ms self")
+            for module, ms in summary['slowest_ms'].items():
+                self.stdout.write(f"    {module:<40} {ms:>8} ms cumulative")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from sellers.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the seller full-text search index from the sellers table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of sellers indexed per batch (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {indexed} seller(s) with {type(backend).__name__}')
+        )
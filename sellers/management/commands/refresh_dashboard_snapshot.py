@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from sellers import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized dashboard statistics from scratch'
+
+    def handle(self, *args, **options):
+        snapshot = stats.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Dashboard snapshot rebuilt for {snapshot.analytics_date}: '
+                f'{snapshot.total_sellers} sellers, {snapshot.views_7days} views in the last 7 days'
+            )
+        )
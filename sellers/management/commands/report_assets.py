@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from oysloe_admin import assets
+
+
+class Command(BaseCommand):
+    help = 'Print the size and render-blocking report of the landing pages written by the last collectstatic'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        path = Path(settings.STATIC_ROOT) / assets.REPORT
+        try:
+            report = json.loads(path.read_text())
+        except (OSError, ValueError):
+            raise CommandError(f"No report at {path}; run collectstatic first")
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        network = report['network']
+        self.stdout.write(f"First render estimated at {network['rtt_ms']} ms round trips and {network['kbps']} kbit/s")
+        for template_name, page in report['pages'].items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{template_name}: {page['first_render_ms']} ms, {page['critical_path_bytes'] / 1024:.1f} KiB "
+                f"on the critical path"
+            ))
+            self.stdout.write(
+                f"  html {page['html']['bytes'] / 1024:.1f} KiB ({page['html']['transfer'] / 1024:.1f} KiB sent), "
+                f"inline CSS {page['inline_css'] / 1024:.1f} KiB, inline JS {page['inline_js'] / 1024:.1f} KiB"
+            )
+            for label in ('blocking', 'deferred'):
+                for resource in page[label]:
+                    self.stdout.write(
+                        f"  {label:<9} {resource['url']:<50} {resource['bytes'] / 1024:>7.1f} KiB "
+                        f"({resource['transfer'] / 1024:.1f} KiB sent)"
+                    )
+            for url in page['external_blocking']:
+                self.stdout.write(self.style.WARNING(f"  blocking  {url} (third party, not measured)"))
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sellers.benchmarks import free_port, http_request, manage, run_server, wsgi_environ
+
+MODES = {
+    'preload': {'GUNICORN_PRELOAD': 'True'},
+    'lazy': {'GUNICORN_PRELOAD': 'False'},
+}
+
+# A public endpoint and an admin page, so DRF, jazzmin and the templates all load
+WARMUP_PATHS = ('/api/pricing/', '/admin/login/')
+
+
+def memory(pid):
+    """RSS, PSS, private and shared memory of a process in MiB, from smaps_rollup"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    mib = lambda kb: round(kb / 1024, 1)
+    return {
+        'rss_mb': mib(fields.get('Rss', 0)),
+        'pss_mb': mib(fields.get('Pss', 0)),
+        'private_mb': mib(fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)),
+        'shared_mb': mib(fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)),
+    }
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as file:
+        return [int(child) for child in file.read().split()]
+
+
+class Command(BaseCommand):
+    help = 'Report per-worker memory and cold-start time of gunicorn with and without preload_app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--workers', type=int, default=4, help='WEB_CONCURRENCY for every mode')
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Warm-up requests sent before memory is measured'
+        )
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('report_workers reads /proc/<pid>/smaps_rollup and needs Linux 4.14+')
+
+        results = {}
+        for mode in options['modes']:
+            with tempfile.TemporaryDirectory() as directory:
+                env = {
+                    'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'oysloe_admin.settings'),
+                    'DATABASE_NAME': str(Path(directory) / 'report.sqlite3'),
+                    'WEB_CONCURRENCY': str(options['workers']),
+                    **MODES[mode],
+                }
+                manage(env, 'migrate', '--verbosity', '0')
+                results[mode] = self.measure(env, options['requests'])
+            if not options['json']:
+                self.report(mode, results[mode])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def measure(self, env, requests):
+        port = free_port()
+        command = [
+            sys.executable, '-m', 'gunicorn',
+            '--config', str(Path(settings.BASE_DIR) / 'gunicorn.conf.py'),
+            '--chdir', str(settings.BASE_DIR), '--bind', f'127.0.0.1:{port}',
+        ]
+        started = time.perf_counter()
+        with run_server(command, env, port) as server:
+            listening = time.perf_counter() - started
+
+            # The first requests pay for whatever a worker still has to import
+            first = {}
+            for path in WARMUP_PATHS:
+                request_started = time.perf_counter()
+                asyncio.run(http_request(port, wsgi_environ('GET', path), timeout=30))
+                first[path] = round((time.perf_counter() - request_started) * 1000, 1)
+            ready = time.perf_counter() - started
+
+            for i in range(requests):
+                path = WARMUP_PATHS[i % len(WARMUP_PATHS)]
+                asyncio.run(http_request(port, wsgi_environ('GET', path), timeout=30))
+
+            master = memory(server.pid)
+            workers = [{'pid': pid, **memory(pid)} for pid in children(server.pid)]
+
+        total = lambda key: round(sum(worker[key] for worker in workers), 1)
+        return {
+            'listening_s': round(listening, 3),
+            'ready_s': round(ready, 3),
+            'first_request_ms': first,
+            'master': master,
+            'workers': workers,
+            'workers_rss_mb': total('rss_mb'),
+            'workers_pss_mb': total('pss_mb'),
+            'workers_private_mb': total('private_mb'),
+        }
+
+    def report(self, mode, result):
+        self.stdout.write(self.style.SUCCESS(
+            f"{mode}: listening after {result['listening_s']}s, first responses after {result['ready_s']}s"
+        ))
+        for path, ms in result['first_request_ms'].items():
+            self.stdout.write(f"  first {path:<15} {ms:>8} ms")
+        master = result['master']
+        self.stdout.write(f"  master       rss {master['rss_mb']:>6} MiB  pss {master['pss_mb']:>6} MiB")
+        for worker in result['workers']:
+            self.stdout.write(
+                f"  worker {worker['pid']:<6}rss {worker['rss_mb']:>6} MiB  pss {worker['pss_mb']:>6} MiB  "
+                f"private {worker['private_mb']:>6} MiB  shared {worker['shared_mb']:>6} MiB"
+            )
+        self.stdout.write(
+            f"  workers total rss {result['workers_rss_mb']} MiB, pss {result['workers_pss_mb']} MiB, "
+            f"private {result['workers_private_mb']} MiB"
+        )
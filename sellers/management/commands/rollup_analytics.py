@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sellers import analytics
+
+
+class Command(BaseCommand):
+    help = 'Compact analytics shards of closed hours into hourly and daily totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and roll up every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval', type=int, default=300,
+            help='Seconds between rollups when running with --loop (default: 300)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            buckets = analytics.rollup()
+            self.stdout.write(
+                self.style.SUCCESS(f'Rolled up {buckets} hourly analytics bucket(s)')
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from sellers import seeding, stats
+
+
+def _insert_chunk(*args):
+    try:
+        return seeding.insert_chunk(*args)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic sellers and analytics history for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sellers', type=int, default=100000, help='Sellers to add')
+        parser.add_argument('--years', type=float, default=5, help='Years the sign-ups are spread over')
+        parser.add_argument('--days', type=int, default=5 * 365, help='Days of daily and hourly analytics to add')
+        parser.add_argument('--admins', type=int, default=20, help='Staff users who review and are assigned sellers')
+        parser.add_argument('--seed', type=int, default=0, help='The same seed and --until give the same rows')
+        parser.add_argument(
+            '--until', type=date.fromisoformat, default=None,
+            help='Day the history ends, as YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes generating and inserting chunks of sellers (default: one per CPU)'
+        )
+        parser.add_argument(
+            '--no-index', action='store_false', dest='index',
+            help='Leave the new sellers out of the search index (rebuild_search_index adds them later)'
+        )
+
+    def handle(self, *args, **options):
+        if options['sellers'] < 0 or options['days'] < 0:
+            raise CommandError('--sellers and --days cannot be negative')
+        until = options['until'] or timezone.localdate()
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+
+        admin_ids = seeding.ensure_admins(options['admins'])
+        start, end = seeding.history_window(options['years'], until)
+        first_id = seeding.next_seller_id()
+        tasks = [
+            (chunk, chunk_first_id, size, options['seed'], admin_ids, start, end, options['index'])
+            for chunk, chunk_first_id, size in seeding.chunks(options['sellers'], first_id)
+        ]
+
+        rows = 0
+        if options['workers'] > 1 and len(tasks) > 1:
+            # The workers open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'),
+                # Set up before the first task is unpickled, as that imports the models
+                initializer=django.setup,
+            ) as executor:
+                futures = [executor.submit(_insert_chunk, *task) for task in tasks]
+                for done, future in enumerate(as_completed(futures), 1):
+                    rows += future.result()
+                    self.progress(done, len(tasks), rows, started)
+        else:
+            for done, task in enumerate(tasks, 1):
+                rows += seeding.insert_chunk(*task)
+                self.progress(done, len(tasks), rows, started)
+        seeding.reset_sequences()
+
+        rows += seeding.seed_analytics(options['days'], options['seed'], until)
+        # bulk_create sends no signals, so the dashboard counters are recomputed
+        stats.rebuild()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {options['sellers']} sellers and {options['days']} days of analytics: "
+            f"{rows} rows in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/s)"
+        ))
+
+    def progress(self, done, total, rows, started):
+        if self.verbosity > 1 or done == total or done % 10 == 0:
+            self.stdout.write(
+                f"  {done}/{total} chunks of sellers, {rows} rows, {time.perf_counter() - started:.1f} s"
+            )
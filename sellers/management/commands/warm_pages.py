@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from oysloe_admin import pages
+
+
+class Command(BaseCommand):
+    help = 'Prerender the landing pages and their compressed variants into PAGE_CACHE_DIR'
+
+    def handle(self, *args, **options):
+        if pages.brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed; only gzip variants are written'))
+        for template_name in pages.page_templates():
+            started = time.perf_counter()
+            page = pages.render(template_name)
+            pages.save(template_name, page)
+            sizes = ', '.join(
+                f"{encoding} {len(content) / 1024:.1f} KiB" for encoding, content in page['variants'].items()
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{template_name}: {sizes} in {(time.perf_counter() - started) * 1000:.0f} ms"
+            ))
+        self.stdout.write(f"Wrote the pages to {pages.cache_dir()}")
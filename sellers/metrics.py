@@ -0,0 +1,428 @@
+"""
+Prometheus metrics, aggregated across worker processes.
+
+``/internal/metrics`` serves, in the Prometheus text format:
+
+* ``http_requests_total`` and ``http_request_duration_seconds`` per URL name
+  (``submit-seller``, ``pricing-api``, ``seller-list``, ...), method and status;
+* ``db_queries_per_request`` and ``db_query_duration_seconds`` per URL name;
+* ``cache_requests_total`` per cache and result, and ``cache_hit_ratio``;
+* the depth, in-flight claims, failures and lag of the submission queue.
+
+The request metrics are recorded by ``InstrumentationMiddleware`` from the
+same recording as sellers/instrumentation.py. They are kept in files under
+METRICS_DIR, a few per process: each recording borrows a file no other thread
+is writing to and hands it back, so a process has as many files as it ever
+had concurrent recordings, however many threads it goes through. Each file
+is memory-mapped, so recording a value is a read and a write to memory; the
+only lock is the one that lends the files out. A scrape reads every file and
+sums them; a value read halfway through an observation is simply a count
+behind.
+
+Files of processes that have exited are folded into one archive file on the
+next scrape, so counters survive worker restarts. That step takes a file
+lock, but it is only shared between scrapers. gunicorn.conf.py clears the
+directory when the master starts.
+"""
+import bisect
+import itertools
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from math import inf
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotFound
+from django.utils.crypto import constant_time_compare
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: the files of exited processes stay where they are
+    fcntl = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+INITIAL_SIZE = 64 * 1024
+ARCHIVE = 'archive.db'
+
+_HEADER = struct.Struct('I4x')
+_KEY_LENGTH = struct.Struct('I')
+_VALUE = struct.Struct('d')
+
+
+class ValueFile:
+    """Named float values in a memory-mapped file, written by a single thread
+
+    The file starts with the number of bytes in use. Each entry is the length
+    of its key, the UTF-8 key padded to 8 bytes, and a double. A new entry is
+    written in full before the header counts it, so readers never see half of
+    one.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.pid = os.getpid()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        self._file = os.fdopen(fd, 'r+b')
+        size = os.fstat(fd).st_size
+        if size < INITIAL_SIZE:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._mmap = mmap.mmap(fd, size)
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0] or _HEADER.size
+        self._positions = {key: position for key, position, _value in _entries(self._mmap, self._used)}
+
+    def add(self, key, amount):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._allocate(key)
+        _VALUE.pack_into(self._mmap, position, _VALUE.unpack_from(self._mmap, position)[0] + amount)
+
+    def _allocate(self, key):
+        encoded = key.encode()
+        padded = len(encoded) + (-(_KEY_LENGTH.size + len(encoded)) % 8)
+        size = _KEY_LENGTH.size + padded + _VALUE.size
+        if self._used + size > len(self._mmap):
+            self._grow(self._used + size)
+        _KEY_LENGTH.pack_into(self._mmap, self._used, len(encoded))
+        self._mmap[self._used + _KEY_LENGTH.size:self._used + _KEY_LENGTH.size + len(encoded)] = encoded
+        position = self._used + _KEY_LENGTH.size + padded
+        _VALUE.pack_into(self._mmap, position, 0.0)
+        self._used += size
+        _HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def _grow(self, needed):
+        size = len(self._mmap)
+        while size < needed:
+            size *= 2
+        self._mmap.close()
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+def _entries(buffer, used):
+    position = _HEADER.size
+    while position + _KEY_LENGTH.size <= used:
+        length = _KEY_LENGTH.unpack_from(buffer, position)[0]
+        key = bytes(buffer[position + _KEY_LENGTH.size:position + _KEY_LENGTH.size + length]).decode()
+        value_position = position + _KEY_LENGTH.size + length + (-(_KEY_LENGTH.size + length) % 8)
+        yield key, value_position, _VALUE.unpack_from(buffer, value_position)[0]
+        position = value_position + _VALUE.size
+
+
+def read_values(path):
+    """The values of a file, as a dict"""
+    data = Path(path).read_bytes()
+    if len(data) < _HEADER.size:
+        return {}
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    return {key: value for key, _position, value in _entries(data, used)}
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._keys = {}
+
+    def key(self, label_values):
+        key = self._keys.get(label_values)
+        if key is None:
+            key = self._keys[label_values] = json.dumps([self.name, '', list(label_values)])
+        return key
+
+    def inc(self, label_values=(), amount=1, values=None):
+        if values is None:
+            with _slots.borrow() as values:
+                if values is not None:
+                    values.add(self.key(label_values), amount)
+            return
+        values.add(self.key(label_values), amount)
+
+    def samples(self, totals):
+        for (suffix, label_values), value in sorted(totals.items()):
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = [*buckets, inf]
+
+    def key(self, label_values):
+        keys = self._keys.get(label_values)
+        if keys is None:
+            labels = list(label_values)
+            keys = self._keys[label_values] = [
+                *(json.dumps([self.name, 'bucket', labels + [_format(le)]]) for le in self.buckets),
+                json.dumps([self.name, 'sum', labels]),
+                json.dumps([self.name, 'count', labels]),
+            ]
+        return keys
+
+    def observe(self, value, label_values=(), values=None):
+        if values is None:
+            with _slots.borrow() as values:
+                if values is not None:
+                    self.observe(value, label_values, values)
+            return
+        keys = self.key(label_values)
+        # Buckets are counted on their own and summed up when scraped
+        values.add(keys[bisect.bisect_left(self.buckets, value)], 1)
+        values.add(keys[-2], value)
+        values.add(keys[-1], 1)
+
+    def samples(self, totals):
+        series = {}
+        for (suffix, label_values), value in totals.items():
+            if suffix == 'bucket':
+                *label_values, le = label_values
+                series.setdefault(tuple(label_values), {}).setdefault('buckets', {})[le] = value
+            else:
+                series.setdefault(tuple(label_values), {})[suffix] = value
+        for label_values, values in sorted(series.items()):
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for le in self.buckets:
+                cumulative += values.get('buckets', {}).get(_format(le), 0)
+                yield f'{self.name}_bucket', {**labels, 'le': _format(le)}, cumulative
+            yield f'{self.name}_sum', labels, values.get('sum', 0)
+            yield f'{self.name}_count', labels, values.get('count', 0)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+http_requests = Counter(
+    'http_requests_total', 'Requests served, by URL name, method and status', ('url_name', 'method', 'status')
+)
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Wall time of requests, by URL name', ('url_name',), LATENCY_BUCKETS
+)
+db_queries_per_request = Histogram(
+    'db_queries_per_request', 'Database queries run by each request, by URL name', ('url_name',), QUERY_COUNT_BUCKETS
+)
+db_query_duration = Histogram(
+    'db_query_duration_seconds', 'Time of each database query made by a request, by URL name', ('url_name',),
+    QUERY_BUCKETS
+)
+cache_requests = Counter('cache_requests_total', 'Cache lookups, by cache and hit or miss', ('cache', 'result'))
+
+REGISTRY = {metric.name: metric for metric in (
+    http_requests, http_request_duration, db_queries_per_request, db_query_duration, cache_requests,
+)}
+
+
+def _format(value):
+    if value == inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def directory():
+    path = getattr(settings, 'METRICS_DIR', None)
+    return Path(path) if path else None
+
+
+def enabled():
+    return directory() is not None
+
+
+class _Slots:
+    """The process's ValueFiles, each lent to one thread at a time.
+
+    Under ASGI every request runs its sync code in a new thread, so files
+    belong to the process rather than to threads: a recording borrows a free
+    file and gives it back, and a process keeps one file per concurrent
+    recording it has ever had.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owner = None
+        self._free = []
+
+    @contextmanager
+    def borrow(self):
+        """A ValueFile only this thread writes to until the block ends, or None while metrics are off"""
+        path = directory()
+        if path is None:
+            yield None
+            return
+        # New files after fork, or when METRICS_DIR changes
+        owner = (os.getpid(), path)
+        with self._lock:
+            if self._owner != owner:
+                self._owner, self._free = owner, []
+            values = self._free.pop() if self._free else None
+        if values is None:
+            path.mkdir(parents=True, exist_ok=True)
+            values = ValueFile(path / f'{os.getpid()}-{next(_file_ids)}.db')
+        try:
+            yield values
+        finally:
+            with self._lock:
+                if self._owner == owner:
+                    self._free.append(values)
+
+
+_slots = _Slots()
+_file_ids = itertools.count()
+
+
+def observe_request(recording, request, response):
+    """Record a request's latency and queries from its instrumentation recording"""
+    with _slots.borrow() as values:
+        if values is None:
+            return
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.url_name if match else None) or 'unmatched'
+        labels = (url_name,)
+        http_requests.inc((url_name, request.method, str(response.status_code)), values=values)
+        http_request_duration.observe(recording.wall_time, labels, values)
+        db_queries_per_request.observe(recording.queries, labels, values)
+        for duration in recording.query_times:
+            db_query_duration.observe(duration, labels, values)
+
+
+def cache_lookup(cache, hit):
+    cache_requests.inc((cache, 'hit' if hit else 'miss'))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _scrape_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path / '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def compact(path):
+    """Fold the files of processes that have exited into the archive; call under the scrape lock"""
+    archive = None
+    for file in path.glob('*-*.db'):
+        if _alive(int(file.name.split('-', 1)[0])):
+            continue
+        archive = archive or ValueFile(path / ARCHIVE)
+        for key, value in read_values(file).items():
+            archive.add(key, value)
+        file.unlink()
+    if archive is not None:
+        archive.close()
+
+
+def collect(path):
+    """Totals of every metric over all files, as {name: {(suffix, label values): value}}"""
+    totals = {}
+    for file in path.glob('*.db'):
+        for key, value in read_values(file).items():
+            name, suffix, label_values = json.loads(key)
+            group = totals.setdefault(name, {})
+            group[suffix, tuple(label_values)] = group.get((suffix, tuple(label_values)), 0) + value
+    return totals
+
+
+def gauges(totals):
+    """Metrics measured at scrape time: (name, documentation, samples)"""
+    # submissions imports stats, which records into these metrics
+    from . import submissions
+
+    hits = {}
+    for (_suffix, (cache, result)), value in totals.get(cache_requests.name, {}).items():
+        hits.setdefault(cache, {'hit': 0, 'miss': 0})[result] += value
+    yield 'cache_hit_ratio', 'Share of cache lookups that hit, by cache', [
+        ({'cache': cache}, counts['hit'] / (counts['hit'] + counts['miss']))
+        for cache, counts in sorted(hits.items()) if counts['hit'] + counts['miss']
+    ]
+
+    if submissions.queueing_enabled():
+        queue = submissions.get_queue().metrics()
+        yield 'submission_queue_depth', 'Seller applications waiting in the submission queue', [({}, queue['depth'])]
+        yield 'submission_queue_in_flight', 'Queued applications claimed by a worker', [({}, queue['in_flight'])]
+        yield 'submission_queue_failed', 'Queued applications that ran out of attempts', [({}, queue['failed'])]
+        yield 'submission_queue_oldest_age_seconds', 'Age of the oldest pending application', [
+            ({}, queue['oldest_age'])
+        ]
+
+
+def _sample(name, labels, value):
+    if labels:
+        rendered = ','.join(
+            '{}="{}"'.format(label, str(label_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for label, label_value in labels.items()
+        )
+        name = f'{name}{{{rendered}}}'
+    return f'{name} {_format(value) if value == inf else repr(float(value))}'
+
+
+def render(path):
+    """Every metric in the Prometheus text format"""
+    # Files move into the archive between two reads of another scrape otherwise
+    with _scrape_lock(path):
+        if fcntl is not None:
+            compact(path)
+        totals = collect(path)
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        lines.extend(_sample(*sample) for sample in metric.samples(totals.get(name, {})))
+    for name, documentation, samples in gauges(totals):
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.extend(_sample(name, labels, value) for labels, value in samples)
+    return '\n'.join(lines) + '\n'
+
+
+def allowed(request):
+    """Scrapers present METRICS_TOKEN as a bearer token, or else connect directly from METRICS_ALLOWED_IPS"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        authorization = request.headers.get('Authorization', '')
+        return constant_time_compare(authorization, f'Bearer {token}')
+    # Behind a proxy every client would seem to come from the proxy's address
+    return (
+        'X-Forwarded-For' not in request.headers
+        and request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    )
+
+
+def metrics_view(request):
+    path = directory()
+    if path is None or request.method != 'GET' or not allowed(request):
+        return HttpResponseNotFound()
+    path.mkdir(parents=True, exist_ok=True)
+    response = HttpResponse(render(path), content_type=CONTENT_TYPE)
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,122 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import instrumentation, metrics, routers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """Let safe requests read from the replica unless the client recently wrote"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.activate(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.deactivate(token)
+        return self.pin(request, response, wrote)
+
+    async def __acall__(self, request):
+        token = self.activate(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.deactivate(token)
+        return self.pin(request, response, wrote)
+
+    @property
+    def cookie(self):
+        return getattr(settings, 'REPLICA_STICKY_COOKIE', 'db_primary_until')
+
+    def activate(self, request):
+        try:
+            pinned = float(request.COOKIES.get(self.cookie, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        return routers.activate(request.method in SAFE_METHODS and not pinned)
+
+    def pin(self, request, response, wrote):
+        """Send the client's reads to the primary for a while after it wrote.
+
+        Only clients that come back as themselves are pinned: those with a
+        session or an authenticated user. Anonymous beacons get no cookie.
+        """
+        if wrote and self.identified(request):
+            sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(
+                self.cookie, str(time.time() + sticky), max_age=sticky, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def identified(self, request):
+        session = getattr(request, 'session', None)
+        if session is not None and session.session_key:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_authenticated
+
+
+class InstrumentationMiddleware:
+    """Record the time, queries and size of requests; see sellers/instrumentation.py
+
+    A sample of the requests is logged in detail, and every request feeds the
+    metrics of sellers/metrics.py while they are enabled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0)
+        self.metrics = metrics.enabled()
+        if self.sample_rate <= 0 and not self.metrics:
+            raise MiddlewareNotUsed
+        instrumentation.install()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sampled = instrumentation.sampled(self.sample_rate)
+        if not sampled and not self.metrics:
+            return self.get_response(request)
+        token = instrumentation.start(detailed=sampled)
+        try:
+            response = self.get_response(request)
+        finally:
+            recording = instrumentation.stop(token)
+        return self.record(recording, request, response)
+
+    async def __acall__(self, request):
+        sampled = instrumentation.sampled(self.sample_rate)
+        if not sampled and not self.metrics:
+            return await self.get_response(request)
+        token = instrumentation.start(detailed=sampled)
+        try:
+            response = await self.get_response(request)
+        finally:
+            recording = instrumentation.stop(token)
+        return self.record(recording, request, response)
+
+    def record(self, recording, request, response):
+        if self.metrics:
+            metrics.observe_request(recording, request, response)
+        if recording.detailed:
+            return instrumentation.report(recording, request, response)
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0006_seller_review_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('page_views', models.IntegerField(default=0)),
+                ('form_submissions', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Analytics Shard',
+                'verbose_name_plural': 'Analytics Shards',
+                'unique_together': {('date', 'hour', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('page_views', models.IntegerField(default=0)),
+                ('form_submissions', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Hourly Analytics',
+                'verbose_name_plural': 'Hourly Analytics',
+                'ordering': ['date', 'hour'],
+                'unique_together': {('date', 'hour')},
+            },
+        ),
+    ]
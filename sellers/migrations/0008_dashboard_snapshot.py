@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0007_analytics_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_sellers', models.IntegerField(default=0)),
+                ('pending_sellers', models.IntegerField(default=0)),
+                ('approved_sellers', models.IntegerField(default=0)),
+                ('rejected_sellers', models.IntegerField(default=0)),
+                ('analytics_date', models.DateField()),
+                ('last_active_date', models.DateField(blank=True, null=True)),
+                ('views_today', models.IntegerField(default=0)),
+                ('submissions_today', models.IntegerField(default=0)),
+                ('days_today', models.IntegerField(default=0)),
+                ('views_7days', models.IntegerField(default=0)),
+                ('submissions_7days', models.IntegerField(default=0)),
+                ('days_7days', models.IntegerField(default=0)),
+                ('views_30days', models.IntegerField(default=0)),
+                ('submissions_30days', models.IntegerField(default=0)),
+                ('days_30days', models.IntegerField(default=0)),
+                ('views_90days', models.IntegerField(default=0)),
+                ('submissions_90days', models.IntegerField(default=0)),
+                ('days_90days', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Dashboard Snapshot',
+                'verbose_name_plural': 'Dashboard Snapshots',
+            },
+        ),
+    ]
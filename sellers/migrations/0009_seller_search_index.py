@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS sellers_seller_fts USING fts5("
+            "business_name, owner_name, email_address, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO sellers_seller_fts (rowid, business_name, owner_name, email_address) "
+            "SELECT id, business_name, owner_name, email_address FROM sellers_seller"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS sellers_seller_search_tsv ON sellers_seller USING GIN ("
+            "to_tsvector('simple', business_name || ' ' || owner_name || ' ' || email_address))"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS sellers_seller_business_name_trgm "
+            "ON sellers_seller USING GIN (business_name gin_trgm_ops)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS sellers_seller_owner_name_trgm "
+            "ON sellers_seller USING GIN (owner_name gin_trgm_ops)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS sellers_seller_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS sellers_seller_search_tsv")
+        schema_editor.execute("DROP INDEX IF EXISTS sellers_seller_business_name_trgm")
+        schema_editor.execute("DROP INDEX IF EXISTS sellers_seller_owner_name_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0008_dashboard_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
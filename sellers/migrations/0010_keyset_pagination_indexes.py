@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0009_seller_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='analytics',
+            index=models.Index(fields=['date', 'id'], name='analytics_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seller',
+            index=models.Index(fields=['created_at', 'id'], name='seller_created_id_idx'),
+        ),
+    ]
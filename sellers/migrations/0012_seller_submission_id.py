@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0011_seller_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seller',
+            name='submission_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0013_replication_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='rebuilt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0014_dashboard_snapshot_rebuilt_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pricingplan',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['monthly_price'], name='pricingplan_active_price_idx'),
+        ),
+    ]
@@ -23,6 +23,13 @@ class PricingPlan(models.Model):
     
     class Meta:
         ordering = ['monthly_price']
+        indexes = [
+            # Active plans in price order for the pricing API
+            models.Index(
+                fields=['monthly_price'], condition=models.Q(is_active=True),
+                name='pricingplan_active_price_idx'
+            ),
+        ]
         verbose_name = 'Pricing Plan'
         verbose_name_plural = 'Pricing Plans'
     
@@ -100,9 +107,22 @@ class Seller(models.Model):
     
     # Admin Assignment
     assigned_admins = models.ManyToManyField(User, related_name='assigned_sellers', blank=True)
+    
+    # Tracking id of a queued submission, so a replayed batch cannot insert it twice
+    submission_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the sellers API
+            models.Index(fields=['created_at', 'id'], name='seller_created_id_idx'),
+            # Status filter of the API and admin, newest first
+            models.Index(fields=['status', 'created_at'], name='seller_status_created_idx'),
+            # Business type filter and the status x business type dashboard breakdown
+            models.Index(fields=['business_type', 'status'], name='seller_type_status_idx'),
+            # Experience level filter of the admin changelist
+            models.Index(fields=['experience_level', 'created_at'], name='seller_experience_created_idx'),
+        ]
         verbose_name = 'Seller'
         verbose_name_plural = 'Sellers'
     
@@ -127,10 +147,90 @@ class Analytics(models.Model):
     form_submissions = models.IntegerField(default=0)
     
     class Meta:
+        indexes = [
+            # Keyset pagination of the analytics API
+            models.Index(fields=['date', 'id'], name='analytics_date_id_idx'),
+        ]
         verbose_name = 'Analytics'
         verbose_name_plural = 'Analytics'
     
     def __str__(self):
         return f"Analytics for {self.date}"
 
+class AnalyticsShard(models.Model):
+    """Uncompacted counters; writers spread each hour over ANALYTICS_SHARDS rows"""
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    shard = models.PositiveSmallIntegerField()
+    page_views = models.IntegerField(default=0)
+    form_submissions = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['date', 'hour', 'shard']
+        verbose_name = 'Analytics Shard'
+        verbose_name_plural = 'Analytics Shards'
+
+    def __str__(self):
+        return f"Analytics shard {self.shard} for {self.date} {self.hour:02d}:00"
+
+class HourlyAnalytics(models.Model):
+    """Compacted hourly totals produced by the rollup_analytics command"""
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    page_views = models.IntegerField(default=0)
+    form_submissions = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['date', 'hour']
+        ordering = ['date', 'hour']
+        verbose_name = 'Hourly Analytics'
+        verbose_name_plural = 'Hourly Analytics'
+
+    def __str__(self):
+        return f"Analytics for {self.date} {self.hour:02d}:00"
 
+class DashboardSnapshot(models.Model):
+    """Materialized dashboard counters, kept current by sellers.stats"""
+    total_sellers = models.IntegerField(default=0)
+    pending_sellers = models.IntegerField(default=0)
+    approved_sellers = models.IntegerField(default=0)
+    rejected_sellers = models.IntegerField(default=0)
+
+    # Analytics totals per dashboard period, anchored on analytics_date
+    analytics_date = models.DateField()
+    last_active_date = models.DateField(null=True, blank=True)
+    views_today = models.IntegerField(default=0)
+    submissions_today = models.IntegerField(default=0)
+    days_today = models.IntegerField(default=0)
+    views_7days = models.IntegerField(default=0)
+    submissions_7days = models.IntegerField(default=0)
+    days_7days = models.IntegerField(default=0)
+    views_30days = models.IntegerField(default=0)
+    submissions_30days = models.IntegerField(default=0)
+    days_30days = models.IntegerField(default=0)
+    views_90days = models.IntegerField(default=0)
+    submissions_90days = models.IntegerField(default=0)
+    days_90days = models.IntegerField(default=0)
+
+    # When the last rebuild started; adjustments for earlier changes skip the row
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Dashboard Snapshot'
+        verbose_name_plural = 'Dashboard Snapshots'
+
+    def __str__(self):
+        return f"Dashboard snapshot for {self.analytics_date}"
+
+
+class ReplicationHeartbeat(models.Model):
+    """Timestamp written to the primary and read back from the replica to measure its lag"""
+    beat_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Replication Heartbeat'
+        verbose_name_plural = 'Replication Heartbeats'
+
+    def __str__(self):
+        return f"Heartbeat at {self.beat_at}"
@@ -0,0 +1,152 @@
+"""
+Pagination for the sellers and analytics list endpoints.
+
+Requests are paginated by page number as before unless they ask for keyset
+pagination with ``?paginate=cursor`` or carry a ``?cursor=`` from a previous
+page. Keyset pages are ordered newest first by the view's ``cursor_ordering``
+(a timestamp followed by ``id``) and are fetched with a range condition on
+that composite index, so every page costs the same however deep it is. Keyset
+responses skip ``COUNT(*)``; ``?count=approx`` adds an estimated total.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    mode_query_param = 'paginate'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = getattr(view, 'cursor_ordering', ('created_at', 'id'))
+        self.model = queryset.model
+
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            estimate = getattr(view, 'get_approximate_count', None) or approximate_count
+            self.approximate_count = estimate(queryset)
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position, reverse))
+
+        ordering = [field if reverse else f'-{field}' for field in self.fields]
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Walking backwards always leaves a next page; forwards it depends on has_more
+        has_next = reverse or has_more
+        has_previous = has_more if reverse else position is not None
+        self.next_position = self.position_of(rows[-1]) if rows and has_next else None
+        self.previous_position = self.position_of(rows[0]) if rows and has_previous else None
+        return rows
+
+    def after(self, position, reverse):
+        """Rows strictly past ``position`` in the requested direction.
+
+        Written as ``first <= x AND NOT (first = x AND rest >= y)`` so the
+        database can use a range scan on the leading column of the index.
+        """
+        first, *rest = self.fields
+        first_value, *rest_values = position
+        bound, past = ('gte', 'lte') if reverse else ('lte', 'gte')
+
+        condition = Q(**{f'{first}__{bound}': first_value})
+        tie = Q(**{first: first_value})
+        for field, value in zip(rest, rest_values):
+            tie &= Q(**{f'{field}__{past}': value})
+        return condition & ~tie
+
+    def position_of(self, instance):
+        return [getattr(instance, field) for field in self.fields]
+
+    def encode_cursor(self, position, reverse=False):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        payload = json.dumps({'p': values, 'r': reverse}, separators=(',', ':'))
+        cursor = urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor.encode()))
+            position = [
+                self.model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, payload['p'], strict=True)
+            ]
+            return position, bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        response = OrderedDict()
+        if self.approximate_count is not None:
+            response['count'] = self.approximate_count
+            response['count_is_approximate'] = True
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+
+def approximate_count(queryset):
+    """Cheap row estimate: the planner's guess on PostgreSQL, a capped count elsewhere"""
+    connection = connections[queryset.db]
+    queryset = queryset.order_by()
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    limit = getattr(settings, 'API_APPROXIMATE_COUNT_LIMIT', 10000)
+    return queryset[:limit].count()
@@ -0,0 +1,137 @@
+"""
+Cached payload for the public pricing API.
+
+The JSON body of ``/api/pricing/`` is serialized once and kept in the cache
+as bytes, together with a strong ETag and a Last-Modified time, so most
+requests skip both the serializer and the database.
+
+The payload records the version of the plans it was built from. That version
+is a token under its own cache key, replaced whenever a PricingPlan is saved
+or deleted, once the transaction commits. A request reads both keys in one
+cache round trip and rebuilds the payload only when the versions differ, so
+cached responses, 304s included, run no queries. Changes made in another
+process, such as ``setup_pricing``, reach the workers through the shared
+cache; with the per-process local-memory cache they show up when the entry
+expires. ``QuerySet.update()`` sends no signals, so it is only picked up on
+expiry as well.
+"""
+import hashlib
+import json
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import metrics
+from .models import PricingPlan
+from .routers import use_primary
+
+PRICING_CACHE_KEY = 'sellers:pricing_api'
+PRICING_VERSION_KEY = 'sellers:pricing_version'
+
+
+def active_plans():
+    return PricingPlan.objects.filter(is_active=True).order_by('monthly_price')
+
+
+def _new_version(changed_at=None):
+    """A version token, with the time of the plan change it follows"""
+    return (uuid4().hex, changed_at)
+
+
+def plans_version():
+    """The version of the plans, started on first use"""
+    version = cache.get(PRICING_VERSION_KEY)
+    if version is None:
+        # Another worker may start it first; theirs wins
+        cache.add(PRICING_VERSION_KEY, _new_version(), None)
+        version = cache.get(PRICING_VERSION_KEY)
+    return version
+
+
+async def aplans_version():
+    version = await cache.aget(PRICING_VERSION_KEY)
+    if version is None:
+        await cache.aadd(PRICING_VERSION_KEY, _new_version(), None)
+        version = await cache.aget(PRICING_VERSION_KEY)
+    return version
+
+
+def build_payload(version=None):
+    """Serialize the active plans and compute the validators for the response"""
+    version = version or plans_version()
+    # A lagging replica would cache the old plans under the new version
+    with use_primary():
+        return _payload(list(active_plans()), version)
+
+
+async def abuild_payload(version=None):
+    """``build_payload`` with the async ORM"""
+    version = version or await aplans_version()
+    with use_primary():
+        return _payload([plan async for plan in active_plans()], version)
+
+
+def _payload(pricing_plans, version):
+    plans_data = []
+    for plan in pricing_plans:
+        plans_data.append({
+            'name': plan.name,
+            'display_name': plan.display_name,
+            'description': plan.description,
+            'monthly_price': float(plan.monthly_price),
+            'yearly_price': float(plan.yearly_price),
+            'cancelled_monthly_price': float(plan.cancelled_monthly_price) if plan.cancelled_monthly_price else None,
+            'cancelled_yearly_price': float(plan.cancelled_yearly_price) if plan.cancelled_yearly_price else None,
+            'is_popular': plan.is_popular,
+            'yearly_discount': plan.yearly_discount_percentage,
+            'has_cancelled_prices': plan.has_cancelled_prices
+        })
+
+    body = json.dumps({'success': True, 'plans': plans_data}, cls=DjangoJSONEncoder).encode()
+    # Deleting or deactivating a plan leaves no later updated_at behind,
+    # so the time of the change that started this version counts too
+    _token, changed_at = version
+    times = [int(plan.updated_at.timestamp()) for plan in pricing_plans]
+    if changed_at:
+        times.append(changed_at)
+
+    return {
+        'body': body,
+        'etag': '"%s"' % hashlib.sha256(body).hexdigest()[:32],
+        'last_modified': max(times, default=None) or int(time.time()),
+        'version': version,
+    }
+
+
+def get_payload():
+    """The cached payload, rebuilt when the plans changed or the cache expired"""
+    cached = cache.get_many([PRICING_VERSION_KEY, PRICING_CACHE_KEY])
+    version = cached.get(PRICING_VERSION_KEY) or plans_version()
+    payload = cached.get(PRICING_CACHE_KEY)
+    current = payload is not None and payload.get('version') == version
+    metrics.cache_lookup('pricing', current)
+    if not current:
+        payload = build_payload(version)
+        cache.set(PRICING_CACHE_KEY, payload, getattr(settings, 'PRICING_CACHE_TIMEOUT', 3600))
+    return payload
+
+
+async def aget_payload():
+    """``get_payload`` for the async view"""
+    cached = await cache.aget_many([PRICING_VERSION_KEY, PRICING_CACHE_KEY])
+    version = cached.get(PRICING_VERSION_KEY) or await aplans_version()
+    payload = cached.get(PRICING_CACHE_KEY)
+    current = payload is not None and payload.get('version') == version
+    metrics.cache_lookup('pricing', current)
+    if not current:
+        payload = await abuild_payload(version)
+        await cache.aset(PRICING_CACHE_KEY, payload, getattr(settings, 'PRICING_CACHE_TIMEOUT', 3600))
+    return payload
+
+
+def invalidate():
+    """Start a new version of the plans, so every cached payload is rebuilt"""
+    cache.set(PRICING_VERSION_KEY, _new_version(int(time.time())), None)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.urls import path
+
+from . import public_views
+
+# Under ASGI the public endpoints are served by their async twins
+async_views = settings.ASYNC_PUBLIC_VIEWS
+
+# Public endpoints (no authentication required), shared by sellers.urls and
+# the lean oysloe_admin.public_urls
+urlpatterns = [
+    path('submit-seller/', public_views.asubmit_seller_form if async_views else public_views.submit_seller_form, name='submit-seller'),
+    path('submit-seller/<uuid:tracking_id>/', public_views.submission_status, name='submission-status'),
+    path('track-pageview/', public_views.atrack_pageview if async_views else public_views.track_pageview, name='track-pageview'),
+    path('pricing/', public_views.apricing_api if async_views else public_views.pricing_api, name='pricing-api'),
+]
@@ -0,0 +1,178 @@
+"""
+Public endpoints used by the landing pages: seller applications, page-view
+tracking and pricing.
+
+They live apart from the admin API so that the ``public`` server profile can
+serve them without importing DRF's viewsets, the admin site or jazzmin.
+Every endpoint has an async twin (``a``-prefixed) that is used under ASGI.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import pricing, submissions
+from .counters import analytics_buffer
+from .models import Seller
+from .serializers import SellerCreateSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_application(request):
+    """Validated ``SellerCreateSerializer`` for a submission, or an error response"""
+    import json
+    
+    # Parse JSON data from request body
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return None, JsonResponse({
+            'error': 'Invalid JSON data'
+        }, status=400)
+    
+    serializer = SellerCreateSerializer(data=data)
+    if not serializer.is_valid():
+        return None, JsonResponse({
+            'error': 'Validation failed',
+            'details': serializer.errors
+        }, status=400)
+    return serializer, None
+
+def _queued_response(tracking_id):
+    return JsonResponse({
+        'message': 'Application received and queued for processing',
+        'tracking_id': tracking_id
+    }, status=202)
+
+def _submitted_response(seller):
+    return JsonResponse({
+        'message': 'Application submitted successfully!',
+        'seller_id': seller.id
+    })
+
+def _method_not_allowed():
+    return JsonResponse({
+        'error': 'Method not allowed'
+    }, status=405)
+
+@csrf_exempt
+def submit_seller_form(request):
+    """Public endpoint for submitting seller applications"""
+    if request.method != 'POST':
+        return _method_not_allowed()
+    
+    serializer, error = _parse_application(request)
+    if error:
+        return error
+    
+    if submissions.queueing_enabled():
+        queue = submissions.get_queue()
+        if not queue.is_full():
+            return _queued_response(queue.enqueue(serializer.validated_data))
+        logger.warning("Seller submission queue is full, inserting synchronously")
+    
+    seller = serializer.save()
+    
+    # Track form submission
+    analytics_buffer.incr('form_submissions')
+    
+    return _submitted_response(seller)
+
+@csrf_exempt
+async def asubmit_seller_form(request):
+    """``submit_seller_form`` for ASGI, using the async ORM"""
+    if request.method != 'POST':
+        return _method_not_allowed()
+    
+    serializer, error = _parse_application(request)
+    if error:
+        return error
+    
+    if submissions.queueing_enabled():
+        queue = submissions.get_queue()
+        if not await sync_to_async(queue.is_full)():
+            return _queued_response(await sync_to_async(queue.enqueue)(serializer.validated_data))
+        logger.warning("Seller submission queue is full, inserting synchronously")
+    
+    seller = await Seller.objects.acreate(**serializer.validated_data)
+    await analytics_buffer.aincr('form_submissions')
+    
+    return _submitted_response(seller)
+
+@require_http_methods(["GET"])
+def submission_status(request, tracking_id):
+    """Public endpoint reporting the state of a queued application"""
+    seller = Seller.objects.filter(submission_id=tracking_id).only('id').first()
+    if seller is not None:
+        return JsonResponse({'status': 'processed', 'seller_id': seller.id})
+    
+    entry = submissions.get_queue().lookup(str(tracking_id))
+    if entry is None:
+        return JsonResponse({'error': 'Unknown tracking id'}, status=404)
+    return JsonResponse({'status': 'failed' if entry['failed'] else 'queued'})
+
+def _pageview_response():
+    return JsonResponse({
+        'message': 'Page view tracked successfully',
+        'date': timezone.now().date().isoformat()
+    })
+
+@csrf_exempt
+def track_pageview(request):
+    """Public endpoint for tracking page views"""
+    if request.method == 'POST':
+        analytics_buffer.incr('page_views')
+        return _pageview_response()
+    
+    return _method_not_allowed()
+
+@csrf_exempt
+async def atrack_pageview(request):
+    """``track_pageview`` for ASGI"""
+    if request.method == 'POST':
+        await analytics_buffer.aincr('page_views')
+        return _pageview_response()
+    
+    return _method_not_allowed()
+
+def _pricing_response(request, payload):
+    # Answer revalidations with 304 before building a response
+    response = get_conditional_response(
+        request, etag=payload['etag'], last_modified=payload['last_modified']
+    )
+    if response is None:
+        response = HttpResponse(payload['body'], content_type='application/json')
+    
+    response['ETag'] = payload['etag']
+    response['Last-Modified'] = http_date(payload['last_modified'])
+    patch_cache_control(response, public=True, max_age=settings.PRICING_MAX_AGE)
+    return response
+
+def _pricing_error(e):
+    return JsonResponse({
+        'success': False,
+        'error': str(e)
+    }, status=500)
+
+@require_http_methods(["GET"])
+def pricing_api(request):
+    """API endpoint to get pricing plans"""
+    try:
+        return _pricing_response(request, pricing.get_payload())
+    except Exception as e:
+        return _pricing_error(e)
+
+@require_http_methods(["GET"])
+async def apricing_api(request):
+    """``pricing_api`` for ASGI"""
+    try:
+        return _pricing_response(request, await pricing.aget_payload())
+    except Exception as e:
+        return _pricing_error(e)
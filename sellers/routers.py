@@ -0,0 +1,146 @@
+"""
+Read-replica routing.
+
+When ``DATABASE_REPLICA_NAME`` is set, ``ReplicaRouter`` sends reads made
+while serving a safe (GET/HEAD/OPTIONS) request to the ``replica`` alias and
+everything else to ``default``. ``ReplicaRoutingMiddleware`` marks those
+requests. Management commands, workers and mutating requests stay on the
+primary.
+
+Reads go back to the primary in these cases:
+
+* once the request has written anything, for the rest of that request
+* for ``REPLICA_STICKY_SECONDS`` after a request from a client with a session
+  or an authenticated user wrote, through a cookie, so the admin sees its own
+  changes (e.g. after ``update_status``)
+* while the replica lags the primary by more than ``REPLICA_MAX_LAG``
+  seconds, measured with a ``ReplicationHeartbeat`` row every
+  ``REPLICA_LAG_CHECK_INTERVAL`` seconds per process
+* inside ``use_primary()``, for code that caches what it reads
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+_routing = ContextVar('sellers_db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def activate(use_replica):
+    """Start routing reads for the current request; returns a token for ``deactivate``"""
+    return _routing.set(RoutingState(use_replica))
+
+
+def deactivate(token):
+    """Stop routing for the request and return whether it wrote to the primary"""
+    state = _routing.get()
+    _routing.reset(token)
+    return bool(state and state.wrote)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block"""
+    token = _routing.set(RoutingState(use_replica=False))
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class LagMonitor:
+    """Per-process, rate-limited check of the replica heartbeat"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._lagging = True
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = None
+            self._lagging = True
+
+    def lagging(self):
+        interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < interval:
+            return self._lagging
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= interval:
+                self._lagging = self.measure() > getattr(settings, 'REPLICA_MAX_LAG', 10)
+                self._checked_at = now
+        return self._lagging
+
+    def measure(self):
+        """Seconds between the primary heartbeat and the replica's copy of it"""
+        from .models import ReplicationHeartbeat
+
+        try:
+            primary = self.beat(ReplicationHeartbeat)
+            replica = (
+                ReplicationHeartbeat.objects.using(REPLICA)
+                .filter(pk=1).values_list('beat_at', flat=True).first()
+            )
+        except DatabaseError:
+            logger.exception("Replica lag check failed, reading from the primary")
+            return float('inf')
+        if replica is None:
+            return float('inf')
+        return max((primary - replica).total_seconds(), 0.0)
+
+    def beat(self, model):
+        """Advance the primary heartbeat when it is older than a check interval"""
+        now = timezone.now()
+        stale = now - timedelta(seconds=getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5))
+        beat_at = model.objects.using(PRIMARY).filter(pk=1).values_list('beat_at', flat=True).first()
+        if beat_at is None:
+            model.objects.using(PRIMARY).update_or_create(pk=1, defaults={'beat_at': now})
+            return now
+        if beat_at < stale:
+            model.objects.using(PRIMARY).filter(pk=1, beat_at=beat_at).update(beat_at=now)
+            return now
+        return beat_at
+
+
+lag_monitor = LagMonitor()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replica or state.wrote:
+            return PRIMARY
+        if lag_monitor.lagging():
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
@@ -0,0 +1,320 @@
+"""
+Seller search backends.
+
+``?search=`` on the sellers API and the admin changelist search box go through
+the backend selected by ``SELLER_SEARCH_BACKEND``:
+
+* ``sqlite``   - FTS5 table ``sellers_seller_fts`` ranked with ``bm25()``
+* ``postgres`` - ``tsvector`` and trigram GIN indexes ranked with ``ts_rank``
+* ``basic``    - the original ``icontains`` filters, for any other database
+* ``auto``     - ``sqlite`` or ``postgres`` depending on the database vendor
+
+Ranked backends narrow the caller's queryset to the index matches, so its
+filters, count and pagination apply to every match. The queries that serve a
+search run within ``SELLER_SEARCH_BUDGET_MS`` milliseconds; one that runs out
+of time is answered by an unranked match instead, which stops at the first
+``SELLER_SEARCH_MAX_RESULTS`` rows.
+"""
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import OperationalError, connections, router, transaction
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Seller
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('business_name', 'owner_name', 'email_address')
+
+BACKENDS = {
+    'sqlite': 'sellers.search.SQLiteFTSBackend',
+    'postgres': 'sellers.search.PostgresSearchBackend',
+    'basic': 'sellers.search.BasicSearchBackend',
+}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class BasicSearchBackend:
+    """``icontains`` on every search field; needs no index"""
+
+    def filter(self, queryset, query):
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition).order_by('-created_at')
+
+    def index(self, sellers):
+        pass
+
+    def remove(self, seller_ids):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        return 0
+
+
+class BudgetedQuerySet:
+    """Queryset mixin whose queries run within a search budget.
+
+    ``budget`` is a context manager factory raising ``SearchTimeout``; when it
+    does, the rows and count come from ``fallback()`` instead.
+    """
+    budget = None
+    fallback = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone.budget, clone.fallback = self.budget, self.fallback
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is not None:
+            return
+        try:
+            with self.budget():
+                super()._fetch_all()
+        except SearchTimeout:
+            fallback = self.fallback()
+            fallback.query.set_limits(self.query.low_mark, self.query.high_mark)
+            self._result_cache = list(fallback)
+            self._prefetch_done = True
+
+    def count(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        try:
+            with self.budget():
+                return super().count()
+        except SearchTimeout:
+            return self.fallback().count()
+
+
+@lru_cache(maxsize=None)
+def _budgeted_class(queryset_class):
+    return type(f'Budgeted{queryset_class.__name__}', (BudgetedQuerySet, queryset_class), {})
+
+
+def budgeted(queryset, budget, fallback):
+    """``queryset`` evaluated within ``budget``, falling back to ``fallback()``"""
+    queryset = queryset._chain()
+    queryset.__class__ = _budgeted_class(type(queryset))
+    queryset.budget, queryset.fallback = budget, fallback
+    return queryset
+
+
+class RankedSearchBackend(BasicSearchBackend, ABC):
+    """Backends that rank sellers with a full-text index"""
+
+    @property
+    def max_results(self):
+        """Matches kept by the unranked fallback"""
+        return getattr(settings, 'SELLER_SEARCH_MAX_RESULTS', 200)
+
+    @property
+    def budget(self):
+        return getattr(settings, 'SELLER_SEARCH_BUDGET_MS', 200) / 1000
+
+    def filter(self, queryset, query):
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return queryset.none()
+
+        alias = queryset.db
+
+        def unranked_timed_out():
+            logger.warning("Unranked seller search for %r exceeded its budget", query)
+            return queryset.none()
+
+        unranked = budgeted(
+            self.unranked(queryset, terms, self.max_results).order_by('-created_at'),
+            lambda: self.within_budget(alias),
+            unranked_timed_out,
+        )
+
+        def ranked_timed_out():
+            logger.warning("Ranked seller search for %r exceeded its budget", query)
+            return unranked
+
+        return budgeted(
+            self.ranked(queryset, terms).order_by('search_rank', '-created_at', '-pk'),
+            lambda: self.within_budget(alias),
+            ranked_timed_out,
+        )
+
+    @abstractmethod
+    def ranked(self, queryset, terms):
+        """``queryset`` narrowed to the matches, annotated with ``search_rank`` (lower is better)"""
+
+    @abstractmethod
+    def unranked(self, queryset, terms, limit):
+        """``queryset`` narrowed to at most ``limit`` matches, in no particular order"""
+
+    @abstractmethod
+    def within_budget(self, alias):
+        """Context manager raising ``SearchTimeout`` once queries on ``alias`` outlast the budget"""
+
+
+class SQLiteFTSBackend(RankedSearchBackend):
+    """FTS5 virtual table keyed by seller id"""
+
+    table = 'sellers_seller_fts'
+    rank = 'bm25({table}, 10.0, 5.0, 1.0)'
+
+    def match_expression(self, terms):
+        # Every term must match, the last one as a prefix for search-as-you-type
+        phrases = [f'"{term}"' for term in terms]
+        phrases[-1] += '*'
+        return ' '.join(phrases)
+
+    def ranked(self, queryset, terms):
+        match = self.match_expression(terms)
+        seller_id = f'{Seller._meta.db_table}.{Seller._meta.pk.column}'
+        # LIMIT -1 keeps SQLite from folding the ranked match into a lookup per
+        # seller, which re-reads the match every time: it is read once, indexed
+        # by rowid and each seller's rank is looked up from there
+        rank = RawSQL(
+            f'SELECT hit.rank FROM (SELECT rowid AS seller_id, {self.rank.format(table=self.table)} AS rank '
+            f'FROM {self.table} WHERE {self.table} MATCH %s LIMIT -1) AS hit '
+            f'WHERE hit.seller_id = {seller_id}',
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match])
+        ).annotate(search_rank=rank)
+
+    def unranked(self, queryset, terms, limit):
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s LIMIT %s',
+            [self.match_expression(terms), limit],
+        ))
+
+    @contextmanager
+    def within_budget(self, alias):
+        connection = connections[alias]
+        connection.ensure_connection()
+        deadline = time.monotonic() + self.budget
+        # A non-zero return from the progress handler interrupts the statement
+        connection.connection.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        try:
+            yield
+        except OperationalError as exc:
+            if 'interrupted' in str(exc):
+                raise SearchTimeout from exc
+            raise
+        finally:
+            connection.connection.set_progress_handler(None, 0)
+
+    def index(self, sellers):
+        rows = [
+            (seller.pk, seller.business_name, seller.owner_name, seller.email_address)
+            for seller in sellers
+        ]
+        if not rows:
+            return
+        with connections[router.db_for_write(Seller)].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, business_name, owner_name, email_address) '
+                f'VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+    def remove(self, seller_ids):
+        with connections[router.db_for_write(Seller)].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in seller_ids])
+
+    def rebuild(self, batch_size=1000):
+        alias = router.db_for_write(Seller)
+        indexed = 0
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table}')
+            sellers = Seller.objects.using(alias).only('pk', *SEARCH_FIELDS).order_by('pk')
+            batch = []
+            for seller in sellers.iterator(chunk_size=batch_size):
+                batch.append(seller)
+                if len(batch) >= batch_size:
+                    self.index(batch)
+                    indexed += len(batch)
+                    batch = []
+            self.index(batch)
+            indexed += len(batch)
+        return indexed
+
+
+class PostgresSearchBackend(RankedSearchBackend):
+    """``tsvector`` match ranked by ``ts_rank``, with trigram similarity on names.
+
+    The GIN indexes are maintained by PostgreSQL itself, so there is nothing
+    to sync on save or delete.
+    """
+
+    document = (
+        "to_tsvector('simple', sellers_seller.business_name || ' ' || "
+        "sellers_seller.owner_name || ' ' || sellers_seller.email_address)"
+    )
+
+    match = (
+        f"{document} @@ to_tsquery('simple', %s) "
+        f"OR sellers_seller.business_name %% %s OR sellers_seller.owner_name %% %s"
+    )
+    # Negated so that, as with bm25(), lower is better
+    rank = (
+        f"-GREATEST(ts_rank({document}, to_tsquery('simple', %s)), "
+        f"similarity(sellers_seller.business_name, %s), similarity(sellers_seller.owner_name, %s))"
+    )
+
+    def tsquery(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def ranked(self, queryset, terms):
+        query = ' '.join(terms)
+        params = [self.tsquery(terms), query, query]
+        return queryset.filter(
+            RawSQL(self.match, params, output_field=BooleanField())
+        ).annotate(search_rank=RawSQL(self.rank, params, output_field=FloatField()))
+
+    def unranked(self, queryset, terms, limit):
+        sql = (
+            f"SELECT id FROM sellers_seller "
+            f"WHERE {self.document} @@ to_tsquery('simple', %s) LIMIT %s"
+        )
+        return queryset.filter(pk__in=RawSQL(sql, [self.tsquery(terms), limit]))
+
+    @contextmanager
+    def within_budget(self, alias):
+        try:
+            with transaction.atomic(using=alias):
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('SET LOCAL statement_timeout = %s', [max(int(self.budget * 1000), 1)])
+                yield
+        except OperationalError as exc:
+            if 'statement timeout' in str(exc):
+                raise SearchTimeout from exc
+            raise
+
+
+@lru_cache(maxsize=None)
+def _load_backend(name, vendor):
+    if name == 'auto':
+        name = {'sqlite': 'sqlite', 'postgresql': 'postgres'}.get(vendor, 'basic')
+    return import_string(BACKENDS.get(name, name))()
+
+
+def get_search_backend():
+    """The configured seller search backend"""
+    name = getattr(settings, 'SELLER_SEARCH_BACKEND', 'auto')
+    vendor = connections[router.db_for_read(Seller)].vendor
+    return _load_backend(name, vendor)
@@ -0,0 +1,254 @@
+"""
+Synthetic sellers and analytics for scale testing, written by ``manage.py seed_scale``.
+
+Sellers are generated in chunks. Chunk k draws from its own generator,
+seeded with the seed and k, and takes the primary keys that follow those of
+chunk k - 1. A seed therefore always gives the same rows, however many
+worker processes insert the chunks. Every worker inserts its chunk with
+``bulk_create`` and adds it to the search index in the same go.
+
+The distributions follow what the live data looks like:
+- sign-ups grow over time;
+- most sellers are individuals with small inventories in Accra or Kumasi;
+- recent sign-ups are mostly pending, older ones have been reviewed;
+- a few admins handle most of the reviews.
+
+Analytics history is one ``Analytics`` row per day plus its 24
+``HourlyAnalytics`` rows, which add up to the daily totals. Traffic grows
+over the years, with weekly and daily cycles.
+"""
+import math
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import Analytics, HourlyAnalytics, Seller
+from .search import get_search_backend
+
+CHUNK_SIZE = 10000
+BATCH_SIZE = 1000
+
+# Business names combine a word and a kind
+BUSINESS_WORDS = ('Golden', 'Royal', 'Grace', 'Unity', 'Sunrise', 'Accra', 'Kumasi', 'Star', 'Divine', 'Nana')
+BUSINESS_KINDS = (
+    'Electronics', 'Fashion', 'Foods', 'Mart', 'Motors', 'Furniture', 'Traders', 'Pharmacy', 'Cosmetics', 'Phones',
+)
+FIRST_NAMES = ('Kwame', 'Ama', 'Kofi', 'Akosua', 'Yaw', 'Abena', 'Kwesi', 'Efua', 'Kojo', 'Adwoa', 'Esi', 'Kwaku')
+SURNAMES = ('Mensah', 'Owusu', 'Boateng', 'Asante', 'Osei', 'Agyeman', 'Appiah', 'Darko', 'Addo', 'Quaye', 'Tetteh')
+PHONE_PREFIXES = ('024', '054', '055', '059', '020', '050', '026', '027')
+DESCRIPTIONS = (
+    'Quality products at fair prices.',
+    'Serving customers across the region with fast delivery.',
+    'Family business with over ten years of experience.',
+    'New and used items, wholesale and retail.',
+)
+
+# Weights of each choice, as (value, weight)
+BUSINESS_TYPES = (
+    ('individual', 40), ('retailer', 20), ('business', 15), ('wholesaler', 10), ('distributor', 8), ('manufacturer', 7),
+)
+INVENTORY_SIZES = (('small', 50), ('medium', 30), ('large', 15), ('enterprise', 5))
+EXPERIENCE_LEVELS = (('beginner', 40), ('intermediate', 35), ('advanced', 18), ('expert', 7))
+LOCATIONS = (
+    ('Accra', 35), ('Kumasi', 20), ('Tema', 8), ('Takoradi', 6), ('Tamale', 6), ('Cape Coast', 5),
+    ('Koforidua', 4), ('Sunyani', 4), ('Ho', 3), ('Obuasi', 3), ('Techiman', 3), ('Wa', 2), ('Bolgatanga', 1),
+)
+# Sellers who signed up in the last two weeks are mostly still pending
+RECENT_STATUSES = (('pending', 80), ('approved', 15), ('rejected', 5))
+STATUSES = (('pending', 10), ('approved', 75), ('rejected', 15))
+RECENT_DAYS = 14
+# How many admins a seller is assigned to
+ASSIGNED_COUNTS = ((0, 15), (1, 60), (2, 20), (3, 5))
+# Share of the day's page views in each hour, peaking at midday and in the evening
+HOURLY_SHARE = (1, 1, 1, 1, 1, 2, 3, 5, 6, 7, 8, 8, 8, 7, 7, 6, 6, 6, 7, 8, 8, 6, 4, 2)
+SUBMISSION_RATE = 0.015
+
+
+class Weighted:
+    """Draw values with the given weights"""
+
+    def __init__(self, choices):
+        self.values = [value for value, _weight in choices]
+        self.cum_weights = []
+        total = 0
+        for _value, weight in choices:
+            total += weight
+            self.cum_weights.append(total)
+
+    def __call__(self, rng):
+        return rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+business_type = Weighted(BUSINESS_TYPES)
+inventory_size = Weighted(INVENTORY_SIZES)
+experience_level = Weighted(EXPERIENCE_LEVELS)
+location = Weighted(LOCATIONS)
+recent_status = Weighted(RECENT_STATUSES)
+status = Weighted(STATUSES)
+assigned_count = Weighted(ASSIGNED_COUNTS)
+
+
+def ensure_admins(count):
+    """Primary keys of ``count`` staff users who review and are assigned sellers"""
+    ids = []
+    for n in range(1, count + 1):
+        user, created = User.objects.get_or_create(
+            username=f'seed-admin-{n:02d}', defaults={'is_staff': True, 'email': f'seed-admin-{n:02d}@example.com'}
+        )
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        ids.append(user.pk)
+    return ids
+
+
+def admin_weights(count):
+    # Zipf-like: the first admins handle most sellers
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def generate_chunk(chunk, first_id, size, seed, admin_ids, start, end):
+    """The sellers of one chunk and their admin assignments, as unsaved instances"""
+    rng = random.Random(f'{seed}:sellers:{chunk}')
+    weights = admin_weights(len(admin_ids))
+    span = (end - start).total_seconds()
+    recent = end - timedelta(days=RECENT_DAYS)
+    Assignment = Seller.assigned_admins.through
+
+    sellers, assignments = [], []
+    for pk in range(first_id, first_id + size):
+        first, surname = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+        # The square root skews sign-ups towards the end: the platform grows
+        created = start + timedelta(seconds=span * math.sqrt(rng.random()))
+        seller = Seller(
+            pk=pk,
+            business_name=f'{rng.choice(BUSINESS_WORDS)} {rng.choice(BUSINESS_KINDS)}',
+            business_type=business_type(rng),
+            business_description=rng.choice(DESCRIPTIONS),
+            owner_name=f'{first} {surname}',
+            email_address=f'{first}.{surname}{pk}@example.com'.lower(),
+            phone_number=f'{rng.choice(PHONE_PREFIXES)}{rng.randrange(10 ** 7):07d}',
+            location=location(rng),
+            experience_level=experience_level(rng),
+            inventory_size=inventory_size(rng),
+            status=recent_status(rng) if created > recent else status(rng),
+            created_at=created,
+            updated_at=created,
+        )
+        if seller.status != 'pending' and admin_ids:
+            seller.reviewed_by_id = rng.choices(admin_ids, weights)[0]
+            seller.reviewed_at = min(created + timedelta(hours=rng.uniform(1, 7 * 24)), end)
+            seller.updated_at = seller.reviewed_at
+        sellers.append(seller)
+        if admin_ids:
+            for user_id in set(rng.choices(admin_ids, weights, k=assigned_count(rng))):
+                assignments.append(Assignment(seller_id=pk, user_id=user_id))
+    return sellers, assignments
+
+
+@contextmanager
+def explicit_timestamps():
+    """Let bulk_create write the generated created_at/updated_at instead of now"""
+    created, updated = Seller._meta.get_field('created_at'), Seller._meta.get_field('updated_at')
+    saved = created.auto_now_add, updated.auto_now
+    created.auto_now_add = updated.auto_now = False
+    try:
+        yield
+    finally:
+        created.auto_now_add, updated.auto_now = saved
+
+
+def insert_chunk(chunk, first_id, size, seed, admin_ids, start, end, index=True):
+    """Generate and insert one chunk of sellers; returns the number of rows written"""
+    sellers, assignments = generate_chunk(chunk, first_id, size, seed, admin_ids, start, end)
+    alias = router.db_for_write(Seller)
+    with explicit_timestamps(), transaction.atomic(using=alias):
+        Seller.objects.using(alias).bulk_create(sellers, batch_size=BATCH_SIZE)
+        Seller.assigned_admins.through.objects.using(alias).bulk_create(assignments, batch_size=BATCH_SIZE)
+        if index:
+            get_search_backend().index(sellers)
+    return len(sellers) + len(assignments)
+
+
+def chunks(count, first_id):
+    """(chunk, first_id, size) of the chunks that make up ``count`` sellers"""
+    for chunk, offset in enumerate(range(0, count, CHUNK_SIZE)):
+        yield chunk, first_id + offset, min(CHUNK_SIZE, count - offset)
+
+
+def next_seller_id():
+    last = Seller.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def reset_sequences():
+    """Move the primary key sequences past the explicit ids, on databases that have them"""
+    alias = router.db_for_write(Seller)
+    connection = connections[alias]
+    statements = connection.ops.sequence_reset_sql(no_style(), [Seller, Seller.assigned_admins.through])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def daily_traffic(rng, date, day, days):
+    """Page views and form submissions of the ``day``-th day of the history, by hour"""
+    # Traffic grows tenfold over the history, dips at weekends and varies day to day
+    growth = 10 ** (day / max(days - 1, 1))
+    weekly = 0.8 if date.weekday() >= 5 else 1.1 if date.weekday() in (1, 2, 3) else 1.0
+    views = 200 * growth * weekly * rng.lognormvariate(0, 0.25)
+    total_share = sum(HOURLY_SHARE)
+    hours = []
+    for hour, share in enumerate(HOURLY_SHARE):
+        hour_views = int(views * share / total_share * rng.uniform(0.8, 1.2))
+        # About 1.5% of visitors apply, drawn from the normal approximation of the binomial
+        mean = hour_views * SUBMISSION_RATE
+        submissions = max(round(rng.gauss(mean, math.sqrt(mean * (1 - SUBMISSION_RATE)))), 0)
+        hours.append((hour, hour_views, min(submissions, hour_views)))
+    return hours
+
+
+def seed_analytics(days, seed, until):
+    """Write ``days`` of daily and hourly analytics up to the day before ``until``; returns the rows written
+
+    Days that already have analytics are left alone.
+    """
+    rng = random.Random(f'{seed}:analytics')
+    first = until - timedelta(days=days)
+    existing = set(Analytics.objects.filter(date__gte=first, date__lt=until).values_list('date', flat=True))
+
+    daily, hourly = [], []
+    for day in range(days):
+        date = first + timedelta(days=day)
+        # Draw every day, so the history does not depend on what is already there
+        hours = daily_traffic(rng, date, day, days)
+        if date in existing:
+            continue
+        daily.append(Analytics(
+            date=date,
+            page_views=sum(views for _hour, views, _submissions in hours),
+            form_submissions=sum(submissions for _hour, _views, submissions in hours),
+        ))
+        hourly.extend(
+            HourlyAnalytics(date=date, hour=hour, page_views=views, form_submissions=submissions)
+            for hour, views, submissions in hours
+        )
+    with transaction.atomic(using=router.db_for_write(Analytics)):
+        Analytics.objects.bulk_create(daily, batch_size=BATCH_SIZE)
+        HourlyAnalytics.objects.bulk_create(hourly, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(daily) + len(hourly)
+
+
+def history_window(years, until):
+    """The span sign-ups are spread over: ``years`` up to the start of the day ``until``
+
+    Fixed to a day rather than now, so a seed gives the same rows all day.
+    """
+    end = timezone.make_aware(datetime.combine(until, time.min))
+    return end - timedelta(days=round(365.25 * years)), end
@@ -1,13 +1,27 @@
 from rest_framework import serializers
+from rest_framework.fields import empty
 from .models import Seller, Analytics
 from django.contrib.auth.models import User
 
-class UserSerializer(serializers.ModelSerializer):
+from . import instrumentation
+
+
+class TimedSerializerMixin:
+    """Count serializing and validating towards the serializer time of instrumented requests"""
+
+    def to_representation(self, instance):
+        return instrumentation.time_serializer(super().to_representation, instance)
+
+    def run_validation(self, data=empty):
+        return instrumentation.time_serializer(super().run_validation, data)
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
-class SellerSerializer(serializers.ModelSerializer):
+class SellerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     reviewed_by = UserSerializer(read_only=True)
     
     class Meta:
@@ -20,7 +34,7 @@ class SellerSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at', 'reviewed_by', 'reviewed_at']
 
-class SellerCreateSerializer(serializers.ModelSerializer):
+class SellerCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Seller
         fields = [
@@ -29,17 +43,17 @@ class SellerCreateSerializer(serializers.ModelSerializer):
             'experience_level', 'inventory_size'
         ]
 
-class SellerStatusUpdateSerializer(serializers.ModelSerializer):
+class SellerStatusUpdateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Seller
         fields = ['status', 'review_notes']
 
-class AnalyticsSerializer(serializers.ModelSerializer):
+class AnalyticsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Analytics
         fields = ['id', 'date', 'page_views', 'form_submissions']
 
-class DashboardStatsSerializer(serializers.Serializer):
+class DashboardStatsSerializer(TimedSerializerMixin, serializers.Serializer):
     total_sellers = serializers.IntegerField()
     pending_sellers = serializers.IntegerField()
     approved_sellers = serializers.IntegerField()
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import pricing, stats
+from .analytics import analytics_recorded
+from .models import PricingPlan, Seller
+from .search import get_search_backend
+
+
+@receiver(pre_save, sender=Seller)
+def remember_seller_status(sender, instance, raw=False, **kwargs):
+    """Keep the stored status so post_save can tell whether it changed"""
+    instance._previous_status = None
+    if instance.pk and not raw:
+        instance._previous_status = (
+            Seller.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Seller)
+def update_snapshot_on_seller_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_status', None)
+    if created or previous is None:
+        stats.sellers_changed(added=[instance.status])
+    elif previous != instance.status:
+        stats.sellers_changed(added=[instance.status], removed=[previous])
+    stats.invalidate_admin_dashboard()
+
+
+@receiver(post_delete, sender=Seller)
+def update_snapshot_on_seller_delete(sender, instance, **kwargs):
+    stats.sellers_changed(removed=[instance.status])
+    stats.invalidate_admin_dashboard()
+
+
+@receiver(post_save, sender=Seller)
+def index_seller(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Seller)
+def unindex_seller(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(analytics_recorded)
+def update_snapshot_on_analytics(sender, batch, **kwargs):
+    stats.analytics_recorded(batch)
+
+
+@receiver(post_save, sender=PricingPlan)
+@receiver(post_delete, sender=PricingPlan)
+def invalidate_pricing(sender, **kwargs):
+    transaction.on_commit(pricing.invalidate)
@@ -0,0 +1,201 @@
+"""
+Slow-query log.
+
+An execute wrapper, added to every connection as it opens, times each query.
+Queries that take SLOW_QUERY_THRESHOLD_MS or longer are logged as one JSON
+line on the ``sellers.slow_queries`` logger, with:
+
+* the SQL, with its parameters only while SLOW_QUERY_LOG_PARAMS is on, as
+  they carry sellers' personal data (for ``executemany``, the number of rows);
+* the call site: the frames of this project's code that led to the query,
+  such as the view, serializer or admin method;
+* the ``EXPLAIN`` plan of SELECT statements, while SLOW_QUERY_EXPLAIN is on.
+  The plan is taken right after the query, on the same connection.
+
+The LOGGING settings send that logger to a rotating file at SLOW_QUERY_LOG,
+whose directory ``install()`` creates. Every worker process appends to it. ``/admin/slow-queries/`` reads the file
+and its backups and ranks the statements by total time. Statements that only
+differ in the length of an ``IN (...)`` list are counted as one.
+"""
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from contextlib import nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Frames of the call site kept per query, innermost last
+MAX_STACK = 8
+# Statements listed on the admin page
+REPORT_LIMIT = 50
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SELECT = re.compile(r'\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+_explaining = ContextVar('sellers_slow_query_explain', default=False)
+# The execute wrappers between the caller and the database
+_WRAPPERS = {__file__, instrumentation.__file__}
+
+
+def threshold():
+    """Seconds a query may take before it is logged"""
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 0) / 1000
+
+
+def _capture(execute, sql, params, many, context):
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = time.perf_counter() - started
+    limit = threshold()
+    # The EXPLAIN of a slow query goes through here too
+    if limit and elapsed >= limit and not _explaining.get():
+        record(context['connection'], sql, params, many, elapsed)
+    return result
+
+
+def _install(connection, **kwargs):
+    # First in the list, like the instrumentation wrapper: execute_wrapper()
+    # blocks pop the last wrapper on exit
+    if _capture not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _capture)
+
+
+def install():
+    """Time the queries of every connection; safe to call again"""
+    log = Path(getattr(settings, 'SLOW_QUERY_LOG', ''))
+    if log.name:
+        log.parent.mkdir(parents=True, exist_ok=True)
+    connection_created.connect(_install, dispatch_uid='sellers.slow_queries')
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+def _location(frame, root):
+    path = frame.filename
+    if 'site-packages' in path:
+        path = path.split('site-packages', 1)[1].lstrip('/\\')
+    elif path.startswith(root):
+        path = str(Path(path).relative_to(root))
+    return f'{path}:{frame.lineno} in {frame.name}'
+
+
+def call_site():
+    """The frames of this project's code on the stack, innermost last
+
+    When the query came from library code, such as the admin's changelist,
+    the innermost frame outside the database layer is added at the end.
+    """
+    root = str(settings.BASE_DIR)
+    stack = [frame for frame in traceback.extract_stack() if frame.filename not in _WRAPPERS]
+    frames = [frame for frame in stack if frame.filename.startswith(root) and 'site-packages' not in frame.filename]
+    caller = next((
+        frame for frame in reversed(stack)
+        if f'django{os.sep}db{os.sep}' not in frame.filename and f'django{os.sep}utils{os.sep}' not in frame.filename
+    ), None)
+    if caller is not None and (not frames or frames[-1] is not caller):
+        frames.append(caller)
+    return [_location(frame, root) for frame in frames[-MAX_STACK:]]
+
+
+def explain(connection, sql, params):
+    """The query plan of a SELECT, as text, or None for other statements"""
+    if not _SELECT.match(sql):
+        return None
+    # A failed statement inside a transaction would abort it on PostgreSQL
+    if connection.in_atomic_block and connection.needs_rollback:
+        return None
+    token = _explaining.set(True)
+    try:
+        prefix = connection.ops.explain_query_prefix()
+        savepoint = transaction.atomic(using=connection.alias) if connection.in_atomic_block else nullcontext()
+        with savepoint, connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+    except DatabaseError as e:
+        return f'EXPLAIN failed: {e}'
+    finally:
+        _explaining.reset(token)
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join('\t'.join(str(column) for column in row) for row in rows)
+
+
+def record(connection, sql, params, many, elapsed):
+    entry = {
+        'time': timezone.now().isoformat(timespec='seconds'),
+        'alias': connection.alias,
+        'duration_ms': round(elapsed * 1000, 2),
+        'sql': sql,
+        'params': params if not many and getattr(settings, 'SLOW_QUERY_LOG_PARAMS', False) else None,
+        'rows': len(params) if many and params is not None else None,
+        'stack': call_site(),
+        'plan': None,
+    }
+    if not many and getattr(settings, 'SLOW_QUERY_EXPLAIN', False):
+        entry['plan'] = explain(connection, sql, params)
+    logger.warning(json.dumps(entry, default=str))
+
+
+def fingerprint(sql):
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def log_files():
+    """The log and its rotated backups, oldest first"""
+    path = Path(getattr(settings, 'SLOW_QUERY_LOG', ''))
+    if not path.name:
+        return []
+    backups = sorted(
+        (file for file in path.parent.glob(path.name + '.*') if file.suffix[1:].isdigit()),
+        key=lambda file: -int(file.suffix[1:])
+    )
+    return [*backups, path] if path.exists() else backups
+
+
+def entries():
+    for path in log_files():
+        try:
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            # Rotated away while reading
+            continue
+
+
+def report(limit=REPORT_LIMIT):
+    """Logged statements ranked by total time, with their slowest execution"""
+    statements = {}
+    for entry in entries():
+        key = fingerprint(entry['sql'])
+        statement = statements.get(key)
+        if statement is None:
+            statement = statements[key] = {
+                'sql': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_seen': None, 'slowest': entry,
+            }
+        statement['count'] += 1
+        statement['total_ms'] += entry['duration_ms']
+        statement['last_seen'] = max(statement['last_seen'] or entry['time'], entry['time'])
+        if entry['duration_ms'] >= statement['max_ms']:
+            statement['max_ms'] = entry['duration_ms']
+            statement['slowest'] = entry
+    ranked = sorted(statements.values(), key=lambda statement: -statement['total_ms'])[:limit]
+    for statement in ranked:
+        statement['total_ms'] = round(statement['total_ms'], 2)
+        statement['mean_ms'] = round(statement['total_ms'] / statement['count'], 2)
+    return ranked
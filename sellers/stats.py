@@ -0,0 +1,263 @@
+"""
+Dashboard statistics.
+
+``DashboardStatsView`` reads a single ``DashboardSnapshot`` row instead of
+aggregating the seller and analytics tables on every poll. Seller signals and
+analytics flushes adjust its counters in place with ``F()`` expressions once
+their transaction commits, so writers never hold the lock of that one row
+while they work. The row is rebuilt from scratch once a day, when the period
+windows move, after an edit of the daily analytics in the admin or API, or on
+demand with the ``refresh_dashboard_snapshot`` command.
+
+A rebuild locks the row and records when it started in ``rebuilt_at``.
+Adjustments carry the time of their change and skip a snapshot rebuilt after
+it, since the rebuild already counted the change.
+
+The context of the ``admin_dashboard`` page is cached for
+``ADMIN_DASHBOARD_CACHE_TIMEOUT`` seconds under a version number that seller
+changes bump, so edits show up immediately.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import analytics, metrics
+from .models import Analytics, AnalyticsShard, DashboardSnapshot, Seller
+from .routers import use_primary
+
+SNAPSHOT_ID = 1
+PERIODS = ('today', '7days', '30days', '90days')
+# DashboardStatsView has always answered period=today with the 7-day figures
+DASHBOARD_PERIODS = ('7days', '30days', '90days')
+STATUSES = [choice for choice, _label in Seller.STATUS_CHOICES]
+
+ADMIN_DASHBOARD_CACHE_KEY = 'sellers:admin_dashboard'
+ADMIN_DASHBOARD_VERSION_KEY = 'sellers:admin_dashboard:version'
+RECENT_SELLERS_LIMIT = 5
+
+
+def rebuild(today=None):
+    """Recompute every counter of the snapshot from the source tables"""
+    today = today or timezone.now().date()
+    # The IMMEDIATE transactions of the tuned SQLite profile take the write
+    # lock at BEGIN; elsewhere the row lock holds back concurrent adjustments
+    with transaction.atomic():
+        list(DashboardSnapshot.objects.select_for_update().filter(pk=SNAPSHOT_ID).values_list('pk'))
+        return _rebuild(today, rebuilt_at=timezone.now())
+
+
+def _rebuild(today, rebuilt_at):
+    seller_stats = Seller.objects.aggregate(
+        total=Count('id'),
+        **{status: Count('id', filter=Q(status=status)) for status in STATUSES}
+    )
+    values = {'total_sellers': seller_stats['total']}
+    for status in STATUSES:
+        values[f'{status}_sellers'] = seller_stats[status]
+
+    series = analytics.daily_series(analytics.period_start('90days', today))
+    for period in PERIODS:
+        start_date = analytics.period_start(period, today)
+        days = [day for day in series if day['date'] >= start_date]
+        values[f'views_{period}'] = sum(day['page_views'] for day in days)
+        values[f'submissions_{period}'] = sum(day['form_submissions'] for day in days)
+    values.update(_day_counts(today))
+
+    values['analytics_date'] = today
+    values['rebuilt_at'] = rebuilt_at
+
+    snapshot, _ = DashboardSnapshot.objects.update_or_create(pk=SNAPSHOT_ID, defaults=values)
+    return snapshot
+
+
+def get_snapshot():
+    """Return today's snapshot, rebuilding it if it is missing or from another day"""
+    today = timezone.now().date()
+    snapshot = DashboardSnapshot.objects.filter(pk=SNAPSHOT_ID).first()
+    if snapshot is None or snapshot.analytics_date != today:
+        # The counters are adjusted in place afterwards, so they must start from the primary
+        with use_primary():
+            snapshot = rebuild(today)
+    return snapshot
+
+
+def dashboard_stats(period='7days'):
+    """Stats for ``DashboardStatsSerializer`` read from the snapshot"""
+    if period not in DASHBOARD_PERIODS:
+        period = '7days'
+
+    snapshot = get_snapshot()
+    return {
+        'total_sellers': snapshot.total_sellers,
+        'pending_sellers': snapshot.pending_sellers,
+        'approved_sellers': snapshot.approved_sellers,
+        'rejected_sellers': snapshot.rejected_sellers,
+        'total_views': getattr(snapshot, f'views_{period}'),
+        'total_submissions': getattr(snapshot, f'submissions_{period}'),
+        'total_days': getattr(snapshot, f'days_{period}'),
+    }
+
+
+def _adjust(queryset, deltas):
+    increments = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if increments:
+        queryset.update(**increments)
+
+
+def _after_commit(apply):
+    """Call ``apply(snapshot)`` once the current transaction commits, outside of it.
+
+    ``snapshot`` is the snapshot row as a queryset, left empty if the row was
+    rebuilt after the change and therefore already counts it.
+    """
+    changed_at = timezone.now()
+    snapshot = DashboardSnapshot.objects.filter(
+        Q(rebuilt_at__lt=changed_at) | Q(rebuilt_at__isnull=True), pk=SNAPSHOT_ID
+    )
+    transaction.on_commit(lambda: apply(snapshot))
+
+
+def sellers_changed(added=(), removed=()):
+    """Apply seller status counts; ``added``/``removed`` are iterables of statuses"""
+    deltas = Counter()
+    for status in added:
+        deltas['total_sellers'] += 1
+        if status in STATUSES:
+            deltas[f'{status}_sellers'] += 1
+    for status in removed:
+        deltas['total_sellers'] -= 1
+        if status in STATUSES:
+            deltas[f'{status}_sellers'] -= 1
+
+    # A missing snapshot is built on the next read, so there is nothing to adjust.
+    _after_commit(lambda snapshot: _adjust(snapshot, deltas))
+
+
+def analytics_recorded(batch, today=None):
+    """Apply a ``{(date, hour, field): count}`` batch written by ``analytics.record``"""
+    today = today or timezone.now().date()
+    _after_commit(lambda snapshot: _apply_analytics(snapshot, batch, today))
+
+
+def analytics_edited():
+    """Drop the snapshot after a direct edit of the daily analytics; the next read rebuilds it"""
+    transaction.on_commit(lambda: DashboardSnapshot.objects.filter(pk=SNAPSHOT_ID).delete())
+
+
+def _apply_analytics(snapshot, batch, today):
+    # A snapshot anchored on another day is rebuilt on its next read instead.
+    current = snapshot.filter(analytics_date=today)
+
+    per_day = Counter()
+    for (date, _hour, field), count in batch.items():
+        per_day[(date, field)] += count
+
+    deltas = Counter()
+    for (date, field), count in per_day.items():
+        prefix = 'views' if field == 'page_views' else 'submissions'
+        for period in _periods_covering(date, today):
+            deltas[f'{prefix}_{period}'] += count
+    _adjust(current, deltas)
+
+    dates = sorted({date for date, _field in per_day if _periods_covering(date, today)})
+    if not dates:
+        return
+    # A worker flushing an earlier day after others flushed a later one (around
+    # midnight) may or may not add a day, so the days are counted again
+    if current.filter(last_active_date__gt=dates[0]).exists():
+        current.update(**_day_counts(today))
+        return
+
+    for date in dates:
+        periods = _periods_covering(date, today)
+        first_activity = current.filter(
+            Q(last_active_date__lt=date) | Q(last_active_date__isnull=True)
+        )
+        first_activity.update(
+            last_active_date=date,
+            **{f'days_{period}': F(f'days_{period}') + 1 for period in periods}
+        )
+
+
+def _day_counts(today):
+    """``days_<period>`` and ``last_active_date`` counted from the days with analytics"""
+    start_date = analytics.period_start('90days', today)
+    dates = sorted(
+        Analytics.objects.filter(date__gte=start_date).order_by().values_list('date', flat=True)
+        .union(AnalyticsShard.objects.filter(date__gte=start_date).order_by().values_list('date', flat=True))
+    )
+    values = {
+        f'days_{period}': sum(1 for date in dates if date >= analytics.period_start(period, today))
+        for period in PERIODS
+    }
+    values['last_active_date'] = dates[-1] if dates else None
+    return values
+
+
+def _periods_covering(date, today):
+    if date > today:
+        return []
+    return [period for period in PERIODS if date >= analytics.period_start(period, today)]
+
+
+def admin_dashboard_context():
+    """Context for ``admin/dashboard.html``, served from the cache when possible"""
+    version = cache.get_or_set(ADMIN_DASHBOARD_VERSION_KEY, 1, timeout=None)
+    context = cache.get(ADMIN_DASHBOARD_CACHE_KEY, version=version)
+    metrics.cache_lookup('admin_dashboard', context is not None)
+    if context is None:
+        context = build_admin_dashboard_context()
+        timeout = getattr(settings, 'ADMIN_DASHBOARD_CACHE_TIMEOUT', 30)
+        cache.set(ADMIN_DASHBOARD_CACHE_KEY, context, timeout, version=version)
+    return context
+
+
+def build_admin_dashboard_context(today=None):
+    """Compute the admin dashboard context with a fixed number of queries"""
+    today = today or timezone.now().date()
+
+    # One grouped aggregation gives both the status and business type totals
+    seller_stats = dict.fromkeys(['total', *STATUSES], 0)
+    business_types = Counter()
+    grouped = Seller.objects.order_by().values('status', 'business_type').annotate(count=Count('id'))
+    for row in grouped:
+        seller_stats['total'] += row['count']
+        if row['status'] in STATUSES:
+            seller_stats[row['status']] += row['count']
+        business_types[row['business_type']] += row['count']
+
+    recent_sellers = list(
+        Seller.objects.only('business_name', 'owner_name', 'status', 'created_at')
+        .order_by('-created_at')[:RECENT_SELLERS_LIMIT]
+    )
+
+    recent_analytics = analytics.daily_series(today - timedelta(days=7))[::-1]
+    today_analytics = next((day for day in recent_analytics if day['date'] == today), None)
+
+    return {
+        'today_analytics': today_analytics,
+        'recent_analytics': recent_analytics,
+        'seller_stats': seller_stats,
+        'total_sellers': seller_stats['total'],
+        'pending_sellers': seller_stats['pending'],
+        'approved_sellers': seller_stats['approved'],
+        'rejected_sellers': seller_stats['rejected'],
+        'recent_sellers': recent_sellers,
+        'business_types': [
+            {'business_type': business_type, 'count': count}
+            for business_type, count in business_types.most_common()
+        ],
+    }
+
+
+def invalidate_admin_dashboard():
+    """Move the admin dashboard cache to a new version"""
+    try:
+        cache.incr(ADMIN_DASHBOARD_VERSION_KEY)
+    except ValueError:
+        cache.set(ADMIN_DASHBOARD_VERSION_KEY, 1, timeout=None)
@@ -0,0 +1,259 @@
+"""
+Queued seller submissions.
+
+With ``SELLER_SUBMISSION_MODE = 'queue'`` the public form validates the
+application, appends it to a local SQLite journal and answers 202 with a
+tracking id. The ``process_submissions`` command drains the journal in
+batches: each batch is inserted with one ``bulk_create`` and one aggregated
+analytics increment, inside a single transaction.
+
+Entries are claimed before they are processed and only deleted after their
+batch has committed. A worker that dies mid-batch leaves its claims behind;
+they expire after ``SELLER_SUBMISSION_LEASE`` seconds and are replayed.
+``Seller.submission_id`` makes the replay skip applications that were already
+inserted, so nothing is stored or counted twice.
+
+When the journal holds ``SELLER_SUBMISSION_QUEUE_MAX_DEPTH`` entries the form
+stops queueing and inserts synchronously until the worker catches up.
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import Counter
+from contextlib import closing
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from . import analytics, stats
+from .models import Seller
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tracking_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+-- Kept by triggers so the form checks the depth without counting the journal
+CREATE TABLE IF NOT EXISTS queue_depth (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    depth INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO queue_depth (id, depth) SELECT 0, COUNT(*) FROM submissions;
+CREATE TRIGGER IF NOT EXISTS submissions_enqueued AFTER INSERT ON submissions
+BEGIN
+    UPDATE queue_depth SET depth = depth + 1 WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS submissions_removed AFTER DELETE ON submissions
+BEGIN
+    UPDATE queue_depth SET depth = depth - 1 WHERE id = 0;
+END;
+"""
+
+
+class SubmissionQueue:
+    """Durable FIFO of validated seller applications in a SQLite file"""
+
+    def __init__(self, path=None):
+        self.path = str(path or settings.SELLER_SUBMISSION_QUEUE_PATH)
+        self._ready = False
+
+    @property
+    def lease(self):
+        return getattr(settings, 'SELLER_SUBMISSION_LEASE', 300)
+
+    @property
+    def max_attempts(self):
+        return getattr(settings, 'SELLER_SUBMISSION_MAX_ATTEMPTS', 5)
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        # Every append is fsynced before the 202 is sent
+        connection.execute('PRAGMA synchronous = FULL')
+        if not self._ready:
+            connection.execute('PRAGMA journal_mode = WAL')
+            # One transaction, so the depth starts from a count no other
+            # process can change before the triggers exist
+            connection.executescript(f'BEGIN IMMEDIATE; {SCHEMA} COMMIT;')
+            self._ready = True
+        return closing(connection)
+
+    def enqueue(self, data):
+        """Append validated serializer data and return its tracking id"""
+        tracking_id = str(uuid.uuid4())
+        with self.connect() as connection:
+            connection.execute(
+                'INSERT INTO submissions (tracking_id, payload, enqueued_at) VALUES (?, ?, ?)',
+                (tracking_id, json.dumps(data), time.time())
+            )
+        return tracking_id
+
+    def claim(self, limit):
+        """Claim up to ``limit`` entries, oldest first, including expired claims"""
+        token = f'{os.getpid()}:{uuid.uuid4().hex}'
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'UPDATE submissions SET claimed_by = ?, claimed_at = ?, attempts = attempts + 1 '
+                'WHERE seq IN (SELECT seq FROM submissions '
+                'WHERE attempts < ? AND (claimed_at IS NULL OR claimed_at < ?) '
+                'ORDER BY seq LIMIT ?)',
+                (token, now, self.max_attempts, now - self.lease, limit)
+            )
+            rows = connection.execute(
+                'SELECT tracking_id, payload, enqueued_at, attempts FROM submissions '
+                'WHERE claimed_by = ? ORDER BY seq',
+                (token,)
+            ).fetchall()
+            connection.execute('COMMIT')
+        return [
+            {'tracking_id': tracking_id, 'data': json.loads(payload),
+             'enqueued_at': enqueued_at, 'attempts': attempts}
+            for tracking_id, payload, enqueued_at, attempts in rows
+        ]
+
+    def ack(self, tracking_ids):
+        with self.connect() as connection:
+            connection.executemany(
+                'DELETE FROM submissions WHERE tracking_id = ?', [(pk,) for pk in tracking_ids]
+            )
+
+    def release(self, tracking_ids, error):
+        """Give claimed entries back for another attempt"""
+        with self.connect() as connection:
+            connection.executemany(
+                'UPDATE submissions SET claimed_by = NULL, claimed_at = NULL, last_error = ? '
+                'WHERE tracking_id = ?',
+                [(error, pk) for pk in tracking_ids]
+            )
+
+    def lookup(self, tracking_id):
+        """State of a queued entry, or None once it has been processed"""
+        with self.connect() as connection:
+            row = connection.execute(
+                'SELECT attempts, last_error FROM submissions WHERE tracking_id = ?', (tracking_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'failed': row[0] >= self.max_attempts, 'error': row[1]}
+
+    def metrics(self):
+        """Backpressure figures: depth, in-flight claims, dead entries and lag"""
+        now = time.time()
+        with self.connect() as connection:
+            depth, in_flight, failed, oldest = connection.execute(
+                'SELECT COUNT(*), '
+                'COALESCE(SUM(claimed_at >= ?), 0), '
+                'COALESCE(SUM(attempts >= ?), 0), '
+                'MIN(CASE WHEN attempts < ? THEN enqueued_at END) '
+                'FROM submissions',
+                (now - self.lease, self.max_attempts, self.max_attempts)
+            ).fetchone()
+        return {
+            'depth': depth,
+            'in_flight': in_flight,
+            'failed': failed,
+            'oldest_age': round(now - oldest, 3) if oldest is not None else 0.0,
+        }
+
+    def depth(self):
+        with self.connect() as connection:
+            return connection.execute('SELECT depth FROM queue_depth').fetchone()[0]
+
+    def is_full(self):
+        return self.depth() >= getattr(settings, 'SELLER_SUBMISSION_QUEUE_MAX_DEPTH', 10000)
+
+
+_queue = None
+
+
+def get_queue():
+    global _queue
+    path = str(settings.SELLER_SUBMISSION_QUEUE_PATH)
+    if _queue is None or _queue.path != path:
+        _queue = SubmissionQueue(path)
+    return _queue
+
+
+def queueing_enabled():
+    return getattr(settings, 'SELLER_SUBMISSION_MODE', 'sync') == 'queue'
+
+
+def process_batch(entries):
+    """Insert a claimed batch and apply its side effects in one transaction.
+
+    ``bulk_create`` sends no signals, so the snapshot counters, the search
+    index, the admin dashboard cache and the analytics counts that the
+    Seller receivers maintain are updated here directly. Returns the number
+    of sellers created; entries already inserted by an earlier attempt are
+    skipped.
+    """
+    by_id = {uuid.UUID(entry['tracking_id']): entry for entry in entries}
+
+    with transaction.atomic():
+        done = set(
+            Seller.objects.filter(submission_id__in=by_id).values_list('submission_id', flat=True)
+        )
+        new = [submission_id for submission_id in by_id if submission_id not in done]
+        if not new:
+            return 0
+
+        Seller.objects.bulk_create(
+            [Seller(submission_id=submission_id, **by_id[submission_id]['data']) for submission_id in new]
+        )
+        sellers = list(Seller.objects.filter(submission_id__in=new))
+
+        stats.sellers_changed(added=[seller.status for seller in sellers])
+        get_search_backend().index(sellers)
+
+        # Submissions count towards the hour they were received in
+        submissions = Counter()
+        for submission_id in new:
+            received = datetime.fromtimestamp(by_id[submission_id]['enqueued_at'], tz=dt_timezone.utc)
+            submissions[(received.date(), received.hour, 'form_submissions')] += 1
+        analytics.record(submissions)
+
+        transaction.on_commit(stats.invalidate_admin_dashboard)
+    return len(new)
+
+
+def drain(queue=None, batch_size=500, max_batches=None):
+    """Process claimed batches until the queue is empty; returns the totals"""
+    queue = queue or get_queue()
+    totals = Counter()
+    while max_batches is None or totals['batches'] < max_batches:
+        entries = queue.claim(batch_size)
+        if not entries:
+            break
+        totals['batches'] += 1
+        try:
+            totals['created'] += process_batch(entries)
+        except Exception:
+            logger.exception("Seller submission batch of %d failed, retrying one by one", len(entries))
+            # Still holding the claims, retry singly so one bad entry cannot hold back the rest
+            for entry in entries:
+                try:
+                    totals['created'] += process_batch([entry])
+                except Exception as exc:
+                    queue.release([entry['tracking_id']], str(exc))
+                    totals['failed'] += 1
+                else:
+                    queue.ack([entry['tracking_id']])
+                    totals['processed'] += 1
+            continue
+        queue.ack([entry['tracking_id'] for entry in entries])
+        totals['processed'] += len(entries)
+    return totals
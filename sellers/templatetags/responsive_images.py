@@ -0,0 +1,41 @@
+from django import template
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from oysloe_admin import images
+
+register = template.Library()
+
+
+def _candidates(by_width):
+    return ', '.join(f'{static(name)} {width}w' for width, name in sorted(by_width.items(), key=lambda item: int(item[0])))
+
+
+@register.simple_tag
+def srcset(name, alt='', sizes='100vw', **attrs):
+    """
+    ``<picture>`` for a static image with the AVIF/WebP variants and widths
+    generated by collectstatic, falling back to a plain ``<img>``:
+
+        {% load responsive_images %}
+        {% srcset 'man1.jpg' alt='Seller' sizes='(max-width: 768px) 100vw, 50vw' loading='lazy' %}
+    """
+    entry = images.variants(name)
+    if entry is None:
+        return format_html('<img src="{}" alt="{}"{}>', static(name), alt, flatatt(attrs))
+
+    source_format = images.SOURCE_FORMATS[name[name.rfind('.'):].lower()]
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (images.MIME_TYPES[fmt], _candidates(entry['variants'][fmt]), sizes)
+            for fmt in ('avif', 'webp') if fmt in entry['variants']
+        )
+    )
+    # Intrinsic size, so the page does not shift while the image loads
+    attrs = {'width': entry['width'], 'height': entry['height'], **attrs}
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        sources, static(name), _candidates(entry['variants'][source_format]), sizes, alt, flatatt(attrs)
+    )
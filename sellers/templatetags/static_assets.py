@@ -0,0 +1,49 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from oysloe_admin import assets
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def stylesheet(context, name):
+    """
+    A stylesheet, with the critical CSS that collectstatic extracted for this
+    page inlined and the rest loaded without blocking rendering:
+
+        {% load static_assets %}
+        {% stylesheet 'styles.css' %}
+
+    Without extracted CSS, or in DEBUG, it is a plain ``<link>``.
+    """
+    css = None if settings.DEBUG else assets.critical(context.template.origin.template_name, name)
+    if css is None:
+        return format_html('<link rel="stylesheet" href="{}">', static(name))
+    return format_html(
+        '<style>{}</style>'
+        '<link rel="stylesheet" href="{}" media="print" onload="this.media=\'all\'">'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        # Nothing in a stylesheet may end the element early
+        mark_safe(css.replace('</', '<\\/')), static(name), static(name)
+    )
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    A deferred script bundle of STATIC_BUNDLES:
+
+        {% bundle 'bundles/landing.js' %}
+
+    Until collectstatic has built it, or in DEBUG, its scripts are loaded one
+    by one, in the same order.
+    """
+    if not settings.DEBUG and name in assets.manifest().get('bundles', {}):
+        sources = [name]
+    else:
+        sources = settings.STATIC_BUNDLES[name]
+    return format_html_join('', '<script src="{}" defer></script>', ((static(source),) for source in sources))
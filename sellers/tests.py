@@ -1,3 +1,1565 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, connections, router
+from django.db.models import BooleanField, Value
+from django.db.models.expressions import RawSQL
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.handlers.asgi import ASGIHandler
+from django.template import Context, Template
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from oysloe_admin import assets, images, pages
+from oysloe_admin import storage as storage_module
+from oysloe_admin.handlers import get_wsgi_application
+
+from . import (
+    analytics, instrumentation, metrics, pricing, public_views, routers, search, seeding, slow_queries, stats,
+    submissions,
+)
+from .benchmarks import compare, process_tree_rss, wsgi_environ
+from .counters import AnalyticsBuffer, analytics_buffer
+from .middleware import ReplicaRoutingMiddleware
+from .search import get_search_backend
+from .models import Analytics, DashboardSnapshot, HourlyAnalytics, Seller, PricingPlan, ReplicationHeartbeat
+
+
+def seed_sellers(count, admins=()):
+    """Bulk-create ``count`` sellers spread over every status and choice field"""
+    now = timezone.now()
+    sellers = []
+    for i in range(count):
+        sellers.append(Seller(
+            business_name=f'Business {i}',
+            business_type=Seller.BUSINESS_TYPE_CHOICES[i % len(Seller.BUSINESS_TYPE_CHOICES)][0],
+            business_description='Seeded seller',
+            owner_name=f'Owner {i}',
+            email_address=f'seller{i}@example.com',
+            phone_number='0552891234',
+            location='Accra',
+            experience_level=Seller.EXPERIENCE_CHOICES[i % len(Seller.EXPERIENCE_CHOICES)][0],
+            inventory_size=Seller.INVENTORY_CHOICES[i % len(Seller.INVENTORY_CHOICES)][0],
+            status=Seller.STATUS_CHOICES[i % len(Seller.STATUS_CHOICES)][0],
+        ))
+    sellers = Seller.objects.bulk_create(sellers)
+    Seller.objects.update(created_at=now)
+    for i, seller in enumerate(sellers[:50]):
+        seller.created_at = now - timedelta(minutes=i)
+    Seller.objects.bulk_update(sellers[:50], ['created_at'])
+    for admin in admins:
+        admin.assigned_sellers.add(*sellers[::7])
+    return sellers
+
+
+# The tests flush the analytics buffer themselves; a timer thread writing
+# into the test database outside their transactions would leak rows
+_no_flush_timer = override_settings(ANALYTICS_FLUSH_TIMER=False)
+
+
+def setUpModule():
+    _no_flush_timer.enable()
+
+
+def tearDownModule():
+    _no_flush_timer.disable()
+
+
+class AnalyticsBufferTests(TestCase):
+    """Hits are batched per hour, kept on failure and flushed when idle"""
+
+    def setUp(self):
+        self.buffer = AnalyticsBuffer()
+
+    def test_hits_are_batched_into_one_write_per_hour(self):
+        now = timezone.now()
+        with override_settings(ANALYTICS_FLUSH_INTERVAL=3600), CaptureQueriesContext(connection) as queries:
+            for _ in range(50):
+                self.buffer.incr('page_views', when=now)
+            self.buffer.incr('form_submissions', amount=2, when=now)
+        self.assertEqual(len(queries), 0)
+
+        self.assertEqual(self.buffer.flush(), 52)
+        totals = analytics.period_totals(now.date())
+        self.assertEqual((totals['total_views'], totals['total_submissions']), (50, 2))
+
+    def test_interval_elapsed_flushes_in_the_request(self):
+        with override_settings(ANALYTICS_FLUSH_INTERVAL=0):
+            self.buffer.incr('page_views')
+        self.assertEqual(self.buffer.pending('page_views'), 0)
+        self.assertEqual(analytics.period_totals(timezone.now().date())['total_views'], 1)
+
+    def test_failed_flush_returns_counts_to_the_buffer(self):
+        with override_settings(ANALYTICS_FLUSH_INTERVAL=3600):
+            self.buffer.incr('page_views', amount=3)
+        with mock.patch('sellers.counters.record', side_effect=RuntimeError('locked')):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.pending('page_views'), 3)
+
+        with override_settings(ANALYTICS_FLUSH_INTERVAL=3600):
+            self.buffer.incr('page_views')
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(self.buffer.pending('page_views'), 0)
+
+    def test_pending_counts_one_field_and_day(self):
+        now = timezone.now()
+        with override_settings(ANALYTICS_FLUSH_INTERVAL=3600):
+            self.buffer.incr('page_views', amount=2, when=now)
+            self.buffer.incr('page_views', amount=5, when=now - timedelta(days=1))
+            self.buffer.incr('form_submissions', when=now)
+        self.assertEqual(self.buffer.pending('page_views'), 2)
+        self.assertEqual(self.buffer.pending('page_views', now.date() - timedelta(days=1)), 5)
+        self.assertEqual(self.buffer.pending('form_submissions'), 1)
+        with self.assertRaises(ValueError):
+            self.buffer.incr('clicks')
+
+    def test_idle_buffer_is_flushed_by_the_timer(self):
+        flushed = threading.Event()
+        batches = []
+
+        def record(batch):
+            batches.append(dict(batch))
+            flushed.set()
+
+        with override_settings(ANALYTICS_FLUSH_TIMER=True, ANALYTICS_FLUSH_INTERVAL=0.05), \
+                mock.patch('sellers.counters.record', side_effect=record):
+            self.buffer.incr('page_views', amount=4)
+            # No further hits arrive to trigger a flush
+            self.assertTrue(flushed.wait(5))
+        self.assertEqual(sum(batches[0].values()), 4)
+        self.assertEqual(self.buffer.pending('page_views'), 0)
+
+
+def create_seller(name='Signal Shop', status='pending'):
+    """Create one seller through the ORM so the model signals run"""
+    return Seller.objects.create(
+        business_name=name, business_type='retailer', business_description='Created',
+        owner_name='Ama', email_address='ama@example.com', phone_number='0552891234',
+        location='Accra', experience_level='beginner', inventory_size='small', status=status,
+    )
+
+
+class DashboardSnapshotTests(TestCase):
+    """The snapshot adjusted in place always equals a rebuild from the source tables"""
+
+    def setUp(self):
+        self.today = timezone.now().date()
+
+    def committed(self):
+        """Run the snapshot adjustments, which wait for the writer's commit"""
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def fields(self, snapshot):
+        return {
+            field.name: getattr(snapshot, field.name) for field in snapshot._meta.fields
+            if field.name not in ('id', 'updated_at', 'rebuilt_at')
+        }
+
+    def assertMatchesRebuild(self):
+        adjusted = self.fields(stats.get_snapshot())
+        self.assertEqual(adjusted, self.fields(stats.rebuild()))
+        return adjusted
+
+    def test_seller_signals_adjust_counts(self):
+        stats.get_snapshot()
+        with self.committed():
+            seller = create_seller()
+        snapshot = self.assertMatchesRebuild()
+        self.assertEqual((snapshot['total_sellers'], snapshot['pending_sellers']), (1, 1))
+
+        with self.committed():
+            seller.status = 'approved'
+            seller.save()
+        snapshot = self.assertMatchesRebuild()
+        self.assertEqual((snapshot['pending_sellers'], snapshot['approved_sellers']), (0, 1))
+
+        with self.committed():
+            seller.delete()
+        snapshot = self.assertMatchesRebuild()
+        self.assertEqual((snapshot['total_sellers'], snapshot['approved_sellers']), (0, 0))
+
+    def test_adjustments_wait_for_the_commit(self):
+        stats.get_snapshot()
+        with self.captureOnCommitCallbacks() as callbacks:
+            create_seller()
+            analytics.record({(self.today, 0, 'page_views'): 4})
+            self.assertEqual(DashboardSnapshot.objects.get().total_sellers, 0)
+            self.assertEqual(DashboardSnapshot.objects.get().views_today, 0)
+
+        for callback in callbacks:
+            callback()
+        snapshot = DashboardSnapshot.objects.get()
+        self.assertEqual((snapshot.total_sellers, snapshot.views_today), (1, 4))
+
+    def test_rebuild_after_a_change_is_not_adjusted_again(self):
+        stats.get_snapshot()
+        with self.captureOnCommitCallbacks() as callbacks:
+            create_seller()
+            analytics.record({(self.today, 0, 'page_views'): 4})
+        # The rebuild runs between the commit and the adjustment
+        stats.rebuild()
+        for callback in callbacks:
+            callback()
+        snapshot = self.assertMatchesRebuild()
+        self.assertEqual((snapshot['total_sellers'], snapshot['views_today'], snapshot['days_today']), (1, 4, 1))
+
+    def test_analytics_flushes_adjust_periods(self):
+        stats.get_snapshot()
+        with self.committed():
+            analytics.record({
+                (self.today, 0, 'page_views'): 4,
+                (self.today - timedelta(days=3), 10, 'page_views'): 2,
+                (self.today - timedelta(days=20), 10, 'form_submissions'): 1,
+            })
+        snapshot = self.assertMatchesRebuild()
+        self.assertEqual((snapshot['views_today'], snapshot['views_7days'], snapshot['views_30days']), (4, 6, 6))
+        self.assertEqual((snapshot['days_7days'], snapshot['days_30days']), (2, 3))
+        self.assertEqual(snapshot['submissions_30days'], 1)
+
+    def test_late_flush_of_an_earlier_day_counts_the_day(self):
+        stats.get_snapshot()
+        with self.committed():
+            analytics.record({(self.today, 0, 'page_views'): 1})
+        # Another worker flushes the last hour of yesterday afterwards
+        with self.committed():
+            analytics.record({(self.today - timedelta(days=1), 23, 'page_views'): 2})
+        snapshot = self.assertMatchesRebuild()
+        self.assertEqual((snapshot['views_7days'], snapshot['days_7days']), (3, 2))
+        self.assertEqual(snapshot['last_active_date'], self.today)
+
+        # A day that is already counted is not counted twice
+        with self.committed():
+            analytics.record({(self.today - timedelta(days=1), 22, 'page_views'): 1})
+        self.assertEqual(self.assertMatchesRebuild()['days_7days'], 2)
+
+    def test_day_rollover_rebuilds_the_snapshot(self):
+        analytics.record({(self.today, 9, 'page_views'): 5})
+        self.assertEqual(stats.get_snapshot().views_today, 5)
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=tomorrow):
+            snapshot = stats.get_snapshot()
+            self.assertEqual(snapshot.analytics_date, tomorrow.date())
+            self.assertEqual((snapshot.views_today, snapshot.views_7days, snapshot.days_7days), (0, 5, 1))
+
+        # A flush still running on the old day leaves the new snapshot alone
+        with self.committed():
+            stats.analytics_recorded({(self.today, 23, 'page_views'): 1}, today=self.today)
+        self.assertEqual(DashboardSnapshot.objects.get().views_7days, 5)
+
+    def test_daily_analytics_edits_rebuild_the_snapshot(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@oysloe.com', 'admin123')
+        self.client.force_login(admin_user)
+        day = Analytics.objects.create(date=self.today - timedelta(days=2), page_views=5)
+        self.assertEqual(stats.get_snapshot().views_7days, 5)
+
+        with self.committed():
+            response = self.client.patch(
+                f'/api/analytics/{day.pk}/', {'page_views': 8}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stats.get_snapshot().views_7days, 8)
+
+        with self.committed():
+            response = self.client.post(f'/admin/sellers/analytics/{day.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(stats.get_snapshot().views_7days, 0)
+
+    def test_period_today_reports_seven_days(self):
+        analytics.record({(self.today - timedelta(days=2), 9, 'page_views'): 5})
+        self.assertEqual(stats.dashboard_stats('today'), stats.dashboard_stats('7days'))
+        self.assertEqual(stats.dashboard_stats('today')['total_views'], 5)
+
+
+class AdminDashboardContextTests(TestCase):
+    """The grouped dashboard query agrees with per-status counts and is invalidated by edits"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_grouped_counts_match_per_status_counts(self):
+        seed_sellers(40)
+        Seller.objects.filter(pk__in=Seller.objects.values('pk')[:3]).update(status='legacy')
+        context = stats.build_admin_dashboard_context()
+
+        self.assertEqual(context['seller_stats'], {
+            'total': Seller.objects.count(),
+            'pending': Seller.objects.filter(status='pending').count(),
+            'approved': Seller.objects.filter(status='approved').count(),
+            'rejected': Seller.objects.filter(status='rejected').count(),
+        })
+        self.assertEqual(
+            {row['business_type']: row['count'] for row in context['business_types']},
+            {
+                business_type: Seller.objects.filter(business_type=business_type).count()
+                for business_type in Seller.objects.values_list('business_type', flat=True).distinct()
+            }
+        )
+
+    def test_seller_save_rebuilds_the_cached_context(self):
+        seller = create_seller()
+        first = stats.admin_dashboard_context()
+        self.assertEqual(first['seller_stats']['pending'], 1)
+        version = cache.get(stats.ADMIN_DASHBOARD_VERSION_KEY)
+
+        with self.assertNumQueries(0):
+            stats.admin_dashboard_context()
+
+        seller.status = 'approved'
+        seller.save()
+        self.assertEqual(cache.get(stats.ADMIN_DASHBOARD_VERSION_KEY), version + 1)
+        context = stats.admin_dashboard_context()
+        self.assertEqual((context['seller_stats']['pending'], context['seller_stats']['approved']), (0, 1))
+
+
+class SellerSearchTests(TestCase):
+    """Ranked search covers every match and stays in sync with the sellers table"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@oysloe.com', 'admin123')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def bulk_golden_marts(self, approved, pending):
+        sellers = seed_sellers(approved + pending)
+        for i, seller in enumerate(sellers):
+            seller.business_name = f'Golden Mart {i}'
+            seller.status = 'approved' if i < approved else 'pending'
+        Seller.objects.bulk_update(sellers, ['business_name', 'status'])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+
+    def search(self, query, queryset=None):
+        return list(get_search_backend().filter(queryset or Seller.objects.all(), query))
+
+    def test_business_name_matches_rank_first(self):
+        by_email = create_seller('Corner Shop')
+        by_email.email_address = 'golden@example.com'
+        by_email.save()
+        by_name = create_seller('Golden Fabrics')
+        by_owner = create_seller('Market Stall')
+        by_owner.owner_name = 'Golden Boateng'
+        by_owner.save()
+        create_seller('Unrelated')
+
+        self.assertEqual(self.search('golden'), [by_name, by_owner, by_email])
+        # The last term matches as a prefix, for search-as-you-type
+        self.assertEqual(self.search('golden fab'), [by_name])
+
+    def test_filters_and_pagination_apply_to_every_match(self):
+        self.bulk_golden_marts(approved=250, pending=5)
+
+        response = self.client.get('/api/sellers/?status=pending&search=Golden')
+        self.assertEqual(response.json()['count'], 5)
+        self.assertEqual({row['status'] for row in response.json()['results']}, {'pending'})
+
+        response = self.client.get('/api/sellers/?search=Golden&page_size=100&page=3')
+        self.assertEqual(response.json()['count'], 255)
+        self.assertEqual(len(response.json()['results']), 55)
+
+        response = self.client.get('/admin/sellers/seller/', {'q': 'Golden', 'status__exact': 'pending'})
+        self.assertEqual(response.context['cl'].result_count, 5)
+        response = self.client.get('/admin/sellers/seller/', {'q': 'Golden'})
+        self.assertEqual(response.context['cl'].result_count, 255)
+
+    def test_index_follows_saves_and_deletes(self):
+        seller = create_seller('Kente Corner')
+        self.assertEqual(self.search('kente'), [seller])
+
+        seller.business_name = 'Adinkra Corner'
+        seller.save()
+        self.assertEqual(self.search('kente'), [])
+        self.assertEqual(self.search('adinkra'), [seller])
+
+        seller.delete()
+        self.assertEqual(self.search('adinkra'), [])
+
+    def test_rebuild_search_index(self):
+        # bulk_create sends no signals, so nothing is indexed yet
+        seed_sellers(12)
+        self.assertEqual(self.search('business'), [])
+
+        out = io.StringIO()
+        call_command('rebuild_search_index', batch_size=5, stdout=out)
+        self.assertIn('Indexed 12 seller(s)', out.getvalue())
+        self.assertEqual(len(self.search('business')), 12)
+
+    def test_ranked_search_is_one_query(self):
+        self.bulk_golden_marts(approved=30, pending=0)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.search('golden')), 30)
+
+    def test_timeout_falls_back_to_capped_unranked_match(self):
+        self.bulk_golden_marts(approved=10, pending=0)
+        backend = get_search_backend()
+        # A match that never finishes, so only the budget can end the served queries
+        endless = RawSQL(
+            '(WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT max(i) > 0 FROM n)',
+            [], output_field=BooleanField(),
+        )
+
+        def ranked(self, queryset, terms):
+            return queryset.filter(endless).annotate(search_rank=Value(0.0))
+
+        with override_settings(SELLER_SEARCH_MAX_RESULTS=4, SELLER_SEARCH_BUDGET_MS=50), \
+                mock.patch.object(type(backend), 'ranked', ranked), \
+                self.assertLogs('sellers.search', 'WARNING'):
+            results = backend.filter(Seller.objects.all(), 'golden')
+            self.assertEqual(results.count(), 4)
+            self.assertEqual(len(results[:10]), 4)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages walk forwards and backwards over tied timestamps without gaps"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@oysloe.com', 'admin123')
+        seed_sellers(7)
+        # Five sellers share one timestamp, so the id decides their order
+        now = timezone.now()
+        sellers = list(Seller.objects.order_by('id'))
+        for i, seller in enumerate(sellers):
+            seller.created_at = now if i < 5 else now - timedelta(minutes=i)
+        Seller.objects.bulk_update(sellers, ['created_at'])
+        cls.expected = list(Seller.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, page):
+        return [row['id'] for row in page['results']]
+
+    def test_next_and_previous_links_over_ties(self):
+        page = self.get('/api/sellers/?paginate=cursor&page_size=2')
+        self.assertNotIn('count', page)
+        self.assertIsNone(page['previous'])
+        pages = [self.ids(page)]
+        while page['next']:
+            page = self.get(page['next'])
+            pages.append(self.ids(page))
+        self.assertEqual([pk for ids in pages for pk in ids], self.expected)
+        self.assertEqual([len(ids) for ids in pages], [2, 2, 2, 1])
+
+        # Back from the last page, one page at a time
+        backwards = []
+        while page['previous']:
+            page = self.get(page['previous'])
+            backwards.append(self.ids(page))
+        self.assertEqual(backwards, pages[-2::-1])
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('garbage', 'eyJwIjpbXX0='):
+            response = self.client.get(f'/api/sellers/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination_is_unchanged_by_default(self):
+        page = self.get('/api/sellers/?page_size=3&page=2')
+        self.assertEqual(list(page), ['count', 'next', 'previous', 'results'])
+        self.assertEqual(page['count'], 7)
+        self.assertIn('page=3', page['next'])
+        self.assertNotIn('cursor', page['next'])
+        # Past the tied timestamps the newest-first order is fixed
+        self.assertEqual(self.ids(self.get(page['next'])), self.expected[6:])
+
+        keyset = self.get('/api/sellers/?paginate=cursor&page_size=3')
+        self.assertEqual(list(keyset), ['next', 'previous', 'results'])
+        self.assertIn('cursor=', keyset['next'])
+
+
+class QueryPlanTests(TestCase):
+    """Every query the hot views and the seller admin run must use an index.
+
+    Each endpoint is requested against a seeded dataset, and every captured
+    query touching a ``sellers_`` table is run through ``EXPLAIN QUERY PLAN``.
+    A plain ``SCAN <table>`` step means SQLite is reading the whole table, as
+    does ``SCAN <table> USING INDEX`` outside a ``LIMIT``ed page.
+    """
+
+    FULL_SCAN = re.compile(r'^SCAN (TABLE )?sellers_\w+$')
+    INDEX_WALK = re.compile(r'^SCAN (TABLE )?(?P<table>sellers_\w+) USING INDEX (?P<index>\w+)')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@oysloe.com', 'admin123')
+        seed_sellers(600, admins=[cls.admin])
+        PricingPlan.objects.create(
+            name='basic', display_name='Basic 3x', description='Basic',
+            monthly_price=567, yearly_price=5440
+        )
+        analytics_buffer.incr('page_views', amount=25)
+        analytics_buffer.incr('page_views', amount=10, when=timezone.now() - timedelta(days=3))
+        analytics_buffer.flush()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        scans = [detail for detail in details if self.FULL_SCAN.match(detail)]
+        if ' LIMIT ' not in sql:
+            # Walking a whole non-covering index reads every row as well,
+            # unless it is a partial index holding only the matching rows
+            for detail in details:
+                walk = self.INDEX_WALK.match(detail)
+                if walk and walk['index'] not in self.partial_indexes(walk['table']):
+                    scans.append(detail)
+        return scans
+
+    def partial_indexes(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA index_list({table})')
+            return {row[1] for row in cursor.fetchall() if row[4]}
+
+    def assertNoFullScans(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, url)
+
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'sellers_' not in sql:
+                continue
+            checked += 1
+            scans = self.full_scans(sql)
+            self.assertEqual(scans, [], f'{url} ran a full scan:\n{sql}')
+        self.assertGreater(checked, 0, f'{url} ran no queries on sellers tables')
+
+    def test_seller_list(self):
+        self.assertNoFullScans('get', '/api/sellers/')
+        self.assertNoFullScans('get', '/api/sellers/?page=5')
+
+    def test_seller_list_filtered_by_status(self):
+        self.assertNoFullScans('get', '/api/sellers/?status=pending')
+
+    def test_seller_search(self):
+        self.assertNoFullScans('get', '/api/sellers/?search=business')
+
+    def test_seller_keyset_pages(self):
+        first = self.client.get('/api/sellers/?paginate=cursor&status=approved').json()
+        self.assertNoFullScans('get', first['next'])
+        self.assertNoFullScans('get', '/api/sellers/?paginate=cursor&count=approx')
+
+    def test_seller_detail(self):
+        seller = Seller.objects.first()
+        self.assertNoFullScans('get', f'/api/sellers/{seller.pk}/')
+
+    def test_analytics_endpoints(self):
+        self.assertNoFullScans('get', '/api/analytics/get_stats/?period=30days')
+        self.assertNoFullScans('get', '/api/analytics/get_stats/?period=today')
+        self.assertNoFullScans('get', '/api/analytics/?paginate=cursor')
+
+    def test_dashboards(self):
+        self.assertNoFullScans('get', '/api/dashboard/stats/')
+        self.assertNoFullScans('get', '/api/admin-dashboard/')
+
+    def test_pricing(self):
+        # The cache miss is the path that reaches the database
+        pricing.invalidate()
+        self.assertNoFullScans('get', '/api/pricing/')
+
+    def test_admin_changelist(self):
+        base = '/admin/sellers/seller/'
+        self.assertNoFullScans('get', base)
+        self.assertNoFullScans('get', f'{base}?status__exact=pending')
+        self.assertNoFullScans('get', f'{base}?business_type__exact=retailer')
+        self.assertNoFullScans('get', f'{base}?experience_level__exact=expert')
+        self.assertNoFullScans('get', f'{base}?assigned_admins__id__exact={self.admin.pk}')
+        self.assertNoFullScans('get', f'{base}?q=business')
+
+
+class QueryCountTests(TestCase):
+    """The seller changelist and API run a fixed number of queries per page.
+
+    Each endpoint is checked on a small and a full page so a per-row query
+    shows up as a count mismatch rather than as a slow admin.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@oysloe.com', 'admin123')
+        cls.reviewer = User.objects.create_user('reviewer', 'reviewer@oysloe.com', 'reviewer123', first_name='Ama')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def seed(self, count):
+        Seller.objects.all().delete()
+        seed_sellers(count, admins=[self.admin, self.reviewer])
+        Seller.objects.update(reviewed_by=self.reviewer, reviewed_at=timezone.now())
+
+    def assertQueriesPerPage(self, num, url):
+        for count in (3, 120):
+            self.seed(count)
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_admin_changelist(self):
+        # session, user, assigned_admins filter choices, 2 counts, page,
+        # prefetched admins and 2 permission lookups from the jazzmin menu
+        self.assertQueriesPerPage(9, '/admin/sellers/seller/')
+
+    def test_seller_list_api(self):
+        # session, user, count, page with reviewers joined
+        self.assertQueriesPerPage(4, '/api/sellers/?page_size=100')
+
+    def test_seller_list_api_keyset(self):
+        self.assertQueriesPerPage(3, '/api/sellers/?paginate=cursor&page_size=100')
+
+    def test_seller_detail_api(self):
+        self.seed(3)
+        seller = Seller.objects.first()
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/sellers/{seller.pk}/')
+        self.assertEqual(response.json()['reviewed_by']['username'], 'reviewer')
+
+
+class PricingApiTests(TestCase):
+    """The pricing API is served from the cache and revalidated by ETag"""
+
+    def setUp(self):
+        self.plan = PricingPlan.objects.create(
+            name='basic', display_name='Basic 3x', description='Basic',
+            monthly_price=567, yearly_price=5440
+        )
+        pricing.invalidate()
+
+    def test_cached_and_revalidated(self):
+        first = self.client.get('/api/pricing/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['plans'][0]['monthly_price'], 567.0)
+
+        # The version of the plans comes from the cache as well
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/pricing/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+    def test_revalidated_by_last_modified_alone(self):
+        first = self.client.get('/api/pricing/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/pricing/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # Deleting a plan leaves no newer updated_at, but still moves Last-Modified on
+        later = pricing.time.time() + 60
+        with mock.patch.object(pricing.time, 'time', return_value=later), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.plan.delete()
+        response = self.client.get('/api/pricing/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['plans'], [])
+
+    def test_plan_change_invalidates(self):
+        first = self.client.get('/api/pricing/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.monthly_price = 600
+            self.plan.save()
+
+        response = self.client.get('/api/pricing/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.json()['plans'][0]['monthly_price'], 600.0)
+
+    def test_change_from_setup_pricing_is_seen(self):
+        first = self.client.get('/api/pricing/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('setup_pricing', stdout=io.StringIO())
+        response = self.client.get('/api/pricing/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([plan['name'] for plan in response.json()['plans']], ['basic', 'business', 'platinum'])
+
+    def test_cache_shared_between_processes(self):
+        # Another worker sees this one's cached payload and version keys
+        first = self.client.get('/api/pricing/')
+        cached = cache.get_many([pricing.PRICING_VERSION_KEY, pricing.PRICING_CACHE_KEY])
+        self.assertEqual(cached[pricing.PRICING_CACHE_KEY]['version'], cached[pricing.PRICING_VERSION_KEY])
+        self.assertEqual(cached[pricing.PRICING_CACHE_KEY]['etag'], first['ETag'])
+
+
+class SubmissionQueueTests(TestCase):
+    """Queued applications are inserted once, even when a batch is replayed"""
+
+    application = {
+        'business_name': 'Queued Shop', 'business_type': 'retailer',
+        'business_description': 'Queued', 'owner_name': 'Kofi', 'email_address': 'kofi@example.com',
+        'phone_number': '0552891234', 'location': 'Kumasi', 'experience_level': 'beginner',
+        'inventory_size': 'small',
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            SELLER_SUBMISSION_MODE='queue',
+            SELLER_SUBMISSION_QUEUE_PATH=str(Path(directory.name) / 'submissions.sqlite3'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.queue = submissions.get_queue()
+
+    def submit(self, **changes):
+        response = self.client.post(
+            '/api/submit-seller/', {**self.application, **changes}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        return response.json()['tracking_id']
+
+    def test_submit_queues_and_worker_inserts(self):
+        stats.get_snapshot()
+        tracking_ids = [self.submit(business_name=f'Shop {i}') for i in range(3)]
+        self.assertEqual(Seller.objects.count(), 0)
+        self.assertEqual(self.queue.metrics()['depth'], 3)
+        status = self.client.get(f'/api/submit-seller/{tracking_ids[0]}/').json()
+        self.assertEqual(status['status'], 'queued')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            totals = submissions.drain(self.queue)
+        self.assertEqual((totals['processed'], totals['created'], totals['batches']), (3, 3, 1))
+        self.assertEqual(self.queue.metrics()['depth'], 0)
+        self.assertEqual(Seller.objects.count(), 3)
+        self.assertEqual(stats.get_snapshot().pending_sellers, 3)
+        self.assertEqual(analytics.period_totals(timezone.now().date())['total_submissions'], 3)
+
+        status = self.client.get(f'/api/submit-seller/{tracking_ids[0]}/').json()
+        self.assertEqual(status['status'], 'processed')
+
+    def test_invalid_application_is_rejected_before_queueing(self):
+        response = self.client.post(
+            '/api/submit-seller/', {**self.application, 'email_address': 'nope'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.queue.metrics()['depth'], 0)
+
+    def test_expired_claim_is_replayed_without_duplicates(self):
+        self.submit()
+        # A worker inserts the batch and dies before acknowledging it
+        submissions.process_batch(self.queue.claim(10))
+        self.assertEqual(self.queue.claim(10), [])
+
+        with override_settings(SELLER_SUBMISSION_LEASE=-1):
+            totals = submissions.drain(self.queue)
+        self.assertEqual((totals['processed'], totals['created']), (1, 0))
+        self.assertEqual(Seller.objects.count(), 1)
+        self.assertEqual(analytics.period_totals(timezone.now().date())['total_submissions'], 1)
+
+    def test_depth_is_kept_without_counting_the_journal(self):
+        for i in range(3):
+            self.submit(business_name=f'Shop {i}')
+        self.assertEqual(self.queue.depth(), 3)
+        self.queue.ack([entry['tracking_id'] for entry in self.queue.claim(2)])
+        self.assertEqual(self.queue.depth(), 1)
+
+        # A journal written before the depth was kept starts from its count
+        with self.queue.connect() as journal:
+            journal.executescript(
+                'DROP TRIGGER submissions_enqueued; DROP TRIGGER submissions_removed; DROP TABLE queue_depth;'
+            )
+        self.assertEqual(submissions.SubmissionQueue(self.queue.path).depth(), 1)
+
+    def test_full_queue_falls_back_to_synchronous_insert(self):
+        with override_settings(SELLER_SUBMISSION_QUEUE_MAX_DEPTH=0):
+            response = self.client.post(
+                '/api/submit-seller/', self.application, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Seller.objects.count(), 1)
+        analytics_buffer.flush()
+
+
+@skipUnless(connection.vendor == 'sqlite' and settings.SQLITE_PROFILE == 'tuned', 'tuned SQLite profile only')
+class SQLiteProfileTests(TestCase):
+    """Every new connection of the tuned profile runs the PRAGMAs of SQLITE_PRAGMAS"""
+
+    def test_new_connection_is_tuned(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # The test database lives in memory, where WAL does not apply
+        settings_dict = {**connection.settings_dict, 'NAME': str(Path(directory.name) / 'tuned.sqlite3')}
+        wrapper = type(connections['default'])(settings_dict, alias='tuned')
+        self.addCleanup(wrapper.close)
+
+        with wrapper.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store', 'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal',
+            'synchronous': 1,
+            'busy_timeout': settings.SQLITE_BUSY_TIMEOUT * 1000,
+            'temp_store': 2,
+            'cache_size': -64000,
+        })
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+
+
+class ReplicaPinningTests(TestCase):
+    """Only clients that come back as themselves are pinned to the primary after a write"""
+
+    factory = RequestFactory()
+
+    def pin(self, request, wrote):
+        middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+        return middleware.pin(request, HttpResponse(), wrote)
+
+    def test_anonymous_write_gets_no_cookie(self):
+        request = self.factory.post('/api/submit-seller/')
+        request.user = AnonymousUser()
+        self.assertNotIn('db_primary_until', self.pin(request, wrote=True).cookies)
+
+    def test_authenticated_write_is_pinned(self):
+        request = self.factory.post('/api/sellers/')
+        request.user = User.objects.create_user('staff')
+        self.assertIn('db_primary_until', self.pin(request, wrote=True).cookies)
+        # A mutating request that wrote nothing leaves the client on the replica
+        self.assertNotIn('db_primary_until', self.pin(request, wrote=False).cookies)
+
+
+@skipUnless('replica' in settings.DATABASES, 'DATABASE_REPLICA_NAME is not set')
+class ReplicaRoutingTests(TestCase):
+    """Reads of safe requests go to the replica, with stickiness and lag fallback.
+
+    ``default`` and ``replica`` are two separate test databases, so nothing
+    replicates on its own: ``replicate()`` copies the primary rows across.
+    """
+
+    # Skipped classes still have their databases checked, so only ask for a configured replica
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def setUp(self):
+        middleware = list(settings.MIDDLEWARE)
+        middleware.insert(
+            middleware.index('django.contrib.sessions.middleware.SessionMiddleware'),
+            'sellers.middleware.ReplicaRoutingMiddleware'
+        )
+        settings_override = override_settings(
+            DATABASE_ROUTERS=['sellers.routers.ReplicaRouter'],
+            MIDDLEWARE=middleware,
+            REPLICA_LAG_CHECK_INTERVAL=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        routers.lag_monitor.reset()
+        self.addCleanup(routers.lag_monitor.reset)
+
+        self.admin = User.objects.create_superuser('admin', 'admin@oysloe.com', 'admin123')
+        self.client.force_login(self.admin)
+        self.seller = seed_sellers(1)[0]
+        self.replicate(lag=0)
+
+    def replicate(self, lag):
+        """Copy the primary rows to the replica, leaving its heartbeat ``lag`` seconds behind"""
+        for model in (User, Session, Seller):
+            for obj in model.objects.using(routers.PRIMARY):
+                obj.save_base(raw=True, using=routers.REPLICA)
+        ReplicationHeartbeat.objects.using(routers.REPLICA).update_or_create(
+            pk=1, defaults={'beat_at': timezone.now() - timedelta(seconds=lag)}
+        )
+
+    def seller_count(self):
+        return self.client.get('/api/sellers/').json()['count']
+
+    def test_safe_requests_read_from_replica(self):
+        seed_sellers(2)
+        self.assertEqual(self.seller_count(), 1)
+        self.replicate(lag=0)
+        self.assertEqual(self.seller_count(), 3)
+
+    def test_mutation_pins_client_to_primary(self):
+        response = self.client.patch(
+            f'/api/sellers/{self.seller.pk}/update_status/', {'status': 'approved'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db_primary_until', response.cookies)
+
+        # The replica still has the seller as pending, but this client reads its own write
+        detail = self.client.get(f'/api/sellers/{self.seller.pk}/').json()
+        self.assertEqual(detail['status'], 'approved')
+
+        self.client.cookies.pop('db_primary_until')
+        detail = self.client.get(f'/api/sellers/{self.seller.pk}/').json()
+        self.assertEqual(detail['status'], 'pending')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.replicate(lag=60)
+        seed_sellers(2)
+        self.assertEqual(self.seller_count(), 3)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(Seller), routers.PRIMARY)
+        token = routers.activate(use_replica=True)
+        try:
+            self.assertEqual(router.db_for_read(Seller), routers.REPLICA)
+            with routers.use_primary():
+                self.assertEqual(router.db_for_read(Seller), routers.PRIMARY)
+        finally:
+            routers.deactivate(token)
+
+    def test_cached_pricing_is_built_from_primary(self):
+        pricing.invalidate()
+        PricingPlan.objects.create(
+            name='basic', display_name='Basic 3x', description='Basic',
+            monthly_price=567, yearly_price=5440
+        )
+        plans = self.client.get('/api/pricing/').json()['plans']
+        self.assertEqual([plan['name'] for plan in plans], ['basic'])
+        pricing.invalidate()
+
+
+class AsyncPublicViewTests(TestCase):
+    """The async twins of the public endpoints served under ASGI"""
+
+    factory = AsyncRequestFactory()
+
+    async def test_track_pageview(self):
+        before = analytics_buffer.pending('page_views')
+        response = await public_views.atrack_pageview(self.factory.post('/api/track-pageview/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(analytics_buffer.pending('page_views'), before + 1)
+        await sync_to_async(analytics_buffer.flush)()
+
+    async def test_pricing(self):
+        await sync_to_async(pricing.invalidate)()
+        await PricingPlan.objects.acreate(
+            name='basic', display_name='Basic 3x', description='Basic',
+            monthly_price=567, yearly_price=5440
+        )
+        response = await public_views.apricing_api(self.factory.get('/api/pricing/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'"basic"', response.content)
+
+        response = await public_views.apricing_api(
+            self.factory.get('/api/pricing/', headers={'if-none-match': response['ETag']})
+        )
+        self.assertEqual(response.status_code, 304)
+        await sync_to_async(pricing.invalidate)()
+
+    async def test_submit_seller(self):
+        request = self.factory.post(
+            '/api/submit-seller/', SubmissionQueueTests.application, content_type='application/json'
+        )
+        response = await public_views.asubmit_seller_form(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(await Seller.objects.filter(business_name='Queued Shop').aexists())
+        await sync_to_async(analytics_buffer.flush)()
+
+
+class LeanMiddlewareTests(TestCase):
+    """The public endpoints skip the session, CSRF, auth and clickjacking middleware"""
+
+    def setUp(self):
+        # Like the test client, keep the handler from closing the test transaction's connection
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        self.application = get_wsgi_application()
+
+    def request(self, method, path):
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured.update(status=int(status[:3]), headers=dict(headers))
+
+        response = self.application(wsgi_environ(method, path), start_response)
+        b''.join(response)
+        response.close()
+        return captured['status'], captured['headers']
+
+    def test_public_endpoints_use_lean_middleware(self):
+        pricing.invalidate()
+        status, headers = self.request('GET', '/api/pricing/')
+        self.assertEqual(status, 200)
+        self.assertNotIn('X-Frame-Options', headers)
+        self.assertIn('Content-Length', headers)
+
+        status, headers = self.request('POST', '/api/track-pageview/')
+        self.assertEqual(status, 200)
+        self.assertNotIn('X-Frame-Options', headers)
+        analytics_buffer.flush()
+
+    def test_other_paths_use_full_middleware(self):
+        status, headers = self.request('GET', '/help.html')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['X-Frame-Options'], 'DENY')
+
+
+class PageCacheTests(TestCase):
+    """Landing pages are served prerendered, compressed and revalidated by ETag"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(PAGE_CACHE_ENABLED=True, PAGE_CACHE_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        pages.invalidate()
+        self.addCleanup(pages.invalidate)
+
+    def test_page_is_rendered_once(self):
+        first = self.client.get('/terms.html')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'public, max-age=300')
+        rendered = pages.get_page('terms.html')
+        second = self.client.get('/terms.html')
+        self.assertIs(pages.get_page('terms.html'), rendered)
+        self.assertEqual(second.content, first.content)
+
+        response = self.client.get('/terms.html', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_compressed_variants(self):
+        identity = self.client.get('/privacy.html')
+        response = self.client.get('/privacy.html', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+        self.assertNotEqual(response['ETag'], identity['ETag'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.client.get('/privacy.html', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_warmed_pages_are_loaded_from_disk(self):
+        page = pages.render('index.html')
+        pages.save('index.html', page)
+        self.assertEqual(pages.load('index.html')['hash'], page['hash'])
+
+        with open(pages.cache_dir() / 'index.html.json', 'r+') as meta:
+            data = json.load(meta)
+            data['source'] = 'an older template'
+            meta.seek(0)
+            meta.truncate()
+            json.dump(data, meta)
+        self.assertIsNone(pages.load('index.html'))
+
+    def test_help_page_sets_csrf_cookie(self):
+        response = self.client.get('/help.html')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertIn('private', response['Cache-Control'])
+
+
+@skipUnless(images.Image is not None, 'Pillow is not installed')
+class StaticImageVariantTests(TestCase):
+    """collectstatic writes hashed, resized variants and {% srcset %} uses them"""
+
+    def setUp(self):
+        from PIL import Image
+
+        source = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        Image.effect_noise((1200, 800), 64).convert('RGB').save(Path(source.name) / 'hero.jpg', quality=95)
+        override = override_settings(
+            STATICFILES_DIRS=[source.name], STATIC_ROOT=root.name,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATIC_IMAGE_WIDTHS=[480], STATIC_IMAGE_FORMATS=['webp'], STATIC_IMAGE_MIN_SIZE=0,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(setattr, images, '_manifest', None)
+        self.root = Path(root.name)
+
+    def test_collectstatic_generates_variants(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        entry = images.load_manifest(self.root)['hero.jpg']
+        self.assertEqual((entry['width'], entry['height']), (1200, 800))
+        self.assertEqual(entry['variants']['jpeg'], {'480': 'hero-480w.jpg', '1200': 'hero.jpg'})
+        self.assertEqual(set(entry['variants']['webp']), {'480'})
+
+        from PIL import Image
+        with Image.open(self.root / 'hero-480w.webp') as variant:
+            self.assertEqual(variant.size, (480, 320))
+
+        images._manifest = None
+        html = Template("{% load responsive_images %}{% srcset 'hero.jpg' alt='Hero' %}").render(Context())
+        self.assertIn('<source type="image/webp"', html)
+        self.assertRegex(html, r'/static/hero-480w\.[0-9a-f]{12}\.webp 480w')
+        self.assertIn('width="1200"', html)
+        self.assertIn('height="800"', html)
+
+    def test_small_images_are_left_alone(self):
+        with override_settings(STATIC_IMAGE_MIN_SIZE=10 * 1024 * 1024):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        self.assertEqual(images.load_manifest(self.root), {})
+        self.assertFalse((self.root / 'hero-480w.webp').exists())
+
+        images._manifest = None
+        html = Template("{% load responsive_images %}{% srcset 'hero.jpg' alt='Hero' loading='lazy' %}").render(Context())
+        self.assertRegex(html, r'^<img src="/static/hero\.[0-9a-f]{12}\.jpg" alt="Hero" loading="lazy">$')
+
+
+class IncrementalStaticBuildTests(TestCase):
+    """collectstatic recompresses only changed files and prunes orphans"""
+
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        self.source, self.root = Path(source.name), Path(root.name)
+        (self.source / 'site.css').write_text('body { color: green; }\n' * 200)
+        (self.source / 'site.js').write_text('console.log("hello");\n' * 200)
+        override = override_settings(
+            STATICFILES_DIRS=[source.name], STATIC_ROOT=root.name,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATICFILES_COMPRESS_WORKERS=1, STATICFILES_PRUNE_GRACE=0,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def collect(self):
+        compressed = []
+        original = storage_module._compress
+
+        def record(path, extensions):
+            compressed.append(Path(path).relative_to(self.root).as_posix())
+            return original(path, extensions)
+
+        with mock.patch.object(storage_module, '_compress', record):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        return compressed
+
+    def change(self, name, content):
+        path = self.source / name
+        path.write_text(content)
+        # collectstatic copies a file only if it is newer by at least a second
+        modified = path.stat().st_mtime + 10
+        os.utime(path, (modified, modified))
+
+    def test_only_changed_files_are_recompressed(self):
+        self.assertEqual(len(self.collect()), 4)  # site.css, site.js and their hashed names
+        self.assertTrue(any(path.name.endswith('.css.br') or path.name.endswith('.css.gz') for path in self.root.iterdir()))
+        self.assertEqual(self.collect(), [])
+
+        self.change('site.css', 'body { color: red; }\n' * 200)
+        changed = self.collect()
+        self.assertEqual(len(changed), 2)
+        self.assertTrue(all(name.startswith('site.') and name.endswith('.css') for name in changed))
+
+    def test_orphans_are_pruned(self):
+        self.collect()
+        old = {path.name for path in self.root.iterdir() if path.name.startswith('site.') and '.css' in path.name}
+        self.change('site.css', 'body { color: red; }\n' * 200)
+        self.collect()
+        current = {path.name for path in self.root.iterdir()}
+        self.assertIn('site.css', current)
+        # The previous hashed name and its compressed copies are gone
+        stale = {name for name in old if name not in ('site.css', 'site.css.gz', 'site.css.br')}
+        self.assertTrue(stale)
+        self.assertFalse(stale & current)
+
+        with override_settings(STATICFILES_PRUNE_GRACE=3600):
+            (self.source / 'site.js').unlink()
+            self.collect()
+        self.assertIn('site.js', {path.name for path in self.root.iterdir()})
+
+
+class AssetPipelineTests(TestCase):
+    """collectstatic inlines the critical CSS of the landing page and bundles its scripts"""
+
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        self.source, self.root = Path(source.name), Path(root.name)
+        (self.source / 'styles.css').write_text(
+            '.hero { color: red; }\n.pricing-card { color: blue; }\n'
+            '@media (max-width: 768px) { .hero { color: green; } .footer { color: gray; } }\n'
+        )
+        (self.source / 'landing.js').write_text('// Landing page\nfunction first() {\n    return 1;\n}\n')
+        (self.source / 'script.js').write_text('function second() {\n    return 2;\n}\n')
+        (self.source / 'your_icon.png.png').write_bytes(b'icon')
+        override = override_settings(
+            STATICFILES_DIRS=[source.name], STATIC_ROOT=root.name,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(setattr, assets, '_manifest', None)
+
+    def test_critical_css_keeps_what_applies_above_the_fold(self):
+        css = """
+            /* Layout */
+            body { margin: 0; }
+            .hero, .footer { display: flex; }
+            .hero:hover { color: red; }
+            .hero-cover { background: url('img/hero.png'); animation: float 6s infinite; }
+            .card .title { font-weight: bold; }
+            @media (max-width: 768px) { .hero { height: 30vh; } .card { padding: 0; } }
+            @keyframes float { from { top: 0; } to { top: 10px; } }
+            @keyframes spin { to { transform: rotate(1turn); } }
+        """
+        markup = '<body><section class="hero {% if big %}big{% endif %}"><div class="hero-cover"></div></section>'
+        self.assertEqual(
+            assets.critical_css(css, markup, '/static/css/site.css'),
+            'body{margin:0}.hero{display:flex}'
+            '.hero-cover{background:url("/static/css/img/hero.png");animation:float 6s infinite}'
+            '@media (max-width: 768px){.hero{height:30vh}}'
+            '@keyframes float{from{top:0}to{top:10px}}'
+        )
+
+    @skipUnless(assets.rjsmin is not None, 'rjsmin is not installed')
+    def test_bundles_are_minified(self):
+        self.assertEqual(assets.bundle(['// one\nvar a = 1', 'var b = 2;\n']), 'var a=1;var b=2;;')
+
+    def test_collectstatic_builds_the_landing_page_assets(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        bundle = (self.root / 'bundles' / 'landing.js').read_text()
+        self.assertLess(bundle.index('first'), bundle.index('second'))
+
+        html = pages.render_to_string('index.html')
+        self.assertIn('<style>.hero{color:red}@media (max-width: 768px){.hero{color:green}}</style>', html)
+        self.assertRegex(html, r'<link rel="stylesheet" href="/static/styles\.[0-9a-f]{12}\.css" media="print"')
+        self.assertRegex(html, r'<script src="/static/bundles/landing\.[0-9a-f]{12}\.js" defer></script>')
+        self.assertNotIn('script.js', html)
+
+        report = json.loads((self.root / assets.REPORT).read_text())['pages']
+        self.assertIn('index.html', report)
+        self.assertEqual(report['index.html']['blocking'], [])
+        self.assertEqual(len(report['index.html']['deferred']), 2)
+        self.assertGreater(report['index.html']['first_render_ms'], 0)
+
+    def test_unbuilt_assets_are_loaded_as_they_are(self):
+        shutil.copytree(self.source, self.root, dirs_exist_ok=True)
+        assets._manifest = {}
+        html = pages.render_to_string('index.html')
+        self.assertRegex(html, r'<link rel="stylesheet" href="/static/styles\.[0-9a-f]{12}\.css">')
+        self.assertRegex(
+            html, r'<script src="/static/landing\.[0-9a-f]{12}\.js" defer></script>'
+                  r'<script src="/static/script\.[0-9a-f]{12}\.js" defer></script>'
+        )
+
+
+class BenchmarkComparisonTests(TestCase):
+    """benchmark_api results are checked against an earlier run"""
+
+    def result(self, p95_ms=10.0, throughput=100.0, queries=2.0, errors=0, peak_mb=100.0):
+        endpoint = {
+            'p50_ms': 5.0, 'p95_ms': p95_ms, 'p99_ms': 20.0, 'throughput': throughput,
+            'errors': errors, 'queries_per_request': queries,
+        }
+        return {'results': {'wsgi': {'endpoints': {'pricing': endpoint}, 'rss': {'peak_mb': peak_mb}}}}
+
+    def test_drift_within_tolerance_passes(self):
+        self.assertEqual(compare(self.result(), self.result(p95_ms=10.5, throughput=95.0, peak_mb=105.0)), [])
+
+    def test_regressions_are_reported(self):
+        regressions = compare(self.result(), self.result(p95_ms=12.0, throughput=80.0, queries=3.0, errors=1, peak_mb=150.0))
+        self.assertEqual(len(regressions), 5)
+        self.assertIn('wsgi pricing: queries per request 2.0 -> 3.0', regressions)
+
+    @skipUnless(Path('/proc/self/status').exists(), 'needs /proc')
+    def test_process_memory_is_read_from_proc(self):
+        self.assertGreater(process_tree_rss(os.getpid()), 10 * 2 ** 20)
+
+
+class SeedScaleTests(TestCase):
+    """seed_scale writes the same synthetic data for the same seed"""
+
+    def test_chunks_are_deterministic(self):
+        start, end = seeding.history_window(1, timezone.localdate())
+        first, first_assignments = seeding.generate_chunk(3, 101, 50, 7, [1, 2, 3], start, end)
+        second, second_assignments = seeding.generate_chunk(3, 101, 50, 7, [1, 2, 3], start, end)
+        self.assertEqual(
+            [(s.pk, s.business_name, s.status, s.created_at, s.reviewed_by_id) for s in first],
+            [(s.pk, s.business_name, s.status, s.created_at, s.reviewed_by_id) for s in second],
+        )
+        self.assertEqual(
+            [(a.seller_id, a.user_id) for a in first_assignments],
+            [(a.seller_id, a.user_id) for a in second_assignments],
+        )
+        self.assertTrue(all(start <= s.created_at <= end for s in first))
+
+    def test_command_seeds_sellers_and_analytics(self):
+        with mock.patch.object(seeding, 'CHUNK_SIZE', 40):
+            call_command(
+                'seed_scale', sellers=100, days=30, admins=3, workers=1, until=timezone.localdate(), stdout=io.StringIO()
+            )
+
+        self.assertEqual(Seller.objects.count(), 100)
+        self.assertEqual(len({seller.created_at for seller in Seller.objects.all()}), 100)
+        self.assertFalse(Seller.objects.filter(status='pending', reviewed_by__isnull=False).exists())
+        self.assertEqual(Analytics.objects.count(), 30)
+        self.assertEqual(HourlyAnalytics.objects.count(), 30 * 24)
+        day = Analytics.objects.order_by('date').last()
+        hours = HourlyAnalytics.objects.filter(date=day.date)
+        self.assertEqual(sum(hour.page_views for hour in hours), day.page_views)
+        self.assertEqual(sum(hour.form_submissions for hour in hours), day.form_submissions)
+        self.assertEqual(stats.get_snapshot().total_sellers, 100)
+
+        # New sellers take the following ids and existing analytics days are skipped
+        call_command('seed_scale', sellers=10, days=30, admins=3, workers=1, stdout=io.StringIO())
+        self.assertEqual(Seller.objects.count(), 110)
+        self.assertEqual(Analytics.objects.count(), 30)
+        self.assertEqual(Seller.objects.create(
+            business_name='Next', business_type='individual', business_description='x', owner_name='x',
+            email_address='next@example.com', phone_number='0240000000', location='Accra',
+            experience_level='beginner', inventory_size='small',
+        ).pk, 111)
+
+
+class InstrumentationTests(TestCase):
+    """Sampled requests report their time, queries and size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@oysloe.com', 'admin123')
+        seed_sellers(15)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_sampled_request_is_logged_with_server_timing(self):
+        with self.assertLogs('sellers.instrumentation', 'INFO') as logs:
+            response = self.client.get('/api/sellers/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries, \d+ duplicate", serializer;dur=[\d.]+$'
+        )
+
+        fields = json.loads(logs.records[0].getMessage())
+        self.assertEqual(fields['view'], 'sellers:seller-list')
+        self.assertEqual(fields['status'], 200)
+        self.assertEqual(fields['response_bytes'], len(response.content))
+        self.assertGreater(fields['queries'], 0)
+        self.assertGreater(fields['serializer_ms'], 0)
+        self.assertLessEqual(fields['db_ms'] + fields['serializer_ms'], fields['wall_ms'])
+
+    def test_unsampled_requests_are_left_alone(self):
+        with override_settings(INSTRUMENTATION_SAMPLE_RATE=0):
+            self.assertNotIn('Server-Timing', self.client.get('/api/sellers/'))
+
+    def test_repeated_queries_are_counted(self):
+        instrumentation.install()
+        pks = list(Seller.objects.values_list('pk', flat=True)[:2])
+        token = instrumentation.start()
+        try:
+            for pk in (pks[0], pks[0], pks[1]):
+                Seller.objects.get(pk=pk)
+        finally:
+            recording = instrumentation.stop(token)
+
+        self.assertEqual(recording.queries, 3)
+        self.assertEqual(recording.duplicate_queries, 1)
+        self.assertEqual(recording.similar_queries, 2)
+        self.assertEqual(recording.repeated()[0]['count'], 3)
+        self.assertIsNone(instrumentation.current())
+
+
+class MetricsTests(TestCase):
+    """/internal/metrics sums the metrics every process records into METRICS_DIR"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(self.settings(METRICS_DIR=directory.name, METRICS_TOKEN=''))
+        pricing.invalidate()
+
+    def scrape(self, **extra):
+        response = self.client.get('/internal/metrics', **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_requests_and_caches_are_counted(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/pricing/').status_code, 200)
+
+        text = self.scrape()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_requests_total{url_name="pricing-api",method="GET",status="200"} 3.0', text)
+        self.assertIn('http_request_duration_seconds_bucket{url_name="pricing-api",le="+Inf"} 3.0', text)
+        self.assertIn('http_request_duration_seconds_count{url_name="pricing-api"} 3.0', text)
+        self.assertRegex(text, r'db_queries_per_request_count\{url_name="pricing-api"\} 3\.0')
+        self.assertIn('cache_requests_total{cache="pricing",result="hit"} 2.0', text)
+        self.assertIn('cache_requests_total{cache="pricing",result="miss"} 1.0', text)
+        self.assertIn('cache_hit_ratio{cache="pricing"} 0.6666666666666666', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.002, 0.03, 0.03, 20):
+            metrics.http_request_duration.observe(value, ('x',))
+        samples = {
+            labels['le']: value
+            for name, labels, value in metrics.http_request_duration.samples(metrics.collect(self.directory)[
+                metrics.http_request_duration.name
+            ])
+            if name.endswith('_bucket')
+        }
+        self.assertEqual((samples['0.005'], samples['0.025'], samples['0.05'], samples['10']), (1, 1, 3, 3))
+        self.assertEqual(samples['+Inf'], 4)
+
+    @skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_exited_processes_are_kept_in_the_archive(self):
+        metrics.http_requests.inc(('pricing-api', 'GET', '200'))
+        pid = os.fork()
+        if pid == 0:
+            try:
+                values = metrics.ValueFile(self.directory / f'{os.getpid()}-0.db')
+                values.add(metrics.http_requests.key(('pricing-api', 'GET', '200')), 2)
+                # Past the initial size, so the file has to grow
+                for i in range(2000):
+                    values.add(metrics.http_requests.key((f'view-{i}', 'GET', '200')), 1)
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        for _ in range(2):
+            text = self.scrape()
+            self.assertIn('http_requests_total{url_name="pricing-api",method="GET",status="200"} 3.0', text)
+            self.assertIn('http_requests_total{url_name="view-1999",method="GET",status="200"} 1.0', text)
+        self.assertFalse((self.directory / f'{pid}-0.db').exists())
+        self.assertTrue((self.directory / metrics.ARCHIVE).exists())
+
+    def test_asgi_requests_reuse_the_process_files(self):
+        application = ASGIHandler()
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/help.html', 'query_string': b'', 'headers': [],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+        }
+        statuses = []
+
+        async def serve():
+            for _ in range(20):
+                communicator = ApplicationCommunicator(application, scope)
+                await communicator.send_input({'type': 'http.request'})
+                statuses.append((await communicator.receive_output(5))['status'])
+                await communicator.receive_output(5)
+                await communicator.wait(5)
+
+        # Like an ASGI server: an event loop with no sync thread above it, so
+        # the handler runs each request's sync code in a thread of its own
+        server = threading.Thread(target=asyncio.run, args=(serve(),))
+        server.start()
+        server.join()
+
+        self.assertEqual(statuses, [200] * 20)
+        self.assertEqual(len(list(self.directory.glob('*-*.db'))), 1)
+        self.assertIn('http_requests_total{url_name="help",method="GET",status="200"} 20.0', self.scrape())
+
+    def test_scrapes_are_restricted(self):
+        self.assertEqual(self.client.get('/internal/metrics', REMOTE_ADDR='203.0.113.9').status_code, 404)
+        self.assertEqual(self.client.get('/internal/metrics', HTTP_X_FORWARDED_FOR='203.0.113.9').status_code, 404)
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/internal/metrics').status_code, 404)
+            self.scrape(REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer secret')
+        with self.settings(METRICS_DIR=None):
+            self.assertEqual(self.client.get('/internal/metrics').status_code, 404)
+
+
+class SlowQueryLogTests(TestCase):
+    """Queries over the threshold are logged with their call site and plan, and ranked in the admin"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = Path(directory.name) / 'slow_queries.log'
+        self.enterContext(self.settings(SLOW_QUERY_LOG=str(self.log)))
+
+    def entry(self, sql, duration_ms, time='2026-01-01T00:00:00+00:00'):
+        return json.dumps({
+            'time': time, 'alias': 'default', 'duration_ms': duration_ms, 'sql': sql, 'params': [1],
+            'rows': None, 'stack': ['sellers/views.py:50 in get_queryset'], 'plan': 'SCAN sellers_seller',
+        })
+
+    def test_off_by_default(self):
+        self.assertEqual(slow_queries.threshold(), 0)
+        self.assertFalse(Path(settings.SLOW_QUERY_LOG).is_relative_to(settings.BASE_DIR))
+
+    def test_parameters_are_left_out_unless_enabled(self):
+        slow_queries.install()
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=1e-6), self.assertLogs('sellers.slow_queries', 'WARNING') as logs:
+            list(Seller.objects.filter(email_address='ama@example.com'))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertIsNone(entry['params'])
+        self.assertIsNone(entry['plan'])
+        self.assertNotIn('ama@example.com', logs.records[0].getMessage())
+
+    def test_slow_queries_are_logged(self):
+        slow_queries.install()
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=1e-6, SLOW_QUERY_EXPLAIN=True, SLOW_QUERY_LOG_PARAMS=True), \
+                self.assertLogs('sellers.slow_queries', 'WARNING') as logs:
+            list(Seller.objects.filter(status='approved'))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertIn('FROM "sellers_seller"', entry['sql'])
+        self.assertEqual(entry['params'], ['approved'])
+        self.assertTrue(entry['stack'][-1].startswith('sellers/tests.py:'))
+        self.assertIn('sellers_seller', entry['plan'])
+        # The EXPLAIN is not logged in turn
+        self.assertEqual(len(logs.records), 1)
+
+    def test_fast_queries_are_not_logged(self):
+        slow_queries.install()
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=60000), self.assertNoLogs('sellers.slow_queries'):
+            list(Seller.objects.filter(status='approved'))
+
+    def test_report_ranks_statements_by_total_time(self):
+        in_list = 'SELECT * FROM "sellers_seller" WHERE "id" IN (%s, %s)'
+        Path(f'{self.log}.1').write_text(self.entry(in_list, 300) + '\n')
+        self.log.write_text('\n'.join([
+            self.entry('SELECT COUNT(*) FROM "sellers_seller"', 500),
+            self.entry(in_list.replace('(%s, %s)', '(%s, %s, %s)'), 400, time='2026-01-02T00:00:00+00:00'),
+            'not json',
+        ]) + '\n')
+
+        statements = slow_queries.report()
+        self.assertEqual([statement['sql'] for statement in statements], [
+            'SELECT * FROM "sellers_seller" WHERE "id" IN (...)', 'SELECT COUNT(*) FROM "sellers_seller"',
+        ])
+        self.assertEqual(
+            (statements[0]['count'], statements[0]['total_ms'], statements[0]['mean_ms'], statements[0]['max_ms']),
+            (2, 700, 350, 400)
+        )
+        self.assertEqual(statements[0]['last_seen'], '2026-01-02T00:00:00+00:00')
+
+    def test_admin_page_is_for_superusers(self):
+        self.log.write_text(self.entry('SELECT COUNT(*) FROM "sellers_seller"', 500) + '\n')
+        staff = User.objects.create_user('staff', 'staff@oysloe.com', 'staff123', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/admin/slow-queries/').status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@oysloe.com', 'admin123'))
+        response = self.client.get('/admin/slow-queries/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'SELECT COUNT(*) FROM &quot;sellers_seller&quot;')
+        self.assertContains(response, 'sellers/views.py:50 in get_queryset')
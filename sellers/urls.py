@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import public_urls, views
 
 router = DefaultRouter()
 router.register(r'sellers', views.SellerViewSet)
@@ -8,9 +8,7 @@ router.register(r'analytics', views.AnalyticsViewSet)
 
 urlpatterns = [
     # Public endpoints (no authentication required) - MUST come before router
-    path('submit-seller/', views.submit_seller_form, name='submit-seller'),
-    path('track-pageview/', views.track_pageview, name='track-pageview'),
-    path('pricing/', views.pricing_api, name='pricing-api'),
+    *public_urls.urlpatterns,
     # path('public/submit-contact/', views.submit_contact_form, name='submit-contact'),
     
     # API endpoints (for authenticated users)
@@ -1,5 +1,7 @@
 from django.shortcuts import render
+from django.contrib import admin
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.http import require_http_methods
@@ -13,6 +15,11 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Seller, Analytics, PricingPlan
+from .counters import analytics_buffer
+from . import analytics, slow_queries
+from .stats import STATUSES, admin_dashboard_context, analytics_edited, dashboard_stats, get_snapshot
+from .search import get_search_backend
+from .pagination import KeysetPagination, approximate_count
 from .serializers import (
     SellerSerializer, SellerCreateSerializer, SellerStatusUpdateSerializer,
     AnalyticsSerializer, DashboardStatsSerializer
@@ -25,6 +32,8 @@ class SellerViewSet(viewsets.ModelViewSet):
     queryset = Seller.objects.all()
     serializer_class = SellerSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('created_at', 'id')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -34,24 +43,33 @@ class SellerViewSet(viewsets.ModelViewSet):
         return SellerSerializer
     
     def get_queryset(self):
-        queryset = Seller.objects.all()
+        queryset = Seller.objects.select_related('reviewed_by')
         
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Search functionality
+        # Search functionality, ranked by relevance
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(business_name__icontains=search) |
-                Q(owner_name__icontains=search) |
-                Q(email_address__icontains=search)
-            )
+            return get_search_backend().filter(queryset, search)
         
         return queryset.order_by('-created_at')
     
+    def get_approximate_count(self, queryset):
+        """Seller totals come from the dashboard snapshot unless the list is searched"""
+        if self.request.query_params.get('search'):
+            return approximate_count(queryset)
+        
+        snapshot = get_snapshot()
+        status_filter = self.request.query_params.get('status', None)
+        if not status_filter:
+            return snapshot.total_sellers
+        if status_filter in STATUSES:
+            return getattr(snapshot, f'{status_filter}_sellers')
+        return 0
+    
     def perform_update(self, serializer):
         seller = serializer.save()
         seller.reviewed_by = self.request.user
@@ -94,46 +112,45 @@ class SellerViewSet(viewsets.ModelViewSet):
         })
 
 class AnalyticsViewSet(viewsets.ModelViewSet):
-    queryset = Analytics.objects.all()
+    queryset = Analytics.objects.order_by('-date')
     serializer_class = AnalyticsSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('date', 'id')
+    
+    # Direct edits of the daily totals bypass the snapshot's adjustments
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        analytics_edited()
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        analytics_edited()
+    
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        analytics_edited()
     
     @action(detail=False, methods=['post'])
     def track_pageview(self, request):
         """Track a page view"""
         today = timezone.now().date()
-        analytics, created = Analytics.objects.get_or_create(
-            date=today,
-            defaults={'page_views': 1, 'form_submissions': 0}
-        )
-        
-        if not created:
-            analytics.page_views += 1
-            analytics.save()
+        analytics_buffer.incr('page_views')
         
         return Response({
             'message': 'Page view tracked successfully',
-            'date': today,
-            'page_views': analytics.page_views
+            'date': today
         })
     
     @action(detail=False, methods=['post'])
     def track_submission(self, request):
         """Track a form submission"""
         today = timezone.now().date()
-        analytics, created = Analytics.objects.get_or_create(
-            date=today,
-            defaults={'page_views': 0, 'form_submissions': 1}
-        )
-        
-        if not created:
-            analytics.form_submissions += 1
-            analytics.save()
+        analytics_buffer.incr('form_submissions')
         
         return Response({
             'message': 'Form submission tracked successfully',
-            'date': today,
-            'form_submissions': analytics.form_submissions
+            'date': today
         })
     
     @action(detail=False, methods=['get'])
@@ -143,47 +160,32 @@ class AnalyticsViewSet(viewsets.ModelViewSet):
         
         # Calculate date range
         today = timezone.now().date()
-        if period == 'today':
-            start_date = today
-        elif period == '7days':
-            start_date = today - timedelta(days=7)
-        elif period == '30days':
-            start_date = today - timedelta(days=30)
-        elif period == '90days':
-            start_date = today - timedelta(days=90)
-        else:
-            start_date = today - timedelta(days=7)
+        start_date = analytics.period_start(period, today)
         
-        # Get analytics data
-        analytics_data = Analytics.objects.filter(
-            date__gte=start_date
-        ).aggregate(
-            total_views=Sum('page_views'),
-            total_submissions=Sum('form_submissions'),
-            total_days=Count('date'),
-            avg_views_per_day=Sum('page_views') / Count('date'),
-            avg_submissions_per_day=Sum('form_submissions') / Count('date')
-        )
+        # Get analytics data, including the daily breakdown for charts
+        totals = analytics.period_totals(start_date)
+        total_days = totals['total_days']
         
-        # Get daily breakdown for charts
-        daily_data = Analytics.objects.filter(
-            date__gte=start_date
-        ).order_by('date').values('date', 'page_views', 'form_submissions')
-        
-        return Response({
+        data = {
             'period': period,
             'start_date': start_date,
             'end_date': today,
-            'total_views': analytics_data['total_views'] or 0,
-            'total_submissions': analytics_data['total_submissions'] or 0,
-            'total_days': analytics_data['total_days'] or 0,
-            'avg_views_per_day': round(analytics_data['avg_views_per_day'] or 0, 2),
-            'avg_submissions_per_day': round(analytics_data['avg_submissions_per_day'] or 0, 2),
+            'total_views': totals['total_views'],
+            'total_submissions': totals['total_submissions'],
+            'total_days': total_days,
+            'avg_views_per_day': round(totals['total_views'] / total_days, 2) if total_days else 0,
+            'avg_submissions_per_day': round(totals['total_submissions'] / total_days, 2) if total_days else 0,
             'conversion_rate': round(
-                (analytics_data['total_submissions'] or 0) / (analytics_data['total_views'] or 1) * 100, 2
+                totals['total_submissions'] / (totals['total_views'] or 1) * 100, 2
             ),
-            'daily_data': list(daily_data)
-        })
+            'daily_data': totals['daily_data']
+        }
+        
+        # Hour-level breakdown for the current day
+        if period == 'today':
+            data['hourly_data'] = analytics.hourly_series(today)
+        
+        return Response(data)
 
 class DashboardStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -191,171 +193,27 @@ class DashboardStatsView(APIView):
     def get(self, request):
         period = request.query_params.get('period', '7days')
         
-        # Calculate date range
-        today = timezone.now().date()
-        if period == '7days':
-            start_date = today - timedelta(days=7)
-        elif period == '30days':
-            start_date = today - timedelta(days=30)
-        elif period == '90days':
-            start_date = today - timedelta(days=90)
-        else:
-            start_date = today - timedelta(days=7)
-        
-        # Get analytics data
-        analytics_data = Analytics.objects.filter(
-            date__gte=start_date
-        ).aggregate(
-            total_views=Sum('page_views'),
-            total_submissions=Sum('form_submissions'),
-            total_days=Count('date')
-        )
-        
-        # Get seller statistics
-        seller_stats = Seller.objects.aggregate(
-            total_sellers=Count('id'),
-            pending_sellers=Count('id', filter=Q(status='pending')),
-            approved_sellers=Count('id', filter=Q(status='approved')),
-            rejected_sellers=Count('id', filter=Q(status='rejected'))
-        )
-        
-        # Combine data
-        stats = {
-            'total_sellers': seller_stats['total_sellers'] or 0,
-            'pending_sellers': seller_stats['pending_sellers'] or 0,
-            'approved_sellers': seller_stats['approved_sellers'] or 0,
-            'rejected_sellers': seller_stats['rejected_sellers'] or 0,
-            'total_views': analytics_data['total_views'] or 0,
-            'total_submissions': analytics_data['total_submissions'] or 0,
-            'total_days': analytics_data['total_days'] or 0
-        }
+        # Seller and analytics totals come from the materialized snapshot
+        stats = dashboard_stats(period)
         
         serializer = DashboardStatsSerializer(stats)
         return Response(serializer.data)
 
-@csrf_exempt
-def submit_seller_form(request):
-    """Public endpoint for submitting seller applications"""
-    if request.method == 'POST':
-        import json
-        
-        # Parse JSON data from request body
-        try:
-            data = json.loads(request.body)
-        except json.JSONDecodeError:
-            return JsonResponse({
-                'error': 'Invalid JSON data'
-            }, status=400)
-        
-        serializer = SellerCreateSerializer(data=data)
-        
-        if serializer.is_valid():
-            seller = serializer.save()
-            
-            # Track form submission
-            today = timezone.now().date()
-            analytics, created = Analytics.objects.get_or_create(
-                date=today,
-                defaults={'page_views': 0, 'form_submissions': 1}
-            )
-            
-            if not created:
-                analytics.form_submissions += 1
-                analytics.save()
-            
-            return JsonResponse({
-                'message': 'Application submitted successfully!',
-                'seller_id': seller.id
-            })
-        else:
-            return JsonResponse({
-                'error': 'Validation failed',
-                'details': serializer.errors
-            }, status=400)
-    
-    return JsonResponse({
-        'error': 'Method not allowed'
-    }, status=405)
-
-@csrf_exempt
-def track_pageview(request):
-    """Public endpoint for tracking page views"""
-    if request.method == 'POST':
-        today = timezone.now().date()
-        analytics, created = Analytics.objects.get_or_create(
-            date=today,
-            defaults={'page_views': 1, 'form_submissions': 0}
-        )
-        
-        if not created:
-            analytics.page_views += 1
-            analytics.save()
-        
-        return JsonResponse({
-            'message': 'Page view tracked successfully',
-            'date': today.isoformat(),
-            'page_views': analytics.page_views
-        })
-    
-    return JsonResponse({
-        'error': 'Method not allowed'
-    }, status=405)
-
-@require_http_methods(["GET"])
-def pricing_api(request):
-    """API endpoint to get pricing plans"""
-    try:
-        pricing_plans = PricingPlan.objects.filter(is_active=True).order_by('monthly_price')
-        
-        plans_data = []
-        for plan in pricing_plans:
-            plans_data.append({
-                'name': plan.name,
-                'display_name': plan.display_name,
-                'description': plan.description,
-                'monthly_price': float(plan.monthly_price),
-                'yearly_price': float(plan.yearly_price),
-                'cancelled_monthly_price': float(plan.cancelled_monthly_price) if plan.cancelled_monthly_price else None,
-                'cancelled_yearly_price': float(plan.cancelled_yearly_price) if plan.cancelled_yearly_price else None,
-                'is_popular': plan.is_popular,
-                'yearly_discount': plan.yearly_discount_percentage,
-                'has_cancelled_prices': plan.has_cancelled_prices
-            })
-        
-        return JsonResponse({
-            'success': True,
-            'plans': plans_data
-        })
-    except Exception as e:
-        return JsonResponse({
-            'success': False,
-            'error': str(e)
-        }, status=500)
-
 @login_required
 def admin_dashboard(request):
     """Admin dashboard view"""
-    # Get today's analytics
-    today = timezone.now().date()
-    today_analytics = Analytics.objects.filter(date=today).first()
-    
-    # Get recent analytics (last 7 days)
-    recent_analytics = Analytics.objects.filter(
-        date__gte=today - timedelta(days=7)
-    ).order_by('-date')
-    
-    # Get seller statistics
-    seller_stats = {
-        'total': Seller.objects.count(),
-        'pending': Seller.objects.filter(status='pending').count(),
-        'approved': Seller.objects.filter(status='approved').count(),
-        'rejected': Seller.objects.filter(status='rejected').count(),
-    }
-    
+    context = admin_dashboard_context()
+    return render(request, 'admin/dashboard.html', context)
+
+def slow_query_report(request):
+    """Logged slow queries ranked by total time; wrapped in admin_view by the URLconf"""
+    # The logged parameters may hold sellers' personal details
+    if not request.user.is_superuser:
+        raise PermissionDenied
     context = {
-        'today_analytics': today_analytics,
-        'recent_analytics': recent_analytics,
-        'seller_stats': seller_stats,
+        **admin.site.each_context(request),
+        'title': 'Slow queries',
+        'statements': slow_queries.report(),
+        'threshold_ms': slow_queries.threshold() * 1000,
     }
-    
-    return render(request, 'admin/dashboard.html', context)
+    return render(request, 'admin/slow_queries.html', context)
@@ -0,0 +1,227 @@
+// Close mobile menu when any mobile-nav-link is clicked
+document.querySelectorAll('.mobile-nav-link').forEach(link => {
+    link.addEventListener('click', function() {
+        document.querySelector('.mobile-menu').classList.remove('active');
+        document.querySelector('.hamburger').classList.remove('active');
+    });
+});
+
+// Load pricing data dynamically
+async function loadPricingData() {
+    try {
+        const response = await fetch('/api/pricing/');
+        const data = await response.json();
+        
+        if (data.success) {
+            renderPricingCards(data.plans);
+        } else {
+            console.error('Failed to load pricing data:', data.error);
+            showPricingError();
+        }
+    } catch (error) {
+        console.error('Error loading pricing data:', error);
+        showPricingError();
+    }
+}
+
+function renderPricingCards(plans) {
+    const container = document.getElementById('pricing-cards-container');
+    container.innerHTML = '';
+    
+    plans.forEach(plan => {
+        const stars = getStarsForPlan(plan.name);
+        const features = getFeaturesForPlan(plan.name);
+        
+        const card = document.createElement('div');
+        card.className = `pricing-card ${plan.is_popular ? 'popular' : ''}`;
+        
+        card.innerHTML = `
+            <div class="pricing-card-header">
+                <div class="stars">
+                    ${stars}
+                </div>
+                <h3>${plan.display_name}</h3>
+                <p>${plan.description}</p>
+            </div>
+            <div class="pricing-features">
+                <ul>
+                    ${features.map(feature => `<li><i class="fas fa-check-circle"></i> ${feature}</li>`).join('')}
+                </ul>
+            </div>
+            <div class="pricing-card-footer">
+                <div class="price-display">
+                    <span class="currency">¢</span>
+                    <span class="price" data-monthly="${plan.monthly_price}" data-yearly="${plan.yearly_price}" data-cancelled-monthly="${plan.cancelled_monthly_price || ''}" data-cancelled-yearly="${plan.cancelled_yearly_price || ''}">${plan.monthly_price}</span>
+                    ${plan.cancelled_monthly_price ? `<span class="cancelled-price">¢${plan.cancelled_monthly_price}</span>` : ''}
+                </div>
+            </div>
+        `;
+        
+        container.appendChild(card);
+    });
+    
+    // Reinitialize pricing toggle after loading cards
+    updatePricing();
+}
+
+function getStarsForPlan(planName) {
+    const starConfigs = {
+        'basic': '<i class="fas fa-star"></i><i class="fas fa-star"></i><i class="fas fa-star"></i>',
+        'business': '<i class="fas fa-star"></i><i class="fas fa-star"></i><i class="fas fa-star"></i><i class="fas fa-star"></i>',
+        'platinum': '<i class="fas fa-star"></i><i class="fas fa-star"></i><i class="fas fa-star"></i><i class="fas fa-star"></i><i class="fas fa-star"></i>'
+    };
+    return starConfigs[planName] || starConfigs['basic'];
+}
+
+function getFeaturesForPlan(planName) {
+    const featureConfigs = {
+        'basic': [
+            'Share limited number of ads',
+            'All ads stays promoted for a week'
+        ],
+        'business': [
+            'Pro partnership status',
+            'All ads stays promoted for a month'
+        ],
+        'platinum': [
+            'Unlimited number of ads',
+            'Sell 10x faster in all categories'
+        ]
+    };
+    return featureConfigs[planName] || featureConfigs['basic'];
+}
+
+function showPricingError() {
+    const container = document.getElementById('pricing-cards-container');
+    container.innerHTML = `
+        <div class="pricing-error">
+            <i class="fas fa-exclamation-triangle"></i>
+            <p>Failed to load pricing plans. Please refresh the page.</p>
+        </div>
+    `;
+}
+
+// Pricing toggle functionality
+function updatePricing() {
+    const billingToggle = document.getElementById('billingToggle');
+    const priceElements = document.querySelectorAll('.price');
+    const periodElements = document.querySelectorAll('.period');
+    
+    if (!billingToggle) return;
+
+    const isYearly = billingToggle.checked;
+    
+    priceElements.forEach(priceElement => {
+        const monthlyPrice = priceElement.getAttribute('data-monthly');
+        const yearlyPrice = priceElement.getAttribute('data-yearly');
+        const cancelledMonthlyPrice = priceElement.getAttribute('data-cancelled-monthly');
+        const cancelledYearlyPrice = priceElement.getAttribute('data-cancelled-yearly');
+        
+        // Update main price
+        if (isYearly) {
+            priceElement.textContent = yearlyPrice;
+        } else {
+            priceElement.textContent = monthlyPrice;
+        }
+        
+        // Update cancelled price if it exists
+        const cancelledPriceElement = priceElement.parentElement.querySelector('.cancelled-price');
+        if (cancelledPriceElement) {
+            if (isYearly && cancelledYearlyPrice) {
+                cancelledPriceElement.textContent = `¢${cancelledYearlyPrice}`;
+            } else if (!isYearly && cancelledMonthlyPrice) {
+                cancelledPriceElement.textContent = `¢${cancelledMonthlyPrice}`;
+            } else {
+                cancelledPriceElement.style.display = 'none';
+            }
+        }
+    });
+
+    periodElements.forEach(periodElement => {
+        if (isYearly) {
+            periodElement.textContent = '/month (billed yearly)';
+        } else {
+            periodElement.textContent = '/month';
+        }
+    });
+
+    // Update billing toggle labels
+    const labels = document.querySelectorAll('.billing-toggle-label');
+    labels.forEach(label => {
+        if (isYearly && label.getAttribute('data-billing-period') === 'yearly') {
+            label.classList.add('active');
+        } else if (!isYearly && label.getAttribute('data-billing-period') === 'monthly') {
+            label.classList.add('active');
+        } else {
+            label.classList.remove('active');
+        }
+    });
+}
+
+// Initialize pricing toggle
+document.addEventListener('DOMContentLoaded', function() {
+    const billingToggle = document.getElementById('billingToggle');
+    if (billingToggle) {
+        billingToggle.addEventListener('change', updatePricing);
+    }
+    
+    // Load pricing data
+    loadPricingData();
+});
+
+// Seller form submission to Django backend
+const submitBtn = document.getElementById('submit-seller-btn');
+if (submitBtn) {
+    submitBtn.addEventListener('click', async function(e) {
+        e.preventDefault();
+        // Collect form data
+        const data = {
+            owner_name: document.getElementById('owner-name').value.trim(),
+            phone_number: document.getElementById('phone-number').value.trim(),
+            email_address: document.getElementById('email-address').value.trim(),
+            location: document.getElementById('location').value.trim(),
+            business_name: document.getElementById('business-name').value.trim(),
+            business_type: document.getElementById('business-type').value.trim(),
+            experience_level: document.getElementById('experience-level').value.trim(),
+            inventory_size: document.getElementById('inventory-size').value.trim(),
+            business_description: document.getElementById('business-description').value.trim(),
+            // motivation is not used in Django backend, but you can add it if you want
+        };
+        // Basic validation
+        for (const key in data) {
+            if (!data[key]) {
+                alert('Please fill all required fields.');
+                return;
+            }
+        }
+        // Submit to Django backend
+        try {
+            const response = await fetch('http://localhost:8000/api/submit-seller/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(data)
+            });
+            const result = await response.json();
+            if (response.ok) {
+                alert('Application submitted successfully! Our team will contact you soon.');
+                // Clear form
+                document.getElementById('owner-name').value = '';
+                document.getElementById('phone-number').value = '';
+                document.getElementById('email-address').value = '';
+                document.getElementById('location').value = '';
+                document.getElementById('business-name').value = '';
+                document.getElementById('business-type').value = '';
+                document.getElementById('experience-level').value = '';
+                document.getElementById('inventory-size').value = '';
+                document.getElementById('business-description').value = '';
+                document.getElementById('motivation').value = '';
+            } else {
+                alert(result.error || 'Failed to submit application. Please try again.');
+            }
+        } catch (err) {
+            alert('Network error. Please try again later.');
+        }
+    });
+}